@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -24,6 +25,97 @@ SECRET_KEY = 'django-insecure-!aks5o8ldp)z+=**s&rssmaux@8y-#dmm&$-5z0fp5$rid7so@
 
 # settings.py
 GOOGLE_MAPS_API_KEY = ''
+GOOGLE_MAPS_DIRECTIONS_URL = 'https://maps.googleapis.com/maps/api/directions/json'
+
+# Google Maps HTTP client: pooled session, timeouts, retries and circuit breaker
+MAPS_HTTP_POOL_SIZE = 20
+MAPS_HTTP_CONNECT_TIMEOUT = 1.0  # seconds
+MAPS_HTTP_READ_TIMEOUT = 3.0  # seconds
+MAPS_HTTP_RETRIES = 2
+MAPS_HTTP_BACKOFF = 0.1  # seconds, doubled per retry with full jitter
+MAPS_BREAKER_FAILURE_THRESHOLD = 5
+MAPS_BREAKER_RESET_TIMEOUT = 30  # seconds
+
+# Dispatch: in-memory spatial index of available drivers
+DRIVER_INDEX_ENABLED = True
+DRIVER_INDEX_CELL_SIZE = 0.002  # degrees (~220 m)
+DRIVER_INDEX_RESYNC_SECONDS = 60
+# Maximum `limit` of GET /api/drivers/nearby/
+DRIVER_NEARBY_MAX_LIMIT = 100
+# Maximum pings per POST /api/drivers/locations/
+DRIVER_LOCATIONS_MAX_BATCH = 10000
+# Bulk address import: rows per COPY and errors returned in the report
+ADDRESS_IMPORT_CHUNK_SIZE = 10000
+ADDRESS_IMPORT_MAX_ERRORS = 1000
+# Write-behind buffer for GPS pings (per process): keeps the latest position
+# per driver and writes them in bulk every FLUSH_SECONDS or FLUSH_SIZE drivers
+LOCATION_BUFFER_ENABLED = False
+LOCATION_BUFFER_FLUSH_SECONDS = 2.0
+LOCATION_BUFFER_FLUSH_SIZE = 5000
+LOCATION_BUFFER_MAX_ENTRIES = 100000
+# Search rounds when every nearby candidate was claimed by a concurrent request
+DISPATCH_CLAIM_ATTEMPTS = 3
+# Nearest candidates whose ETA is requested concurrently; the lowest ETA wins
+DISPATCH_CANDIDATES = 5
+DISPATCH_ETA_BUDGET_SECONDS = 1.5  # overall deadline for the candidate ETAs
+DISPATCH_ETA_WORKERS = 32
+# Candidate search in PostGIS by growing radius; the last ring is the maximum.
+# The first ring comes from the typical pickup distance per zone (cells of
+# DISPATCH_SEARCH_ZONE_SIZE degrees) over the last DISPATCH_SEARCH_HISTORY_DAYS
+DISPATCH_SEARCH_RINGS_KM = (1, 3, 10, 30, 100)
+DISPATCH_SEARCH_ZONE_SIZE = 0.05  # degrees (~5.5 km)
+DISPATCH_SEARCH_HISTORY_DAYS = 7
+DISPATCH_SEARCH_RELOAD_SECONDS = 3600
+
+# Offline travel-time model fitted by `manage.py fit_eta_model`.
+# ETA_ESTIMATOR = 'maps' uses it as fallback; 'model' skips Google Maps entirely.
+ETA_ESTIMATOR = 'maps'
+ETA_MODEL_ENABLED = True
+ETA_MODEL_RELOAD_SECONDS = 300
+# Maximum number of services accepted by POST /api/services/batch/
+DISPATCH_BATCH_MAX_SIZE = 500
+# Queued dispatch: POST /api/services/ answers 202 and `manage.py
+# dispatch_worker` assigns drivers in batches (FOR UPDATE SKIP LOCKED)
+DISPATCH_QUEUE_ENABLED = False
+DISPATCH_QUEUE_BATCH_SIZE = 100
+DISPATCH_QUEUE_POLL_SECONDS = 0.5  # worker sleep when nothing is due
+DISPATCH_QUEUE_RETRY_SECONDS = 5  # retry delay when no driver is nearby
+DISPATCH_QUEUE_TIMEOUT_SECONDS = 300  # queued longer than this: cancelled
+
+# Hourly per-zone summary tables kept by `manage.py refresh_stats` and
+# served by GET /api/stats/
+STATS_ZONE_SIZE = 0.05  # degrees (~5.5 km); run `refresh_stats --rebuild` after changing it
+STATS_LAG_SECONDS = 60  # events newer than this wait for the next run
+STATS_REFRESH_SECONDS = 60  # refresh_stats --loop interval
+STATS_FLEET_MAX_GAP_SECONDS = 300  # online time counted at most per run
+STATS_MAX_HOURS = 744  # longest period per request (31 days)
+
+# ETA cache: quantized origin/destination cells + time-of-day bucket
+ETA_CACHE_ENABLED = True
+ETA_CACHE_ALIAS = 'eta'
+ETA_CACHE_TTL = 300  # seconds an entry is fresh
+ETA_CACHE_STALE_TTL = 600  # extra seconds served stale while refreshing
+ETA_CACHE_MAX_ENTRIES = 10000
+ETA_CACHE_CELL_SIZE = 0.005  # degrees (~550 m)
+ETA_CACHE_BUCKET_MINUTES = 15
+
+# Rendered address/driver list and retrieve responses, invalidated by
+# version bumps from model signals and driver UPDATEs (no TTL guessing)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300  # only bounds memory; entries never go stale
+RESPONSE_CACHE_LOCK_TIMEOUT = 5  # seconds a rebuild lock is held at most
+RESPONSE_CACHE_LOCK_WAIT = 0.5  # seconds other requests wait for a rebuild
+
+# Per-request timings (DB, Google Maps, serialization, total) aggregated per
+# view and exported in Prometheus format at /metrics
+METRICS_ENABLED = True
+METRICS_SERVER_TIMING = True  # also send them in the Server-Timing header
+# Clients allowed to read /metrics (comma separated in the environment);
+# '*' exposes it to anyone
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()
+]
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -46,6 +138,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'services.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +182,27 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'eta': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eta',
+        'OPTIONS': {
+            # Above ETA_CACHE_MAX_ENTRIES so eviction is driven by the LRU
+            'MAX_ENTRIES': 20000,
+        },
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -97,8 +211,14 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'services.pagination.CreatedAtCursorPagination',
 }
 
+# list/retrieve rendered from values_list rows + orjson (same bytes as DRF)
+FAST_READ_ENABLED = True
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
 #GDAL_LIBRARY_PATH = r'C:\OSGeo4W\bin\gdal310'
 
 # Password validation
@@ -17,14 +17,19 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from services.views import AddressViewSet, DriverViewSet, ServiceViewSet
+from services import async_views
+from services.views import AddressViewSet, DriverViewSet, ServiceViewSet, StatsViewSet, metrics
 
 router = routers.DefaultRouter()
 router.register(r'addresses', AddressViewSet)
 router.register(r'drivers', DriverViewSet)
 router.register(r'services', ServiceViewSet)
+router.register(r'stats', StatsViewSet, basename='stats')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Async dispatch, served without blocking a worker when running under ASGI
+    path('api/async/services/', async_views.create_service, name='async-service-create'),
     path('api/', include(router.urls)),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .instrumentation import install_db_wrapper
+
+        connection_created.connect(install_db_wrapper, dispatch_uid='services.install_db_wrapper')
+
+        if getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+            from .location_buffer import location_buffer
+
+            location_buffer.start()
@@ -0,0 +1,97 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .dispatch import aassign_fastest_driver, aenqueue_service, arelease_driver
+from .models import Address, Service
+from .serializers import ServiceSerializer
+
+
+def _error(detail, status_code):
+    return JsonResponse({"detail": detail}, status=status_code)
+
+
+def _authenticate(request):
+    # Reuse the DRF authentication classes (session + CSRF, basic auth)
+    drf_request = Request(request, authenticators=[
+        authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ])
+    return drf_request.user
+
+
+@csrf_exempt
+async def create_service(request):
+    """
+    Variante asíncrona de POST /api/services/ para el servidor ASGI.
+
+    La búsqueda de conductores usa el ORM asíncrono y el ETA se consulta con
+    un cliente HTTP asíncrono, así que un solo proceso puede mantener cientos
+    de asignaciones en curso mientras espera a Google Maps.
+    """
+    if request.method != 'POST':
+        return _error(f'Método "{request.method}" no permitido.', status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except exceptions.APIException as exc:
+        return JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    if not user or not user.is_authenticated:
+        return _error("Las credenciales de autenticación no se proveyeron.", status.HTTP_403_FORBIDDEN)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return _error("JSON invalido", status.HTTP_400_BAD_REQUEST)
+
+    serializer = ServiceSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST, encoder=JSONEncoder)
+
+    try:
+        pickup_address = await Address.objects.aget(id=serializer.validated_data['pickup_address_id'])
+    except Address.DoesNotExist:
+        return _error("ID de direccion de recogida no existe", status.HTTP_400_BAD_REQUEST)
+
+    if not pickup_address.location:
+        return _error("Direccion de recogida debe tener coordenadas de localizacion", status.HTTP_400_BAD_REQUEST)
+
+    if getattr(settings, 'DISPATCH_QUEUE_ENABLED', False):
+        service = await aenqueue_service(
+            customer_name=serializer.validated_data['customer_name'],
+            customer_phone=serializer.validated_data['customer_phone'],
+            pickup_address=pickup_address,
+        )
+        response = JsonResponse(ServiceSerializer(service).data, status=status.HTTP_202_ACCEPTED, encoder=JSONEncoder)
+        response['Location'] = request.build_absolute_uri(reverse('service-detail', args=[service.pk]))
+        return response
+
+    closest_driver = await aassign_fastest_driver(pickup_address.location)
+    if closest_driver is None:
+        return _error("No hay conductores disponibles cercanos", status.HTTP_404_NOT_FOUND)
+
+    try:
+        service = await Service.objects.acreate(
+            customer_name=serializer.validated_data['customer_name'],
+            customer_phone=serializer.validated_data['customer_phone'],
+            pickup_address=pickup_address,
+            driver=closest_driver,
+            status='assigned',
+            estimated_arrival=closest_driver.eta,
+            pickup_distance=closest_driver.distance.m,
+            assigned_at=timezone.now(),
+        )
+    except Exception:
+        await arelease_driver(closest_driver)
+        raise
+
+    # Relations are already loaded, so serializing does not touch the database
+    return JsonResponse(ServiceSerializer(service).data, status=status.HTTP_201_CREATED, encoder=JSONEncoder)
@@ -0,0 +1,198 @@
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.gis.geos import Point
+from django.db import transaction
+
+from .models import Driver
+
+# Bogotá bounding box (lat_min, lat_max, lng_min, lng_max)
+BOGOTA_BOUNDS = (4.5, 4.8, -74.2, -74.0)
+
+
+class StubMapsServer:
+    """
+    Servidor HTTP local que imita la API de Google Maps Directions.
+
+    Args:
+        delay (float): segundos de espera antes de responder
+        jitter (float): espera adicional aleatoria uniforme en [0, jitter]
+        duration (int): duración en segundos que retorna la ruta
+        status_code (int): código HTTP de la respuesta
+    """
+
+    def __init__(self, delay=0.0, duration=600, status_code=200, jitter=0.0):
+        self.delay = delay
+        self.jitter = jitter
+        self.duration = duration
+        self.status_code = status_code
+        self.requests = 0
+        self.client_ports = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/maps/api/directions/json'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    stub.client_ports.add(self.client_address[1])
+                if stub.delay or stub.jitter:
+                    time.sleep(stub.delay + random.uniform(0, stub.jitter))
+                body = json.dumps({
+                    'status': 'OK',
+                    'routes': [{'legs': [{'duration': {'value': stub.duration}}]}],
+                }).encode()
+                try:
+                    self.send_response(stub.status_code)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (read timeout)
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Rollback(Exception):
+    """
+    Se lanza para deshacer los datos sembrados por un benchmark
+    """
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Resumen en milisegundos de una lista de duraciones en segundos
+    """
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def random_point(rng, bounds=BOGOTA_BOUNDS):
+    lat_min, lat_max, lng_min, lng_max = bounds
+    return Point(rng.uniform(lng_min, lng_max), rng.uniform(lat_min, lat_max))
+
+
+def seed_drivers(count, rng=None, bounds=BOGOTA_BOUNDS, status='available', batch_size=5000):
+    """
+    Inserta `count` conductores sintéticos con bulk_create
+    """
+    rng = rng or random.Random(0)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        drivers = []
+        for _ in range(size):
+            driver_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+            drivers.append(Driver(
+                id=driver_id,
+                first_name='Bench',
+                last_name='Driver',
+                email=f'{driver_id.hex}@bench.local',
+                phone='0000000000',
+                status=status,
+                current_location=random_point(rng, bounds),
+            ))
+        Driver.objects.bulk_create(drivers, batch_size=batch_size)
+        created += size
+    return created
+
+
+def explain_indexes(queryset, **options):
+    """
+    Nombres de los índices que usa el plan de PostgreSQL para `queryset`
+
+    Returns:
+        tuple[set[str], dict]: índices usados y el plan completo (JSON)
+    """
+    plan = json.loads(queryset.explain(format='json', **options))[0]['Plan']
+    indexes = set()
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+        pending.extend(node.get('Plans', []))
+    return indexes, plan
+
+
+def rows_examined(plan, relation):
+    """
+    Filas que leyeron los nodos de escaneo de `relation` en un plan de
+    EXPLAIN ANALYZE, incluidas las que descartaron los filtros
+    """
+    total = 0
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if node.get('Relation Name') == relation:
+            rows = sum(node.get(key, 0) for key in (
+                'Actual Rows', 'Rows Removed by Filter', 'Rows Removed by Index Recheck',
+            ))
+            total += rows * node.get('Actual Loops', 1)
+        pending.extend(node.get('Plans', []))
+    return total
+
+
+def rolled_back(func, *args, **kwargs):
+    """
+    Ejecuta `func` dentro de una transacción que siempre se deshace
+    """
+    result = None
+    try:
+        with transaction.atomic():
+            result = func(*args, **kwargs)
+            raise Rollback()
+    except Rollback:
+        pass
+    return result
@@ -0,0 +1,28 @@
+import csv
+import io
+
+from django.db import connection
+
+
+def copy_rows(table, columns, rows):
+    """
+    Inserta `rows` (tuplas en el orden de `columns`) con COPY ... FROM STDIN.
+
+    No pasa por el ORM: no hay señales ni valores automáticos (auto_now,
+    defaults), así que cada fila debe traer todas sus columnas.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(row)
+            buffer.seek(0)
+            # In CSV format an unquoted empty field is NULL
+            raw.copy_expert(f'{sql} WITH (FORMAT csv)', buffer)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
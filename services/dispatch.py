@@ -0,0 +1,653 @@
+import asyncio
+import contextvars
+import datetime
+import math
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Polygon
+from django.contrib.gis.measure import D
+from django.db import connection, transaction
+from django.db.models import Count, FloatField, Min, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .eta_model import eta_model
+from .google_maps_time import GoogleMapsService
+from .location_buffer import location_buffer
+from .matching import distance_matrix_m, match_min_cost
+from .models import Driver, Service
+from .response_cache import response_cache
+from .search_rings import search_rings
+from .spatial_index import METERS_PER_DEGREE, driver_index, haversine_m
+
+SEARCH_RADIUS_M = 100000  # 100 km
+# Haversine (index) vs spheroid (PostGIS) distances differ by up to ~0.5%
+INDEX_DISTANCE_SLACK = 1.01
+
+
+def _candidates_queryset(location, radius_m):
+    queryset = Driver.objects.select_related('address').filter(
+        status='available',
+        current_location__distance_lte=(location, radius_m)
+    )
+    return queryset.annotate(
+        distance=Distance('current_location', location)
+    ).order_by('distance')
+
+
+def knn_queryset(location, status='available'):
+    """
+    Conductores en `status` con ubicación, anotados con `distance` (metros)
+    y ordenados con el operador KNN `<->` de PostGIS: el índice GiST entrega
+    las filas ya ordenadas y la consulta se detiene en el LIMIT, sin calcular
+    ni ordenar la distancia de todos los conductores.
+    """
+    distance = RawSQL(
+        f'{Driver._meta.db_table}.current_location <-> %s::geography',
+        (f'SRID=4326;POINT({location.x!r} {location.y!r})',),
+        output_field=FloatField(),
+    )
+    return Driver.objects.filter(
+        status=status, current_location__isnull=False,
+    ).annotate(distance=distance).order_by('distance')
+
+
+def _index_lookup(location, limit, radius_m):
+    """
+    Returns:
+        tuple[list, float]: ids de los candidatos del índice y radio con el
+        que confirmarlos en PostGIS: la distancia del k-ésimo (más un margen
+        por la diferencia entre haversine y el esferoide), o `radius_m` si
+        el índice no tiene `limit` conductores dentro de él
+    """
+    nearest = driver_index.nearest(location.y, location.x, k=limit, max_distance_m=radius_m)
+    if len(nearest) < limit:
+        return [driver_id for _, driver_id in nearest], radius_m
+    return [driver_id for _, driver_id in nearest], min(nearest[-1][0] * INDEX_DISTANCE_SLACK, radius_m)
+
+
+def _read_through_buffer(location, candidates):
+    """
+    Aplica a los candidatos las posiciones GPS que siguen en el buffer
+    write-behind y recalcula su distancia.
+    """
+    if not getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+        return candidates
+    moved = location_buffer.overlay(candidates)
+    if not moved:
+        return candidates
+    for driver in moved:
+        driver.distance = D(m=haversine_m(
+            location.y, location.x, driver.current_location.y, driver.current_location.x
+        ))
+    return sorted(candidates, key=lambda driver: driver.distance)
+
+
+def find_candidates(location, limit=5, radius_m=None):
+    """
+    Retorna hasta `limit` conductores disponibles ordenados por distancia a
+    `location`, anotados con `distance`, dentro de `radius_m` (por defecto
+    el anillo mayor de `DISPATCH_SEARCH_RINGS_KM`).
+
+    Consulta primero el índice en memoria y usa PostGIS solo para confirmar
+    los candidatos; si el índice no tiene resultados o está desactualizado
+    se busca en PostGIS por anillos crecientes. Las posiciones aún en el
+    buffer de ubicaciones tienen prioridad sobre las de la base de datos.
+    """
+    return _read_through_buffer(location, _find_candidates(location, limit, radius_m or search_rings.max_radius_m))
+
+
+def _search_rings(location, limit, radius_m):
+    """
+    Consulta PostGIS con radios crecientes y se detiene en el primero que
+    tiene `limit` candidatos: dentro de ese radio están los más cercanos.
+    """
+    search_rings.ensure_loaded()
+    plan = search_rings.plan(location.y, location.x, limit, radius_m)
+    for queries, ring_m in enumerate(plan, start=1):
+        candidates = list(_candidates_queryset(location, ring_m)[:limit])
+        if len(candidates) >= limit:
+            break
+    search_rings.observe(location.y, location.x, limit, [driver.distance.m for driver in candidates], ring_m, queries)
+    return candidates
+
+
+async def _asearch_rings(location, limit, radius_m):
+    if search_rings.needs_reload():
+        await sync_to_async(search_rings.ensure_loaded)()
+    plan = search_rings.plan(location.y, location.x, limit, radius_m)
+    for queries, ring_m in enumerate(plan, start=1):
+        candidates = [driver async for driver in _candidates_queryset(location, ring_m)[:limit]]
+        if len(candidates) >= limit:
+            break
+    search_rings.observe(location.y, location.x, limit, [driver.distance.m for driver in candidates], ring_m, queries)
+    return candidates
+
+
+def _confirm_index(limit, radius_m, ids, bound_m, candidates):
+    """
+    Compara los candidatos de PostGIS con los del índice (sin los que
+    tienen posiciones en el buffer). Si difieren el índice está
+    desactualizado; si además faltan candidatos y el radio de
+    confirmación era menor que `radius_m` retorna None: los que faltan
+    pueden estar más lejos y hay que buscarlos con los anillos.
+    """
+    confirmed, expected = {driver.pk for driver in candidates}, set(ids)
+    if getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+        # Buffered pings already moved these in the index, not yet in PostGIS
+        buffered = location_buffer.positions().keys()
+        confirmed, expected = confirmed - buffered, expected - buffered
+    if confirmed != expected:
+        driver_index.mark_stale()
+        if len(candidates) < limit and bound_m < radius_m:
+            return None
+    return candidates
+
+
+def _find_candidates(location, limit, radius_m):
+    if not getattr(settings, 'DRIVER_INDEX_ENABLED', True):
+        return _search_rings(location, limit, radius_m)
+
+    driver_index.ensure_fresh()
+    ids, bound_m = _index_lookup(location, limit, radius_m)
+    if not ids:
+        return _search_rings(location, limit, radius_m)
+
+    # Confirm against the database within the k-th candidate's distance:
+    # status and position may have changed without going through
+    # Driver.save() (e.g. queryset updates), and a driver the index missed
+    # but closer than its k-th still wins
+    candidates = list(_candidates_queryset(location, bound_m)[:limit])
+    return _confirm_index(limit, radius_m, ids, bound_m, candidates) or _search_rings(
+        location, limit, radius_m
+    )
+
+
+async def afind_candidates(location, limit=5, radius_m=None):
+    """
+    Variante asíncrona de find_candidates sobre el ORM asíncrono
+    """
+    return _read_through_buffer(
+        location, await _afind_candidates(location, limit, radius_m or search_rings.max_radius_m)
+    )
+
+
+async def _afind_candidates(location, limit, radius_m):
+    if not getattr(settings, 'DRIVER_INDEX_ENABLED', True):
+        return await _asearch_rings(location, limit, radius_m)
+
+    if not driver_index.synced:
+        await sync_to_async(driver_index.ensure_fresh)()
+    else:
+        # Stale indexes are refreshed on a background thread
+        driver_index.ensure_fresh()
+    ids, bound_m = _index_lookup(location, limit, radius_m)
+    if not ids:
+        return await _asearch_rings(location, limit, radius_m)
+
+    candidates = [driver async for driver in _candidates_queryset(location, bound_m)[:limit]]
+    return _confirm_index(limit, radius_m, ids, bound_m, candidates) or await _asearch_rings(
+        location, limit, radius_m
+    )
+
+
+def _claim_queryset(driver):
+    return Driver.objects.filter(pk=driver.pk, status='available')
+
+
+def _release_queryset(driver):
+    return Driver.objects.filter(pk=driver.pk, status='in_service')
+
+
+def claim_driver(candidates):
+    """
+    Reclama atómicamente el primer candidato que siga disponible.
+
+    Cada intento es un `UPDATE ... WHERE status='available'` condicional, así
+    que dos solicitudes concurrentes nunca obtienen el mismo conductor y no se
+    mantienen bloqueos más allá de la propia sentencia.
+    """
+    for driver in candidates:
+        claimed = _claim_queryset(driver).update(status='in_service', updated_at=timezone.now())
+        # Either we took it or someone else did: it is no longer available
+        driver_index.discard(driver.pk)
+        if claimed:
+            response_cache.invalidate_drivers([driver.pk])
+            driver.status = 'in_service'
+            return driver
+    return None
+
+
+async def aclaim_driver(candidates):
+    """
+    Variante asíncrona de claim_driver
+    """
+    for driver in candidates:
+        claimed = await _claim_queryset(driver).aupdate(status='in_service', updated_at=timezone.now())
+        driver_index.discard(driver.pk)
+        if claimed:
+            response_cache.invalidate_drivers([driver.pk])
+            driver.status = 'in_service'
+            return driver
+    return None
+
+
+def release_driver(driver):
+    """
+    Devuelve a disponible un conductor reclamado con `claim_driver`
+    """
+    released = _release_queryset(driver).update(status='available', updated_at=timezone.now())
+    if released:
+        driver.status = 'available'
+        driver_index.update_from_driver(driver)
+        response_cache.invalidate_drivers([driver.pk])
+    return bool(released)
+
+
+async def arelease_driver(driver):
+    released = await _release_queryset(driver).aupdate(status='available', updated_at=timezone.now())
+    if released:
+        driver.status = 'available'
+        driver_index.update_from_driver(driver)
+        response_cache.invalidate_drivers([driver.pk])
+    return bool(released)
+
+
+def heuristic_eta(distance_km):
+    # Simple estimation: 2 minutes per km
+    return datetime.timedelta(minutes=math.ceil(distance_km * 2))
+
+
+def fallback_eta(distance_km, when=None):
+    """
+    ETA sin Google Maps: modelo calibrado con el histórico (ver
+    `fit_eta_model`) y, si no tiene datos, la heurística de distancia.
+    """
+    eta = None
+    if getattr(settings, 'ETA_MODEL_ENABLED', True):
+        eta = eta_model.estimate(distance_km, when)
+    return eta if eta is not None else heuristic_eta(distance_km)
+
+
+_eta_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'DISPATCH_ETA_WORKERS', 32),
+    thread_name_prefix='dispatch-eta',
+)
+
+
+def _maps_eta(location, driver):
+    seconds = GoogleMapsService.get_eta_cached(
+        origin=(location.y, location.x),
+        destination=(driver.current_location.y, driver.current_location.x)
+    )
+    return None if seconds is None else datetime.timedelta(seconds=seconds)
+
+
+def rank_by_eta(location, candidates, budget=None):
+    """
+    Anota cada candidato con `eta` y los retorna ordenados por ETA.
+
+    Las consultas a Google Maps se hacen en paralelo con un presupuesto total
+    de `budget` segundos; los candidatos que no responden a tiempo (o cuando
+    no hay API key, o con ETA_ESTIMATOR = 'model') se estiman con
+    `fallback_eta`.
+    """
+    budget = budget if budget is not None else getattr(settings, 'DISPATCH_ETA_BUDGET_SECONDS', 1.5)
+    use_maps = getattr(settings, 'ETA_ESTIMATOR', 'maps') == 'maps'
+    futures = {}
+    if use_maps and getattr(settings, 'GOOGLE_MAPS_API_KEY', None):
+        # copy_context: the Maps calls count towards the request's timings
+        futures = {
+            driver.pk: _eta_executor.submit(contextvars.copy_context().run, _maps_eta, location, driver)
+            for driver in candidates
+        }
+        wait(futures.values(), timeout=budget)
+
+    return _apply_etas(candidates, futures)
+
+
+def _apply_etas(candidates, futures):
+    for driver in candidates:
+        future = futures.get(driver.pk)
+        eta = None
+        if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+            eta = future.result()
+        elif future is not None:
+            future.cancel()
+        driver.eta = eta if eta is not None else fallback_eta(driver.distance.km)
+    return sorted(candidates, key=lambda driver: (driver.eta, driver.distance))
+
+
+async def _amaps_eta(location, driver):
+    seconds = await GoogleMapsService.aget_eta_cached(
+        origin=(location.y, location.x),
+        destination=(driver.current_location.y, driver.current_location.x)
+    )
+    return None if seconds is None else datetime.timedelta(seconds=seconds)
+
+
+async def arank_by_eta(location, candidates, budget=None):
+    """
+    Variante asíncrona de rank_by_eta: las consultas a Google Maps corren
+    como tareas del event loop con el mismo presupuesto total.
+    """
+    budget = budget if budget is not None else getattr(settings, 'DISPATCH_ETA_BUDGET_SECONDS', 1.5)
+    if getattr(settings, 'ETA_MODEL_ENABLED', True) and eta_model.needs_reload():
+        await sync_to_async(eta_model.ensure_loaded)()
+
+    use_maps = getattr(settings, 'ETA_ESTIMATOR', 'maps') == 'maps'
+    tasks = {}
+    if use_maps and getattr(settings, 'GOOGLE_MAPS_API_KEY', None):
+        tasks = {driver.pk: asyncio.ensure_future(_amaps_eta(location, driver)) for driver in candidates}
+        await asyncio.wait(tasks.values(), timeout=budget)
+
+    return _apply_etas(candidates, tasks)
+
+
+def assign_fastest_driver(location, limit=None, attempts=None):
+    """
+    Busca los `limit` conductores más cercanos, los ordena por ETA y reclama
+    el primero libre (sin bloqueos mientras se consulta Google Maps). Si
+    todos fueron tomados por solicitudes concurrentes, repite la búsqueda
+    hasta `attempts` veces.
+
+    Returns:
+        Driver | None: conductor reclamado, anotado con `eta` y `distance`
+    """
+    limit = limit or getattr(settings, 'DISPATCH_CANDIDATES', 5)
+    attempts = attempts or getattr(settings, 'DISPATCH_CLAIM_ATTEMPTS', 3)
+    for _ in range(attempts):
+        candidates = find_candidates(location, limit=limit)
+        if not candidates:
+            return None
+        driver = claim_driver(rank_by_eta(location, candidates))
+        if driver is not None:
+            return driver
+    return None
+
+
+async def aassign_fastest_driver(location, limit=None, attempts=None):
+    """
+    Variante asíncrona de assign_fastest_driver
+    """
+    limit = limit or getattr(settings, 'DISPATCH_CANDIDATES', 5)
+    attempts = attempts or getattr(settings, 'DISPATCH_CLAIM_ATTEMPTS', 3)
+    for _ in range(attempts):
+        candidates = await afind_candidates(location, limit=limit)
+        if not candidates:
+            return None
+        driver = await aclaim_driver(await arank_by_eta(location, candidates))
+        if driver is not None:
+            return driver
+    return None
+
+
+def _search_bbox(locations, radius_m):
+    lats = [location.y for location in locations]
+    lngs = [location.x for location in locations]
+    dlat = radius_m / METERS_PER_DEGREE
+    max_lat = min(89.0, max(abs(lat) for lat in lats) + dlat)
+    dlng = min(180.0, dlat / math.cos(math.radians(max_lat)))
+    return Polygon.from_bbox((
+        max(-180.0, min(lngs) - dlng),
+        max(-90.0, min(lats) - dlat),
+        min(180.0, max(lngs) + dlng),
+        min(90.0, max(lats) + dlat),
+    ))
+
+
+def _claim_drivers(driver_ids, now):
+    """
+    Un solo `UPDATE ... WHERE status='available'` condicional sobre
+    `driver_ids`.
+
+    Returns:
+        set: ids de los conductores reclamados
+    """
+    if not driver_ids:
+        return set()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Driver._meta.db_table}
+            SET status = 'in_service', updated_at = %s
+            WHERE id = ANY(%s) AND status = 'available'
+            RETURNING id
+            """,
+            [now, list(driver_ids)],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _match_and_claim(pickups, radius_m, now, attempts=None):
+    """
+    Empareja `pickups` con los conductores disponibles cercanos con
+    distancia total mínima y reclama solo los emparejados. Los candidatos se
+    leen sin bloqueo, así que varios workers no se quitan la flota entera;
+    las recogidas cuyo conductor tomó otro proceso se vuelven a emparejar
+    con los restantes (hasta `attempts` rondas).
+
+    Returns:
+        tuple[list[tuple[int, Driver, float]], list[Driver]]: (recogida,
+        conductor reclamado, distancia en metros) por pareja y los
+        conductores que ya no están disponibles
+    """
+    attempts = attempts or getattr(settings, 'DISPATCH_CLAIM_ATTEMPTS', 3)
+    drivers = list(Driver.objects.select_related('address').filter(
+        status='available',
+        current_location__intersects=_search_bbox(pickups, radius_m),
+    ))
+    if getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+        location_buffer.overlay(drivers)
+
+    matched, taken = [], []
+    rows = list(range(len(pickups)))
+    for _ in range(attempts):
+        distances = distance_matrix_m(
+            [(pickups[row].y, pickups[row].x) for row in rows],
+            [(driver.current_location.y, driver.current_location.x) for driver in drivers],
+        )
+        matches = match_min_cost(distances, radius_m)
+        if not matches:
+            break
+        claimed = _claim_drivers([drivers[column].pk for _, column, _ in matches], now)
+        lost = False
+        for index, column, distance_m in matches:
+            driver = drivers[column]
+            taken.append(driver)
+            if driver.pk in claimed:
+                driver.status = 'in_service'
+                driver.updated_at = now
+                matched.append((rows[index], driver, distance_m))
+            else:
+                lost = True
+        if not lost:
+            break
+        used = {column for _, column, _ in matches}
+        served = {rows[index] for index, column, _ in matches if drivers[column].pk in claimed}
+        drivers = [driver for column, driver in enumerate(drivers) if column not in used]
+        rows = [row for row in rows if row not in served]
+    return matched, taken
+
+
+def _drivers_assigned(drivers):
+    for driver in drivers:
+        driver_index.discard(driver.pk)
+    response_cache.invalidate_drivers(driver.pk for driver in drivers)
+
+
+def assign_batch(requests, radius_m=SEARCH_RADIUS_M):
+    """
+    Crea y asigna un lote de servicios con un emparejamiento global de
+    distancia mínima entre recogidas y conductores disponibles.
+
+    Args:
+        requests: lista de dicts con customer_name, customer_phone y
+            pickup_address (Address con location)
+
+    Returns:
+        tuple[list[Service], list[int]]: servicios creados e índices de las
+        solicitudes sin conductor dentro de `radius_m`
+    """
+    if not requests:
+        return [], []
+    pickups = [item['pickup_address'].location for item in requests]
+
+    with transaction.atomic():
+        now = timezone.now()
+        matches, taken = _match_and_claim(pickups, radius_m, now)
+
+        services = []
+        for row, driver, distance_m in matches:
+            item = requests[row]
+            services.append(Service(
+                customer_name=item['customer_name'],
+                customer_phone=item['customer_phone'],
+                pickup_address=item['pickup_address'],
+                driver=driver,
+                status='assigned',
+                estimated_arrival=fallback_eta(distance_m / 1000, now),
+                pickup_distance=distance_m,
+                assigned_at=now,
+            ))
+        Service.objects.bulk_create(services)
+
+    _drivers_assigned(taken)
+
+    matched_rows = {row for row, _, _ in matches}
+    return services, [row for row in range(len(requests)) if row not in matched_rows]
+
+
+def enqueue_service(**fields):
+    """
+    Crea el servicio como 'requested' para que lo asigne `dispatch_worker`
+    """
+    return Service.objects.create(status='requested', dispatch_after=timezone.now(), **fields)
+
+
+async def aenqueue_service(**fields):
+    return await Service.objects.acreate(status='requested', dispatch_after=timezone.now(), **fields)
+
+
+def dispatch_queued(batch_size=100, radius_m=SEARCH_RADIUS_M, retry_seconds=None, timeout_seconds=None):
+    """
+    Toma hasta `batch_size` servicios vencidos de la cola (FOR UPDATE SKIP
+    LOCKED, así varios workers no se pisan) y los asigna con el mismo
+    emparejamiento global que `assign_batch`.
+
+    Los que no encuentran conductor se reintentan después de
+    `retry_seconds`; los que llevan más de `timeout_seconds` en la cola se
+    cancelan.
+
+    Returns:
+        tuple[list[Service], list[Service], list[Service]]: asignados,
+        reprogramados y cancelados
+    """
+    retry_seconds = retry_seconds if retry_seconds is not None else getattr(
+        settings, 'DISPATCH_QUEUE_RETRY_SECONDS', 5)
+    timeout_seconds = timeout_seconds if timeout_seconds is not None else getattr(
+        settings, 'DISPATCH_QUEUE_TIMEOUT_SECONDS', 300)
+
+    with transaction.atomic():
+        now = timezone.now()
+        queued = list(
+            Service.objects.select_related('pickup_address').select_for_update(
+                skip_locked=True, of=('self',)
+            ).filter(status='requested', dispatch_after__lte=now).order_by('dispatch_after')[:batch_size]
+        )
+        if not queued:
+            return [], [], []
+
+        expires = now - datetime.timedelta(seconds=timeout_seconds)
+        expired, pending = [], []
+        for service in queued:
+            located = service.pickup_address is not None and service.pickup_address.location is not None
+            (pending if located and service.requested_at > expires else expired).append(service)
+
+        matches, taken = [], []
+        if pending:
+            matches, taken = _match_and_claim(
+                [service.pickup_address.location for service in pending], radius_m, now,
+            )
+        assigned = []
+        for row, driver, distance_m in matches:
+            service = pending[row]
+            service.driver = driver
+            service.status = 'assigned'
+            service.estimated_arrival = fallback_eta(distance_m / 1000, now)
+            service.pickup_distance = distance_m
+            service.assigned_at = now
+            service.dispatch_after = None
+            service.updated_at = now
+            assigned.append(service)
+
+        matched_rows = {row for row, _, _ in matches}
+        deferred = [service for row, service in enumerate(pending) if row not in matched_rows]
+        for service in deferred:
+            service.dispatch_after = now + datetime.timedelta(seconds=retry_seconds)
+            service.updated_at = now
+        for service in expired:
+            service.status = 'cancelled'
+            service.cancelled_at = now
+            service.dispatch_after = None
+            service.updated_at = now
+
+        Service.objects.bulk_update(assigned, [
+            'driver', 'status', 'estimated_arrival', 'pickup_distance', 'assigned_at', 'dispatch_after', 'updated_at',
+        ])
+        Service.objects.bulk_update(deferred + expired, ['status', 'cancelled_at', 'dispatch_after', 'updated_at'])
+
+    _drivers_assigned(taken)
+    return assigned, deferred, expired
+
+
+def refine_etas(services, budget=None):
+    """
+    Reemplaza el ETA estimado de servicios ya asignados por el de Google
+    Maps, consultado en paralelo con el mismo presupuesto que la asignación
+    en línea. Fuera de la transacción de asignación: no retiene bloqueos
+    mientras espera a Maps.
+    """
+    budget = budget if budget is not None else getattr(settings, 'DISPATCH_ETA_BUDGET_SECONDS', 1.5)
+    if getattr(settings, 'ETA_ESTIMATOR', 'maps') != 'maps' or not getattr(settings, 'GOOGLE_MAPS_API_KEY', None):
+        return []
+    futures = {
+        service.pk: _eta_executor.submit(
+            contextvars.copy_context().run, _maps_eta, service.pickup_address.location, service.driver,
+        )
+        for service in services
+    }
+    wait(futures.values(), timeout=budget)
+
+    refined = []
+    now = timezone.now()
+    for service in services:
+        future = futures[service.pk]
+        if future.done() and not future.cancelled() and future.exception() is None and future.result() is not None:
+            service.estimated_arrival = future.result()
+            # bulk_update skips auto_now; conditional GETs depend on updated_at
+            service.updated_at = now
+            refined.append(service)
+        else:
+            future.cancel()
+    Service.objects.bulk_update(refined, ['estimated_arrival', 'updated_at'])
+    return refined
+
+
+def queue_stats():
+    """
+    Profundidad de la cola de asignación y antigüedad del servicio más
+    viejo (segundos)
+    """
+    now = timezone.now()
+    stats = Service.objects.filter(status='requested', dispatch_after__isnull=False).aggregate(
+        depth=Count('pk'),
+        due=Count('pk', filter=Q(dispatch_after__lte=now)),
+        oldest=Min('requested_at'),
+    )
+    oldest = stats.pop('oldest')
+    stats['oldest_age_seconds'] = (now - oldest).total_seconds() if oldest else 0.0
+    return stats
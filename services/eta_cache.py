@@ -0,0 +1,206 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+
+class ETACache:
+    """
+    Caché de tiempos estimados de llegada sobre el backend de caché de Django.
+
+    La llave combina las celdas cuantizadas de origen y destino con el tramo
+    horario del día. Las entradas son frescas durante `ttl` segundos; durante
+    los `stale_ttl` segundos siguientes se sirven vencidas mientras se
+    refrescan en segundo plano. El número de llaves está acotado con
+    desalojo LRU.
+    """
+
+    def __init__(self, alias=None, ttl=None, stale_ttl=None, max_entries=None,
+                 cell_size=None, bucket_minutes=None, refresh_workers=2, clock=time.time):
+        self.alias = alias or getattr(settings, 'ETA_CACHE_ALIAS', 'default')
+        self.ttl = ttl if ttl is not None else getattr(settings, 'ETA_CACHE_TTL', 300)
+        self.stale_ttl = stale_ttl if stale_ttl is not None else getattr(settings, 'ETA_CACHE_STALE_TTL', 600)
+        self.max_entries = max_entries or getattr(settings, 'ETA_CACHE_MAX_ENTRIES', 10000)
+        self.cell_size = cell_size or getattr(settings, 'ETA_CACHE_CELL_SIZE', 0.005)
+        self.bucket_minutes = bucket_minutes or getattr(settings, 'ETA_CACHE_BUCKET_MINUTES', 15)
+        self.clock = clock
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='eta-refresh')
+        self._refreshing = set()
+        self._futures = set()
+        self._counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+        }
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def make_key(self, origin, destination, when=None):
+        """
+        Args:
+            origin (tuple): (lat, lng) de origen
+            destination (tuple): (lat, lng) de destino
+            when (datetime, optional): momento de la consulta, por defecto ahora
+        """
+        local = timezone.localtime(when or timezone.now())
+        bucket = (local.hour * 60 + local.minute) // self.bucket_minutes
+        return 'eta:{}:{}:{}:{}:{}'.format(
+            self._cell(origin[0]), self._cell(origin[1]),
+            self._cell(destination[0]), self._cell(destination[1]),
+            bucket,
+        )
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _touch(self, key):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+
+    def _store(self, key, seconds):
+        self.cache.set(key, (seconds, self.clock()), timeout=self.ttl + self.stale_ttl)
+        evicted = []
+        with self._lock:
+            self._lru[key] = True
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                evicted.append(self._lru.popitem(last=False)[0])
+            self._counters['evictions'] += len(evicted)
+        if evicted:
+            self.cache.delete_many(evicted)
+
+    def _refresh(self, key, fetch):
+        try:
+            seconds = fetch()
+            if seconds is not None:
+                self._store(key, seconds)
+            self._count('refreshes')
+        except Exception:
+            self._count('refresh_errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _schedule_refresh(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        future = self._executor.submit(self._refresh, key, fetch)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+
+    def _classify(self, key, entry):
+        """
+        Returns:
+            tuple[str, int | None]: ('fresh' | 'stale' | 'miss', segundos)
+        """
+        if entry is not None:
+            seconds, stored_at = entry
+            age = self.clock() - stored_at
+            if age < self.ttl:
+                self._count('hits')
+                self._touch(key)
+                return 'fresh', seconds
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._touch(key)
+                return 'stale', seconds
+        self._count('misses')
+        return 'miss', None
+
+    def get_or_fetch(self, origin, destination, fetch, when=None):
+        """
+        Retorna el ETA en segundos para el par origen/destino, llamando a
+        `fetch()` solo si no hay una entrada utilizable.
+        """
+        key = self.make_key(origin, destination, when)
+        state, seconds = self._classify(key, self.cache.get(key))
+        if state == 'stale':
+            self._schedule_refresh(key, fetch)
+        if state != 'miss':
+            return seconds
+
+        seconds = fetch()
+        if seconds is not None:
+            self._store(key, seconds)
+        return seconds
+
+    async def aget_or_fetch(self, origin, destination, fetch, when=None):
+        """
+        Variante asíncrona de get_or_fetch; `fetch()` retorna un awaitable.
+        Los refrescos de entradas vencidas corren como tareas del event loop.
+        """
+        key = self.make_key(origin, destination, when)
+        state, seconds = self._classify(key, await self.cache.aget(key))
+        if state == 'stale':
+            with self._lock:
+                refreshing = key in self._refreshing
+                self._refreshing.add(key)
+            if not refreshing:
+                asyncio.ensure_future(self._arefresh(key, fetch))
+        if state != 'miss':
+            return seconds
+
+        seconds = await fetch()
+        if seconds is not None:
+            self._store(key, seconds)
+        return seconds
+
+    async def _arefresh(self, key, fetch):
+        try:
+            seconds = await fetch()
+            if seconds is not None:
+                self._store(key, seconds)
+            self._count('refreshes')
+        except Exception:
+            self._count('refresh_errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def wait_for_refreshes(self, timeout=None):
+        """
+        Espera a que terminen los refrescos en segundo plano (útil en pruebas)
+        """
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._lru)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._lru)
+            self._lru.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+        self.cache.delete_many(keys)
+
+
+eta_cache = ETACache()
@@ -0,0 +1,135 @@
+import datetime
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+# Upper bounds (km) of the distance bands; the last band is open-ended
+DISTANCE_BANDS_KM = (1, 2, 5, 10, 20, 50)
+BANDS = len(DISTANCE_BANDS_KM) + 1
+HOURS_PER_WEEK = 168
+
+# Samples outside these limits are treated as data errors
+MIN_DISTANCE_KM = 0.05
+MAX_TRAVEL_SECONDS = 3 * 3600
+
+
+def hour_of_week(when):
+    local = timezone.localtime(when)
+    return local.weekday() * 24 + local.hour
+
+
+def distance_band(distance_km):
+    return int(np.searchsorted(DISTANCE_BANDS_KM, distance_km, side='right'))
+
+
+def fit_paces(hours, distances_km, seconds, min_samples=5):
+    """
+    Ajusta el ritmo mediano (segundos por km) por hora de la semana y banda
+    de distancia.
+
+    Args:
+        hours: hora de la semana (0-167) de cada servicio
+        distances_km: distancia conductor-recogida de cada servicio
+        seconds: tiempo real entre asignación e inicio de cada servicio
+        min_samples (int): muestras mínimas para publicar una celda
+
+    Returns:
+        list[tuple[int, int, float, int]]: (hora, banda, s/km, muestras)
+    """
+    hours = np.asarray(hours, dtype=np.int64)
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    seconds = np.asarray(seconds, dtype=np.float64)
+
+    valid = (
+        (distances_km >= MIN_DISTANCE_KM)
+        & (seconds > 0)
+        & (seconds <= MAX_TRAVEL_SECONDS)
+        & (hours >= 0)
+        & (hours < HOURS_PER_WEEK)
+    )
+    hours, distances_km, seconds = hours[valid], distances_km[valid], seconds[valid]
+    if not len(hours):
+        return []
+
+    pace = seconds / distances_km
+    group = hours * BANDS + np.searchsorted(DISTANCE_BANDS_KM, distances_km, side='right')
+    order = np.lexsort((pace, group))
+    group, pace = group[order], pace[order]
+
+    cells, start, counts = np.unique(group, return_index=True, return_counts=True)
+    medians = (pace[start + (counts - 1) // 2] + pace[start + counts // 2]) / 2
+    keep = counts >= min_samples
+    return [
+        (int(cell // BANDS), int(cell % BANDS), float(median), int(count))
+        for cell, median, count in zip(cells[keep], medians[keep], counts[keep])
+    ]
+
+
+class TravelTimeModel:
+    """
+    Tabla en memoria de ritmos de viaje cargada desde TravelTimeCell.
+
+    Las celdas sin datos suficientes usan el ritmo promedio de su banda de
+    distancia; si la banda tampoco tiene datos `estimate` retorna None.
+    """
+
+    def __init__(self, reload_seconds=300):
+        self.reload_seconds = reload_seconds
+        self._table = None
+        self._band_pace = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self, cells=None):
+        """
+        Args:
+            cells: iterable de (hora, banda, s/km, muestras); por defecto
+                se leen de la base de datos
+        """
+        if cells is None:
+            from .models import TravelTimeCell
+
+            cells = TravelTimeCell.objects.values_list(
+                'hour_of_week', 'distance_band', 'seconds_per_km', 'samples'
+            )
+        table = np.full((HOURS_PER_WEEK, BANDS), np.nan)
+        weighted = np.zeros(BANDS)
+        samples = np.zeros(BANDS)
+        for hour, band, pace, count in cells:
+            table[hour, band] = pace
+            weighted[band] += pace * count
+            samples[band] += count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            band_pace = np.where(samples > 0, weighted / samples, np.nan)
+
+        with self._lock:
+            self._table = table
+            self._band_pace = band_pace
+            self._loaded_at = time.monotonic()
+
+    def needs_reload(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_seconds
+
+    def ensure_loaded(self):
+        if self.needs_reload():
+            self.load()
+
+    def estimate(self, distance_km, when=None):
+        """
+        Returns:
+            datetime.timedelta | None: ETA estimado para `distance_km`
+        """
+        self.ensure_loaded()
+        band = distance_band(distance_km)
+        pace = self._table[hour_of_week(when or timezone.now()), band]
+        if pace != pace:
+            pace = self._band_pace[band]
+            if pace != pace:
+                return None
+        return datetime.timedelta(seconds=round(float(pace) * distance_km))
+
+
+eta_model = TravelTimeModel(reload_seconds=getattr(settings, 'ETA_MODEL_RELOAD_SECONDS', 300))
@@ -0,0 +1,137 @@
+import functools
+import json
+
+from rest_framework import serializers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+class UnsupportedValue(Exception):
+    """
+    Valor que el camino rápido no puede reproducir byte a byte; quien llama
+    debe usar el serializador de DRF.
+    """
+
+
+def _float(value):
+    value = float(value)
+    # Outside this range repr() switches to exponent notation, which orjson
+    # writes differently (1e-05 vs 0.00001); NaN/inf are rejected by DRF
+    if value and not 1e-4 <= abs(value) < 1e16:
+        raise UnsupportedValue(value)
+    return value
+
+
+def _converter(field):
+    """
+    Función que convierte el valor crudo de la base de datos en lo mismo que
+    produce `field.to_representation` (None si es la identidad).
+    """
+    if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField,
+                          serializers.SerializerMethodField, serializers.HiddenField)):
+        raise TypeError(f'{type(field).__name__} is not supported')
+    if isinstance(field, (serializers.CharField, serializers.ChoiceField, serializers.ReadOnlyField)):
+        return None
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+    if isinstance(field, serializers.FloatField):
+        return _float
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.ModelField):
+        # Model fields without a DRF mapping (e.g. PointField) render value_to_string()
+        return str
+    return field.to_representation
+
+
+class RowSerializer:
+    """
+    Representación de solo lectura de un ModelSerializer a partir de filas
+    de `values_list`, sin instancias de modelo ni de serializador por fila.
+
+    Las columnas y conversiones se derivan de los campos del serializador,
+    incluidos los anidados (que se traen con JOIN), así que la salida tiene
+    la misma forma y orden de llaves que `serializer.data`.
+    """
+
+    def __init__(self, serializer_class):
+        self.lookups = []
+        self._plan = self._compile(serializer_class(), '')
+
+    def _column(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return self.lookups.index(lookup)
+
+    def _compile(self, serializer, prefix):
+        pk_index = self._column(prefix + serializer.Meta.model._meta.pk.name)
+        entries = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if '.' in field.source or field.source == '*':
+                raise TypeError(f'Field source {field.source!r} is not supported')
+            if isinstance(field, serializers.ListSerializer):
+                raise TypeError('Nested lists are not supported')
+            if isinstance(field, serializers.BaseSerializer):
+                entries.append((name, None, self._compile(field, f'{prefix}{field.source}__')))
+            else:
+                entries.append((name, self._column(prefix + field.source), _converter(field)))
+        return pk_index, entries
+
+    def values(self, queryset, extra=()):
+        """
+        Proyección de `queryset` con las columnas del serializador (más
+        `extra`, p. ej. los campos de orden del paginador) como namedtuples
+        """
+        lookups = self.lookups + [lookup for lookup in extra if lookup not in self.lookups]
+        return queryset.values_list(*lookups, named=True)
+
+    @classmethod
+    def _convert(cls, row, plan):
+        pk_index, entries = plan
+        if row[pk_index] is None:
+            return None
+        data = {}
+        for name, index, convert in entries:
+            if index is None:
+                data[name] = cls._convert(row, convert)
+            else:
+                value = row[index]
+                data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def to_representation(self, row):
+        return self._convert(row, self._plan)
+
+    def to_representation_many(self, rows):
+        plan = self._plan
+        return [self._convert(row, plan) for row in rows]
+
+
+@functools.lru_cache(maxsize=None)
+def row_serializer_for(serializer_class):
+    """
+    Returns:
+        RowSerializer | None: None si el serializador tiene campos que el
+        camino rápido no soporta
+    """
+    try:
+        return RowSerializer(serializer_class)
+    except TypeError:
+        return None
+
+
+def render_json(data):
+    """
+    Mismos bytes que JSONRenderer de DRF (compacto, UTF-8, U+2028/U+2029
+    escapados) usando orjson cuando está instalado.
+    """
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+    return body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,12 +1,22 @@
+import logging
+
+import httpx
 import requests
 from django.conf import settings
 from typing import Optional, Dict, Any, Tuple
+from .http_client import AsyncPooledHttpClient, CircuitOpenError, PooledHttpClient
+
+logger = logging.getLogger(__name__)
 
 class GoogleMapsService:
     """
     Servicio para interactuar con la API de Google Maps Directions
     """
-    
+
+    # Shared pooled session with timeouts, retries and circuit breaker
+    client = PooledHttpClient()
+    async_client = AsyncPooledHttpClient(breaker=client.breaker)
+
     @staticmethod
     def get_eta_with_traffic(**kwargs) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
         """
@@ -27,12 +37,52 @@ class GoogleMapsService:
         Returns:
             int: Tiempo estimado en segundos o None si hay error
         """
+        base_url, params = GoogleMapsService._build_request(kwargs)
+        
+        try:
+            
+            response = GoogleMapsService.client.get(base_url, params=params)
+            return GoogleMapsService._parse_duration(response.json())
+        
+        except CircuitOpenError:
+            # Upstream is failing: short-circuit to the caller's fallback
+            return None
+        except (requests.exceptions.RequestException, ValueError, KeyError, IndexError) as exc:
+            logger.warning("Error al obtener datos de Google Maps API: %r", exc)
+            return None
+
+    @staticmethod
+    async def aget_eta_with_traffic(**kwargs) -> Optional[int]:
+        """
+        Variante asíncrona de get_eta_with_traffic (mismos parámetros) que
+        usa un cliente HTTP asíncrono y comparte el circuit breaker.
+
+        Returns:
+            int: Tiempo estimado en segundos o None si hay error
+        """
+        base_url, params = GoogleMapsService._build_request(kwargs)
+
+        try:
+            response = await GoogleMapsService.async_client.get(base_url, params=params)
+            return GoogleMapsService._parse_duration(response.json())
+
+        except CircuitOpenError:
+            return None
+        except (httpx.HTTPError, ValueError, KeyError, IndexError) as exc:
+            logger.warning("Error al obtener datos de Google Maps API: %r", exc)
+            return None
+
+    @staticmethod
+    def _build_request(kwargs) -> Tuple[str, Dict[str, Any]]:
         required_params = ['origin', 'destination']
         for param in required_params:
             if param not in kwargs:
                 raise ValueError(f"Falta el parámetro requerido: {param}")
         
-        base_url = "https://maps.googleapis.com/maps/api/directions/json"
+        base_url = getattr(
+            settings, 'GOOGLE_MAPS_DIRECTIONS_URL',
+            "https://maps.googleapis.com/maps/api/directions/json"
+        )
         
         # Usar API key de settings si no se proporciona
         api_key = kwargs.get('api_key', getattr(settings, 'GOOGLE_MAPS_API_KEY', None))
@@ -56,24 +106,74 @@ class GoogleMapsService:
             params['region'] = kwargs['region']
         if 'alternatives' in kwargs:
             params['alternatives'] = str(kwargs['alternatives']).lower()
+
+        return base_url, params
+
+    @staticmethod
+    def _parse_duration(data) -> Optional[int]:
+        if data['status'] != 'OK' or not data.get('routes'):
+            return None
         
-        try:
-            
-            response = requests.get(base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data['status'] != 'OK' or not data.get('routes'):
-                return None
-            
-            if data['routes'] == []:
-                return None
+        if data['routes'] == []:
+            return None
 
-            duration_sec = data['routes'][0]['legs'][0]['duration']['value']
-            
-            
-            return duration_sec
+        duration_sec = data['routes'][0]['legs'][0]['duration']['value']
         
-        except (requests.exceptions.RequestException, KeyError, IndexError):
-            print("Error al obtener datos de Google Maps API")
-            return None
\ No newline at end of file
+        
+        return duration_sec
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        """
+        Estado del circuit breaker e histograma de latencias de la API
+        """
+        stats = GoogleMapsService.client.stats()
+        stats['async_latency'] = GoogleMapsService.async_client.latency.snapshot()
+        return stats
+
+    @staticmethod
+    def _coordinates(origin, destination) -> Dict[str, str]:
+        return {
+            'origin': f"{origin[0]},{origin[1]}",
+            'destination': f"{destination[0]},{destination[1]}",
+        }
+
+    @staticmethod
+    def get_eta_cached(origin, destination, **kwargs) -> Optional[int]:
+        """
+        ETA con tráfico usando la caché cuantizada de `eta_cache`
+
+        Args:
+            origin (tuple): (lat, lng) de origen
+            destination (tuple): (lat, lng) de destino
+            **kwargs: parámetros adicionales para get_eta_with_traffic
+
+        Returns:
+            int: Tiempo estimado en segundos o None si hay error
+        """
+        from .eta_cache import eta_cache
+
+        def fetch():
+            return GoogleMapsService.get_eta_with_traffic(
+                **GoogleMapsService._coordinates(origin, destination), **kwargs
+            )
+
+        if not getattr(settings, 'ETA_CACHE_ENABLED', True):
+            return fetch()
+        return eta_cache.get_or_fetch(origin, destination, fetch)
+
+    @staticmethod
+    async def aget_eta_cached(origin, destination, **kwargs) -> Optional[int]:
+        """
+        Variante asíncrona de get_eta_cached
+        """
+        from .eta_cache import eta_cache
+
+        def fetch():
+            return GoogleMapsService.aget_eta_with_traffic(
+                **GoogleMapsService._coordinates(origin, destination), **kwargs
+            )
+
+        if not getattr(settings, 'ETA_CACHE_ENABLED', True):
+            return await fetch()
+        return await eta_cache.aget_or_fetch(origin, destination, fetch)
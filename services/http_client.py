@@ -0,0 +1,254 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import record
+from .metrics import Histogram
+
+
+class CircuitOpenError(Exception):
+    """
+    El circuito está abierto: la llamada se descarta sin tocar la red
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: se abre tras `failure_threshold` fallos
+    consecutivos, rechaza llamadas durante `reset_timeout` segundos y luego
+    deja pasar una llamada de prueba (half-open).
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
+
+
+class _BaseHttpClient:
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None,
+                 retries=None, backoff=None, breaker=None):
+        self.pool_size = pool_size or getattr(settings, 'MAPS_HTTP_POOL_SIZE', 20)
+        self.connect_timeout = connect_timeout or getattr(settings, 'MAPS_HTTP_CONNECT_TIMEOUT', 1.0)
+        self.read_timeout = read_timeout or getattr(settings, 'MAPS_HTTP_READ_TIMEOUT', 3.0)
+        self.retries = retries if retries is not None else getattr(settings, 'MAPS_HTTP_RETRIES', 2)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'MAPS_HTTP_BACKOFF', 0.1)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=getattr(settings, 'MAPS_BREAKER_FAILURE_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'MAPS_BREAKER_RESET_TIMEOUT', 30.0),
+        )
+        self.latency = Histogram()
+
+    def _retry_delay(self, attempt):
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def stats(self):
+        return {
+            'breaker': self.breaker.stats(),
+            'latency': self.latency.snapshot(),
+        }
+
+
+class PooledHttpClient(_BaseHttpClient):
+    """
+    Cliente HTTP con sesión compartida (pool de conexiones keep-alive),
+    timeouts de conexión/lectura, reintentos acotados con jitter y circuit
+    breaker.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def get(self, url, params=None):
+        """
+        GET con reintentos. Lanza CircuitOpenError si el circuito está
+        abierto y requests.RequestException si se agotan los reintentos.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(url)
+
+        settled = False
+        try:
+            last_error = None
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    time.sleep(self._retry_delay(attempt - 1))
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(
+                        url, params=params, timeout=(self.connect_timeout, self.read_timeout)
+                    )
+                except requests.RequestException as exc:
+                    last_error = exc
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self.latency.observe(elapsed)
+                    record('maps', elapsed)
+
+                if response.status_code in self.RETRYABLE_STATUS:
+                    last_error = requests.exceptions.HTTPError(
+                        f'{response.status_code} Server Error', response=response
+                    )
+                    continue
+
+                # The upstream answered: a 4xx is our problem, not an outage
+                self.breaker.record_success()
+                settled = True
+                response.raise_for_status()
+                return response
+        finally:
+            # Exhausted retries or any unexpected error: count it and free
+            # the half-open trial
+            if not settled:
+                self.breaker.record_failure()
+        raise last_error
+
+
+class AsyncPooledHttpClient(_BaseHttpClient):
+    """
+    Equivalente asíncrono de PooledHttpClient sobre httpx.AsyncClient.
+    Mantiene un cliente (y su pool) por event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size * 10,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def get(self, url, params=None):
+        """
+        GET con reintentos. Lanza CircuitOpenError si el circuito está
+        abierto y httpx.HTTPError si se agotan los reintentos.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(url)
+
+        settled = False
+        try:
+            last_error = None
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(self._retry_delay(attempt - 1))
+                started = time.perf_counter()
+                try:
+                    response = await self.client.get(url, params=params)
+                except httpx.TransportError as exc:
+                    last_error = exc
+                    continue
+                finally:
+                    elapsed = time.perf_counter() - started
+                    self.latency.observe(elapsed)
+                    record('maps', elapsed)
+
+                if response.status_code in self.RETRYABLE_STATUS:
+                    last_error = httpx.HTTPStatusError(
+                        f'{response.status_code} Server Error', request=response.request, response=response
+                    )
+                    continue
+
+                self.breaker.record_success()
+                settled = True
+                response.raise_for_status()
+                return response
+        finally:
+            # Exhausted retries, but also cancellation (the dispatch budget
+            # ran out) or any other error: count it and free the half-open
+            # trial, which is shared with the sync client
+            if not settled:
+                self.breaker.record_failure()
+        raise last_error
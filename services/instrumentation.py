@@ -0,0 +1,220 @@
+import contextlib
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+
+from .metrics import Histogram, PrometheusText
+
+PHASES = ('db', 'maps', 'serialize')
+
+# Query count buckets for the per-request histogram
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+# Finer than the default buckets: database and serialization times are
+# often below 5 ms
+PHASE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Tiempos de una petición por fase (db, maps, serialize).
+
+    Las fases anidadas en el mismo hilo se descuentan de la fase que las
+    contiene: una consulta lanzada mientras se serializa cuenta como `db`,
+    no como `serialize`. Los tiempos de Maps se suman por llamada, así que
+    con llamadas en paralelo pueden superar el tiempo total.
+    """
+
+    __slots__ = ('durations', 'counts', '_open', '_lock')
+
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.durations[phase] += seconds
+            self.counts[phase] += 1
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        stack = self._open.setdefault(threading.get_ident(), [])
+        # Re-entrant (e.g. nested serializers): the outer block already counts
+        if any(entry[0] == phase for entry in stack):
+            yield
+            return
+        entry = [phase, 0.0]
+        stack.append(entry)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+            self.add(phase, elapsed - entry[1])
+
+
+def current_timings():
+    return _current.get()
+
+
+def activate(timings):
+    """
+    Returns:
+        contextvars.Token: para `deactivate`
+    """
+    return _current.set(timings)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """
+    Mide el bloque como `phase` de la petición en curso (nada si no hay)
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.timed(phase):
+        yield
+
+
+def record(phase, seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    with timings.timed('db'):
+        return execute(sql, params, many, context)
+
+
+def install_db_wrapper(connection, **kwargs):
+    """
+    Receptor de `connection_created`. Se inserta al principio de la lista
+    para que `connection.execute_wrapper()` (que saca el último) no lo quite.
+    """
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _db_wrapper)
+
+
+class TimedSerializerMixin:
+    """
+    Cuenta `to_representation` como la fase `serialize` de la petición
+    """
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class RequestMetrics:
+    """
+    Histogramas por vista (o `ViewSet.action`) de tiempo total, tiempo por
+    fase y número de consultas, más un contador por vista y código HTTP.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._responses = {}
+
+    def _histograms(self, view):
+        histograms = self._views.get(view)
+        if histograms is None:
+            with self._lock:
+                histograms = self._views.setdefault(view, {
+                    'total': Histogram(),
+                    'queries': Histogram(QUERY_BUCKETS),
+                    **{phase: Histogram(PHASE_BUCKETS) for phase in PHASES},
+                })
+        return histograms
+
+    def observe(self, view, status_code, total, timings):
+        histograms = self._histograms(view)
+        histograms['total'].observe(total)
+        histograms['queries'].observe(timings.counts['db'])
+        for phase in PHASES:
+            histograms[phase].observe(timings.durations[phase])
+        with self._lock:
+            key = (view, status_code)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def export(self, output):
+        with self._lock:
+            views = dict(self._views)
+            responses = dict(self._responses)
+        for (view, status_code), count in sorted(responses.items()):
+            output.value('http_requests_total', count, {'view': view, 'status': status_code},
+                         kind='counter', help_text='Requests per view and status code')
+        families = [
+            ('http_request_duration_seconds', 'total', 'Total request time'),
+            ('http_request_db_queries', 'queries', 'Database queries per request'),
+        ] + [(f'http_request_{phase}_seconds', phase, f'Time per request spent in {phase}') for phase in PHASES]
+        # Prometheus expects each family's samples to be contiguous
+        for name, key, help_text in families:
+            for view, histograms in sorted(views.items()):
+                output.histogram(name, histograms[key].snapshot(), {'view': view}, help_text=help_text)
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+            self._responses = {}
+
+
+request_metrics = RequestMetrics()
+
+
+def server_timing(timings, total):
+    """
+    Valor del header Server-Timing (duraciones en milisegundos)
+    """
+    return ', '.join([
+        f'db;dur={timings.durations["db"] * 1000:.1f};desc="{timings.counts["db"]} queries"',
+        f'maps;dur={timings.durations["maps"] * 1000:.1f};desc="{timings.counts["maps"]} calls"',
+        f'serialize;dur={timings.durations["serialize"] * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+def render_metrics():
+    """
+    Métricas de las peticiones y de los componentes (caché de ETA, cliente
+    de Maps, caché de respuestas, búsqueda por anillos, cola de asignación,
+    buffer de posiciones) en formato Prometheus
+    """
+    from .dispatch import queue_stats
+    from .eta_cache import eta_cache
+    from .google_maps_time import GoogleMapsService
+    from .location_buffer import location_buffer
+    from .response_cache import response_cache
+    from .search_rings import search_rings
+    from .spatial_index import driver_index
+
+    output = PrometheusText()
+    request_metrics.export(output)
+    output.stats('eta_cache', eta_cache.stats(), help_text='ETA cache')
+    output.stats('maps', GoogleMapsService.stats(), help_text='Google Maps HTTP client')
+    output.stats('response_cache', response_cache.stats(), help_text='Rendered response cache')
+    output.value('driver_index_drivers', len(driver_index), help_text='Available drivers in the spatial index')
+    output.stats('dispatch_rings', search_rings.stats(), help_text='Expanding-radius candidate searches')
+    if getattr(settings, 'DISPATCH_QUEUE_ENABLED', False):
+        output.stats('dispatch_queue', queue_stats(), help_text='Services waiting for a driver')
+    if getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+        output.stats('location_buffer', location_buffer.stats(), help_text='GPS write-behind buffer')
+    return output.render()
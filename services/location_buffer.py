@@ -0,0 +1,229 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection
+
+from .metrics import Histogram
+from .spatial_index import driver_index
+
+logger = logging.getLogger(__name__)
+
+
+class LocationBuffer:
+    """
+    Buffer write-behind de posiciones GPS.
+
+    Guarda solo la última posición de cada conductor y la escribe en lote
+    (con `writer`, por defecto `apply_pings`) cada `flush_interval` segundos
+    o cuando acumula `flush_size` conductores, en el hilo de `start` (la
+    petición solo lo despierta). Las lecturas (`get`, `overlay`) ven las
+    posiciones aún no escritas.
+
+    La memoria está acotada por `max_entries`: con el buffer lleno se
+    rechazan las posiciones de conductores que no tiene, y si una escritura
+    falla sus posiciones vuelven mientras quepan y el resto se descarta.
+    """
+
+    def __init__(self, flush_interval=None, flush_size=None, max_entries=None, writer=None):
+        self.flush_interval = flush_interval or getattr(settings, 'LOCATION_BUFFER_FLUSH_SECONDS', 2.0)
+        self.flush_size = flush_size or getattr(settings, 'LOCATION_BUFFER_FLUSH_SIZE', 5000)
+        self.max_entries = max_entries or getattr(settings, 'LOCATION_BUFFER_MAX_ENTRIES', 100000)
+        self._writer = writer
+        self._pending = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flush_latency = Histogram()
+        self._counters = {
+            'received': 0,
+            'coalesced': 0,
+            'out_of_order': 0,
+            'flushed': 0,
+            'written': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'dropped': 0,
+        }
+
+    @property
+    def writer(self):
+        if self._writer is None:
+            from .locations import apply_pings
+
+            self._writer = apply_pings
+        return self._writer
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, pings):
+        """
+        Args:
+            pings (dict): {id: (lat, lng, ts)} como lo retorna parse_pings
+
+        Returns:
+            int: posiciones aceptadas (no las más viejas que la ya guardada
+            ni las nuevas que no caben en `max_entries`)
+        """
+        accepted = []
+        with self._lock:
+            self._counters['received'] += len(pings)
+            for driver_id, ping in pings.items():
+                current = self._pending.get(driver_id) or self._flushing.get(driver_id)
+                if current is not None and current[2] >= ping[2]:
+                    self._counters['out_of_order'] += 1
+                    continue
+                if driver_id in self._pending:
+                    self._counters['coalesced'] += 1
+                elif len(self._pending) >= self.max_entries:
+                    self._counters['dropped'] += 1
+                    continue
+                self._pending[driver_id] = ping
+                accepted.append((driver_id, ping))
+            full = len(self._pending) >= self.flush_size
+            background = self._thread is not None
+
+        for driver_id, (lat, lng, _) in accepted:
+            driver_index.move(driver_id, lat, lng)
+        if full:
+            if background:
+                self._wake.set()
+            else:
+                self.flush()
+        return len(accepted)
+
+    def get(self, driver_id):
+        """
+        Returns:
+            tuple | None: (lat, lng, ts) aún no escrita para el conductor
+        """
+        with self._lock:
+            return self._pending.get(driver_id) or self._flushing.get(driver_id)
+
+    def positions(self):
+        """
+        Returns:
+            dict: {id: (lat, lng, ts)} aún no escritas en la base de datos
+        """
+        with self._lock:
+            return {**self._flushing, **self._pending}
+
+    def overlay(self, drivers):
+        """
+        Reemplaza `current_location` de cada conductor por su posición en el
+        buffer, si la tiene. Retorna los conductores cuya posición cambió.
+        """
+        moved = []
+        with self._lock:
+            if not self._pending and not self._flushing:
+                return moved
+            for driver in drivers:
+                ping = self._pending.get(driver.pk) or self._flushing.get(driver.pk)
+                if ping is not None:
+                    driver.current_location = Point(ping[1], ping[0], srid=4326)
+                    moved.append(driver)
+        return moved
+
+    def flush(self):
+        """
+        Escribe las posiciones pendientes; retorna cuántas se enviaron
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+
+            started = time.perf_counter()
+            try:
+                written = self.writer(batch)
+            except Exception:
+                logger.exception('Location buffer flush failed')
+                self._restore(batch)
+                return 0
+            finally:
+                with self._lock:
+                    self._flushing = {}
+            self.flush_latency.observe(time.perf_counter() - started)
+
+            with self._lock:
+                self._counters['flushes'] += 1
+                self._counters['flushed'] += len(batch)
+                self._counters['written'] += written
+            return len(batch)
+
+    def _restore(self, batch):
+        with self._lock:
+            self._counters['flush_errors'] += 1
+            for driver_id, ping in batch.items():
+                if driver_id in self._pending:
+                    continue  # a newer ping arrived during the flush
+                if len(self._pending) >= self.max_entries:
+                    self._counters['dropped'] += 1
+                    continue
+                self._pending[driver_id] = ping
+
+    def start(self):
+        """
+        Inicia el hilo que vacía el buffer cada `flush_interval` segundos
+        y registra el vaciado final al terminar el proceso.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._wake.clear()
+            self._thread = threading.Thread(target=self._run, name='location-buffer', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            # Every flush_interval, or earlier when add() fills flush_size
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def stop(self):
+        """
+        Detiene el hilo de vaciado y escribe lo pendiente
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._pending)
+        # Share of received pings that never reached the database
+        stats['coalescing_ratio'] = 1 - stats['flushed'] / stats['received'] if stats['received'] else 0.0
+        stats['flush_latency'] = self.flush_latency.snapshot()
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._pending = {}
+            for name in self._counters:
+                self._counters[name] = 0
+        self.flush_latency.reset()
+
+
+location_buffer = LocationBuffer()
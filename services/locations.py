@@ -0,0 +1,100 @@
+import datetime
+import uuid
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Driver
+from .response_cache import response_cache
+from .spatial_index import driver_index
+
+# Response cache scope bumped once per batch of pings; driver details
+# include it so a flush doesn't version every driver separately
+LOCATIONS_SCOPE = 'driver-locations'
+
+
+def _parse_timestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc)
+    if isinstance(value, str):
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+        return parsed
+    raise ValueError(value)
+
+
+def parse_pings(payload):
+    """
+    Valida una lista de posiciones {id, lat, lng, ts} sin serializadores de
+    DRF. De cada conductor se conserva solo la posición más reciente.
+
+    `ts` es un epoch en segundos o una fecha ISO 8601.
+
+    Returns:
+        tuple[dict, list]: {id: (lat, lng, ts)} y errores [{index, detail}]
+    """
+    pings = {}
+    errors = []
+    for index, item in enumerate(payload):
+        try:
+            driver_id = uuid.UUID(str(item['id']))
+            lat = float(item['lat'])
+            lng = float(item['lng'])
+            ts = _parse_timestamp(item['ts'])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            errors.append({'index': index, 'detail': 'Se requieren id, lat, lng y ts validos'})
+            continue
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+            errors.append({'index': index, 'detail': 'Coordenadas fuera de rango'})
+            continue
+        current = pings.get(driver_id)
+        if current is None or current[2] < ts:
+            pings[driver_id] = (lat, lng, ts)
+    return pings, errors
+
+
+def apply_pings(pings):
+    """
+    Escribe las posiciones con un solo UPDATE ... FROM unnest(...) que solo
+    toca current_location, location_updated_at y updated_at. Las posiciones
+    más viejas que la última aplicada a cada conductor se descartan.
+
+    Args:
+        pings (dict): {id: (lat, lng, ts)} como lo retorna parse_pings
+
+    Returns:
+        int: número de conductores actualizados
+    """
+    if not pings:
+        return 0
+    ids, lats, lngs, timestamps = [], [], [], []
+    for driver_id, (lat, lng, ts) in pings.items():
+        ids.append(str(driver_id))
+        lats.append(lat)
+        lngs.append(lng)
+        timestamps.append(ts)
+
+    table = Driver._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} AS d
+            SET current_location = ST_SetSRID(ST_MakePoint(u.lng, u.lat), 4326)::geography,
+                location_updated_at = u.ts,
+                updated_at = %s
+            FROM unnest(%s::uuid[], %s::float8[], %s::float8[], %s::timestamptz[]) AS u(id, lat, lng, ts)
+            WHERE d.id = u.id
+              AND (d.location_updated_at IS NULL OR d.location_updated_at < u.ts)
+            RETURNING d.id, d.status, u.lat, u.lng
+            """,
+            [timezone.now(), ids, lats, lngs, timestamps],
+        )
+        rows = cursor.fetchall()
+
+    for driver_id, status, lat, lng in rows:
+        if status == 'available':
+            driver_index.upsert(driver_id, lat, lng)
+    if rows:
+        response_cache.invalidate('driver', LOCATIONS_SCOPE)
+    return len(rows)
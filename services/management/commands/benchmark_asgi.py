@@ -0,0 +1,111 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+
+from services.benchmarking import StubMapsServer, random_point, seed_drivers, summarize
+from services.models import Address, Driver, Service
+from services.spatial_index import driver_index
+
+
+class Command(BaseCommand):
+    help = 'Compares WSGI (threaded) vs ASGI (async) dispatch throughput against a slow stub Maps endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Dispatches per run')
+        parser.add_argument('--drivers', type=int, default=1000, help='Seeded available drivers')
+        parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--concurrency', type=int, default=200, help='In-flight ASGI requests')
+        parser.add_argument('--latency', type=float, default=0.2, help='Stub Maps latency in seconds')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user, _ = User.objects.get_or_create(username='benchmark-asgi')
+        seed_drivers(options['drivers'], rng)
+        pickups = [
+            Address.objects.create(
+                street=f'Benchmark {index}', city='Bogota', state='Bogota',
+                zip_code='00000', country='Colombia', location=random_point(rng),
+            )
+            for index in range(20)
+        ]
+        bench_drivers = Driver.objects.filter(email__endswith='@bench.local')
+
+        try:
+            with StubMapsServer(delay=options['latency']) as stub, override_settings(
+                GOOGLE_MAPS_API_KEY='benchmark',
+                GOOGLE_MAPS_DIRECTIONS_URL=stub.url,
+                ETA_CACHE_ENABLED=False,
+            ):
+                results = {}
+                for name, runner in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                    Service.objects.filter(pickup_address__in=pickups).delete()
+                    bench_drivers.update(status='available')
+                    driver_index.sync()
+                    results[name] = runner(user, pickups, options)
+        finally:
+            Service.objects.filter(pickup_address__in=pickups).delete()
+            bench_drivers.delete()
+            Address.objects.filter(pk__in=[pickup.pk for pickup in pickups]).delete()
+            user.delete()
+            driver_index.clear()
+
+        for name, (elapsed, latencies, codes) in results.items():
+            stats = summarize(latencies)
+            self.stdout.write(
+                f"{name.upper()}: {len(latencies) / elapsed:.1f} req/s, "
+                f"p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms, "
+                f"201s={codes.count(201)}/{len(codes)}"
+            )
+
+    @staticmethod
+    def _payload(pickups, index):
+        return {
+            'customer_name': f'Benchmark {index}',
+            'customer_phone': '0000000000',
+            'pickup_address_id': str(pickups[index % len(pickups)].id),
+        }
+
+    def run_wsgi(self, user, pickups, options):
+        def dispatch(index):
+            client = Client(headers={'host': 'localhost'})
+            client.force_login(user)
+            started = time.perf_counter()
+            try:
+                response = client.post(
+                    '/api/services/', self._payload(pickups, index), content_type='application/json'
+                )
+                return time.perf_counter() - started, response.status_code
+            finally:
+                close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            outcomes = list(executor.map(dispatch, range(options['requests'])))
+        return time.perf_counter() - started, [o[0] for o in outcomes], [o[1] for o in outcomes]
+
+    def run_asgi(self, user, pickups, options):
+        async def run():
+            client = AsyncClient(headers={'host': 'localhost'})
+            await client.aforce_login(user)
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def dispatch(index):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        '/api/async/services/', self._payload(pickups, index), content_type='application/json'
+                    )
+                    return time.perf_counter() - started, response.status_code
+
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(dispatch(index) for index in range(options['requests'])))
+            return time.perf_counter() - started, [o[0] for o in outcomes], [o[1] for o in outcomes]
+
+        return asyncio.run(run())
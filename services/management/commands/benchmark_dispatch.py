@@ -0,0 +1,199 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.contrib.gis.db.models.functions import Distance
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from services.benchmarking import StubMapsServer, percentile, random_point, seed_drivers, summarize
+from services.models import Address, Driver, Service
+from services.spatial_index import driver_index
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Load-tests POST /api/services/ against a seeded fleet and a stub Maps endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=1000, help='Seeded available drivers')
+        parser.add_argument('--requests', type=int, default=500, help='Dispatch requests to send')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[16],
+                            help='Requests in flight (threads); several values run one round each, e.g. 1 2 4 8')
+        parser.add_argument('--pickups', type=int, default=50, help='Distinct pickup addresses')
+        parser.add_argument('--latency', type=float, default=0.05, help='Stub Maps latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Extra random stub latency in seconds')
+        parser.add_argument('--eta-cache', action='store_true', help='Keep the ETA cache enabled')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', metavar='PATH', help="Write the results as JSON ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or min(options['concurrency']) < 1 or options['pickups'] < 1:
+            raise CommandError('--requests, --concurrency and --pickups must be positive')
+
+        rng = random.Random(options['seed'])
+        user, _ = User.objects.get_or_create(username='benchmark-dispatch')
+        seed_drivers(options['drivers'], rng)
+        pickups = Address.objects.bulk_create([
+            Address(street=f'Benchmark {index}', city='Bogota', state='Bogota',
+                    zip_code='00000', country='Colombia', location=random_point(rng))
+            for index in range(options['pickups'])
+        ])
+        bench_drivers = Driver.objects.filter(email__endswith='@bench.local')
+
+        runs = []
+        try:
+            nearest = self.nearest_distances(pickups, bench_drivers)
+            used_pickups = [
+                distance for distance in (
+                    nearest[pickups[index % len(pickups)].pk] for index in range(options['requests'])
+                ) if distance is not None
+            ]
+            with StubMapsServer(delay=options['latency'], jitter=options['jitter']) as stub, override_settings(
+                GOOGLE_MAPS_API_KEY='benchmark',
+                GOOGLE_MAPS_DIRECTIONS_URL=stub.url,
+                ETA_CACHE_ENABLED=options['eta_cache'],
+            ):
+                for concurrency in options['concurrency']:
+                    # Every round starts from the same free fleet
+                    Service.objects.filter(pickup_address__in=pickups).delete()
+                    bench_drivers.update(status='available')
+                    driver_index.sync()
+                    maps_before = stub.requests
+                    elapsed, outcomes = self.run(user, pickups, options['requests'], concurrency)
+                    runs.append(self.summarize_run(
+                        concurrency, elapsed, outcomes, stub.requests - maps_before, pickups, used_pickups,
+                    ))
+        finally:
+            Service.objects.filter(pickup_address__in=pickups).delete()
+            bench_drivers.delete()
+            Address.objects.filter(pk__in=[pickup.pk for pickup in pickups]).delete()
+            user.delete()
+            driver_index.clear()
+
+        result = {
+            'revision': _git_revision(),
+            'timestamp': timezone.now().isoformat(),
+            'options': {name: options[name] for name in (
+                'drivers', 'requests', 'concurrency', 'pickups', 'latency', 'jitter', 'eta_cache', 'seed',
+            )},
+            'runs': runs,
+        }
+
+        if options['json']:
+            body = json.dumps(result, indent=2)
+            if options['json'] == '-':
+                self.stdout.write(body)
+                return
+            with open(options['json'], 'w') as output:
+                output.write(body + '\n')
+        self.report(result)
+
+    @staticmethod
+    def summarize_run(concurrency, elapsed, outcomes, maps_calls, pickups, used_pickups):
+        services = Service.objects.filter(pickup_address__in=pickups)
+        distances = [
+            distance for distance in services.values_list('pickup_distance', flat=True) if distance is not None
+        ]
+        assigned = services.filter(driver__isnull=False).count()
+        latencies = [outcome[0] for outcome in outcomes]
+        queries = [outcome[2] for outcome in outcomes]
+        return {
+            'concurrency': concurrency,
+            'elapsed_s': elapsed,
+            'throughput_rps': len(outcomes) / elapsed,
+            'assignments_per_s': assigned / elapsed,
+            'latency': summarize(latencies),
+            'status_codes': {str(code): count for code, count in sorted(Counter(o[1] for o in outcomes).items())},
+            'queries_per_request': {
+                'mean': statistics.fmean(queries),
+                'p95': percentile(queries, 95),
+                'max': max(queries),
+            },
+            'maps_calls_per_request': maps_calls / len(outcomes),
+            'assignment': {
+                'assigned': assigned,
+                'mean_pickup_distance_m': statistics.fmean(distances) if distances else None,
+                'p95_pickup_distance_m': percentile(distances, 95) if distances else None,
+                # Lower bound: closest seeded driver to each pickup before any assignment
+                'mean_nearest_at_start_m': statistics.fmean(used_pickups) if used_pickups else None,
+            },
+        }
+
+    @staticmethod
+    def nearest_distances(pickups, drivers):
+        nearest = {}
+        for pickup in pickups:
+            closest = drivers.filter(status='available', current_location__isnull=False).annotate(
+                distance=Distance('current_location', pickup.location),
+            ).order_by('distance').values_list('distance', flat=True).first()
+            nearest[pickup.pk] = closest.m if closest is not None else None
+        return nearest
+
+    def run(self, user, pickups, requests, concurrency):
+        def dispatch(index):
+            client = Client(headers={'host': 'localhost'})
+            client.force_login(user)
+            payload = {
+                'customer_name': f'Benchmark {index}',
+                'customer_phone': '0000000000',
+                'pickup_address_id': str(pickups[index % len(pickups)].id),
+            }
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.post('/api/services/', payload, content_type='application/json')
+                    latency = time.perf_counter() - started
+                return latency, response.status_code, len(captured)
+            finally:
+                close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(dispatch, range(requests)))
+        return time.perf_counter() - started, outcomes
+
+    def report(self, result):
+        for run in result['runs']:
+            latency, queries, assignment = run['latency'], run['queries_per_request'], run['assignment']
+            self.stdout.write(
+                f"\nconcurrency={run['concurrency']}: {run['throughput_rps']:.1f} req/s, "
+                f"{run['assignments_per_s']:.1f} assignments/s over {run['elapsed_s']:.2f}s, "
+                f"p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms p99={latency['p99_ms']:.1f}ms"
+            )
+            self.stdout.write(f"  Status codes: {run['status_codes']}")
+            self.stdout.write(
+                f"  Queries/request: mean={queries['mean']:.1f} p95={queries['p95']} max={queries['max']}, "
+                f"Maps calls/request: {run['maps_calls_per_request']:.2f}"
+            )
+            if assignment['mean_pickup_distance_m'] is not None:
+                self.stdout.write(
+                    f"  Assigned {assignment['assigned']}: mean pickup distance "
+                    f"{assignment['mean_pickup_distance_m']:.0f}m (p95 {assignment['p95_pickup_distance_m']:.0f}m, "
+                    f"nearest at start {assignment['mean_nearest_at_start_m'] or 0:.0f}m)"
+                )
+
+        if len(result['runs']) > 1:
+            # Scaling relative to the first (usually lowest) concurrency
+            base = result['runs'][0]['assignments_per_s'] or 1
+            self.stdout.write(f"\n{'workers':>8} {'assignments/s':>14} {'speedup':>8}")
+            for run in result['runs']:
+                self.stdout.write(
+                    f"{run['concurrency']:>8} {run['assignments_per_s']:>14.1f} {run['assignments_per_s'] / base:>7.2f}x"
+                )
@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from services.benchmarking import StubMapsServer, summarize
+from services.dispatch import rank_by_eta
+
+
+class Command(BaseCommand):
+    help = 'Compares a single Maps ETA call against the concurrent top-K candidate fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=5)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--latency', type=float, default=0.15, help='Stub Maps latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.1, help='Extra random stub latency in seconds')
+        parser.add_argument('--budget', type=float, default=1.5, help='Overall ETA budget in seconds')
+
+    def handle(self, *args, **options):
+        pickup = Point(-74.0543, 4.6708)
+        candidates = [
+            SimpleNamespace(
+                pk=index,
+                current_location=Point(-74.0543 + 0.003 * index, 4.6708 - 0.002 * index),
+                distance=D(m=400 * (index + 1)),
+            )
+            for index in range(options['candidates'])
+        ]
+
+        with StubMapsServer(delay=options['latency'], jitter=options['jitter']) as stub:
+            with override_settings(
+                GOOGLE_MAPS_API_KEY='benchmark',
+                GOOGLE_MAPS_DIRECTIONS_URL=stub.url,
+                ETA_CACHE_ENABLED=False,
+            ):
+                single = []
+                fanout = []
+                for _ in range(options['iterations']):
+                    started = time.perf_counter()
+                    rank_by_eta(pickup, candidates[:1], budget=options['budget'])
+                    single.append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    rank_by_eta(pickup, candidates, budget=options['budget'])
+                    fanout.append(time.perf_counter() - started)
+
+        for name, samples in (('single ETA', single), (f"top-{options['candidates']} fan-out", fanout)):
+            stats = summarize(samples)
+            self.stdout.write(
+                f"{name:<16} mean={stats['mean_ms']:.1f}ms p50={stats['p50_ms']:.1f}ms "
+                f"p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms"
+            )
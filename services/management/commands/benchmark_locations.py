@@ -0,0 +1,63 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from services.benchmarking import BOGOTA_BOUNDS, rolled_back, seed_drivers
+from services.locations import apply_pings, parse_pings
+from services.models import Driver
+from services.spatial_index import driver_index
+
+
+class Command(BaseCommand):
+    help = 'Measures bulk GPS ping ingestion (pings/s) through POST /api/drivers/locations/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=50000)
+        parser.add_argument('--batch', type=int, default=5000, help='Pings per request')
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Seeded drivers only live inside the benchmark transaction
+        rolled_back(self.run, options)
+        driver_index.clear()
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        seed_drivers(options['drivers'], rng)
+        ids = [str(pk) for pk in Driver.objects.filter(email__endswith='@bench.local').values_list('id', flat=True)]
+        user = User.objects.create_user(username='benchmark-locations')
+        client = Client(headers={'host': 'localhost'})
+        client.force_login(user)
+        lat_min, lat_max, lng_min, lng_max = BOGOTA_BOUNDS
+
+        def batches():
+            ts = time.time()
+            for _ in range(options['rounds']):
+                ts += 1
+                yield [
+                    {'id': driver_id, 'lat': rng.uniform(lat_min, lat_max), 'lng': rng.uniform(lng_min, lng_max), 'ts': ts}
+                    for driver_id in rng.sample(ids, min(options['batch'], len(ids)))
+                ]
+
+        payloads = list(batches())
+        total = sum(len(payload) for payload in payloads)
+
+        started = time.perf_counter()
+        for payload in payloads[:len(payloads) // 2]:
+            apply_pings(parse_pings(payload)[0])
+        direct = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for payload in payloads[len(payloads) // 2:]:
+            response = client.post('/api/drivers/locations/', json.dumps(payload), content_type='application/json')
+            assert response.status_code == 200, response.content
+        http = time.perf_counter() - started
+
+        half = total / 2
+        self.stdout.write(f'parse + UPDATE: {half / direct:,.0f} pings/s')
+        self.stdout.write(f'HTTP endpoint:  {half / http:,.0f} pings/s ({options["batch"]} per request)')
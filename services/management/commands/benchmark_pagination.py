@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from services.benchmarking import rolled_back, summarize
+from services.models import Service
+
+
+class Command(BaseCommand):
+    help = 'Measures GET /api/services/ page latency at increasing depths, cursor vs OFFSET'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=1000000, help='Synthetic services to insert')
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 100, 1000],
+                            help='Page depths to time')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per depth')
+
+    def handle(self, *args, **options):
+        # Seeded services only live inside the benchmark transaction
+        rolled_back(self.run, options)
+
+    def seed(self, count):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Service._meta.db_table}
+                    (id, customer_name, customer_phone, status, requested_at, updated_at)
+                SELECT gen_random_uuid(), 'Bench', '0000000000', 'completed',
+                       now() - make_interval(secs => n), now()
+                FROM generate_series(1, %s) AS n
+                """,
+                [count],
+            )
+            cursor.execute(f'ANALYZE {Service._meta.db_table}')
+        self.stdout.write(f'Inserted {count} services in {time.perf_counter() - started:.1f}s')
+
+    def run(self, options):
+        self.seed(options['services'])
+        client = Client(headers={'host': 'localhost'})
+        page_size = options['page_size']
+        depths = sorted(options['pages'])
+
+        # Walk the cursor chain once to collect the link to each depth
+        links = {}
+        url = f'/api/services/?page_size={page_size}'
+        for page in range(1, depths[-1] + 1):
+            if page in depths:
+                links[page] = url
+            url = client.get(url).json()['next']
+            if url is None:
+                break
+
+        self.stdout.write(f'\n{"page":>6} {"cursor p50":>12} {"cursor p95":>12} {"offset p50":>12} {"offset p95":>12}')
+        for page, link in links.items():
+            cursor_stats = self.time(lambda: client.get(link), options['repeat'])
+            offset = (page - 1) * page_size
+            offset_stats = self.time(lambda: list(
+                Service.objects.select_related('pickup_address', 'driver__address')[offset:offset + page_size]
+            ), options['repeat'])
+            self.stdout.write(
+                f"{page:>6} {cursor_stats['p50_ms']:>10.2f}ms {cursor_stats['p95_ms']:>10.2f}ms "
+                f"{offset_stats['p50_ms']:>10.2f}ms {offset_stats['p95_ms']:>10.2f}ms"
+            )
+
+    @staticmethod
+    def time(func, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        return summarize(samples)
@@ -0,0 +1,116 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from services.benchmarking import (
+    BOGOTA_BOUNDS, percentile, random_point, rolled_back, rows_examined, seed_drivers, summarize,
+)
+from services.dispatch import _candidates_queryset, _search_rings
+from services.models import Driver
+from services.search_rings import search_rings
+
+# Sparse area around the eastern plains (lat_min, lat_max, lng_min, lng_max)
+SPARSE_BOUNDS = (3.0, 6.0, -73.0, -70.0)
+
+
+class Command(BaseCommand):
+    help = 'Compares rows examined (EXPLAIN ANALYZE) and latency of the expanding-ring search vs the fixed radius'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dense', type=int, default=50000, help='Available drivers in Bogotá')
+        parser.add_argument('--sparse', type=int, default=300, help='Available drivers over the eastern plains')
+        parser.add_argument('--queries', type=int, default=200, help='Measured searches per area')
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='Searches per area before measuring, so the zone statistics settle')
+        parser.add_argument('--limit', type=int, default=5, help='Candidates per search')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['queries'] < 1 or options['limit'] < 1:
+            raise CommandError('--queries and --limit must be positive')
+        # Start from empty zone statistics: the warm-up searches fill them
+        search_rings.load([])
+        search_rings.reset_stats()
+        try:
+            # Seeded drivers only live inside the benchmark transaction
+            results = rolled_back(self.run, options)
+        finally:
+            search_rings.load([])
+            search_rings.reset_stats()
+
+        for area, strategies in results.items():
+            self.stdout.write(f'\n{area}')
+            for name, stats in strategies.items():
+                latency = stats['latency']
+                self.stdout.write(
+                    f"  {name:<6} rows examined mean={stats['rows_mean']:.0f} p95={stats['rows_p95']:.0f} "
+                    f"queries={stats['queries_mean']:.2f} "
+                    f"latency mean={latency['mean_ms']:.2f}ms p50={latency['p50_ms']:.2f}ms "
+                    f"p95={latency['p95_ms']:.2f}ms"
+                )
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        Driver.objects.filter(status='available').update(status='offline')
+        seed_drivers(options['dense'], rng)
+        seed_drivers(options['sparse'], rng, bounds=SPARSE_BOUNDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Driver._meta.db_table}')
+
+        limit, radius_m = options['limit'], search_rings.max_radius_m
+        results = {}
+        for area, bounds in (('dense (Bogotá)', BOGOTA_BOUNDS), ('sparse (eastern plains)', SPARSE_BOUNDS)):
+            pickups = [random_point(rng, bounds) for _ in range(options['warmup'] + options['queries'])]
+            for pickup in pickups[:options['warmup']]:
+                _search_rings(pickup, limit, radius_m)
+
+            samples = {'fixed': ([], [], []), 'rings': ([], [], [])}
+            for pickup in pickups[options['warmup']:]:
+                plan = search_rings.plan(pickup.y, pickup.x, limit, radius_m)
+                started = time.perf_counter()
+                _search_rings(pickup, limit, radius_m)
+                elapsed = time.perf_counter() - started
+                rows, queries = 0, 0
+                for ring_m in plan:
+                    explained, found = self.explain(_candidates_queryset(pickup, ring_m)[:limit])
+                    rows += explained
+                    queries += 1
+                    if found >= limit:
+                        break
+                self.add(samples['rings'], elapsed, rows, queries)
+
+                queryset = _candidates_queryset(pickup, radius_m)[:limit]
+                started = time.perf_counter()
+                list(queryset)
+                elapsed = time.perf_counter() - started
+                self.add(samples['fixed'], elapsed, self.explain(queryset)[0], 1)
+
+            results[area] = {
+                name: {
+                    'latency': summarize(latencies),
+                    'rows_mean': statistics.fmean(rows),
+                    'rows_p95': percentile(rows, 95),
+                    'queries_mean': statistics.fmean(queries),
+                }
+                for name, (latencies, rows, queries) in samples.items()
+            }
+        return results
+
+    @staticmethod
+    def explain(queryset):
+        """
+        Returns:
+            tuple[int, int]: filas de conductores examinadas y filas retornadas
+        """
+        plan = json.loads(queryset.explain(format='json', analyze=True))[0]['Plan']
+        return rows_examined(plan, Driver._meta.db_table), plan['Actual Rows']
+
+    @staticmethod
+    def add(samples, elapsed, rows, queries):
+        samples[0].append(elapsed)
+        samples[1].append(rows)
+        samples[2].append(queries)
@@ -0,0 +1,72 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from services.benchmarking import random_point, rolled_back, seed_drivers
+from services.fast_serializers import render_json, row_serializer_for
+from services.models import Address, Driver, Service
+from services.serializers import ServiceSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares DRF ServiceSerializer + JSONRenderer against the values_list + orjson read path (rows/s)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Services to serialize')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Seeded rows only live inside the benchmark transaction
+        rolled_back(self.run, options)
+
+    def seed(self, rows, rng):
+        addresses = Address.objects.bulk_create([
+            Address(street=f'Calle {i}', city='Bogota', state='Bogota', zip_code='00000',
+                    country='Colombia', location=random_point(rng))
+            for i in range(rows)
+        ], batch_size=5000)
+        seed_drivers(rows, rng, status='in_service')
+        drivers = list(Driver.objects.filter(email__endswith='@bench.local'))
+        for driver, address in zip(drivers, addresses):
+            driver.address = address
+        Driver.objects.bulk_update(drivers, ['address'], batch_size=5000)
+        now = timezone.now()
+        Service.objects.bulk_create([
+            Service(customer_name=f'Customer {i}', customer_phone='0000000000', pickup_address=address,
+                    driver=driver, status='assigned', assigned_at=now,
+                    estimated_arrival=datetime.timedelta(seconds=rng.randint(60, 1800)),
+                    pickup_distance=rng.uniform(100, 20000))
+            for i, (driver, address) in enumerate(zip(drivers, addresses))
+        ], batch_size=5000)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        self.seed(options['rows'], rng)
+        queryset = Service.objects.filter(customer_phone='0000000000').order_by('-requested_at', '-id')
+        renderer = JSONRenderer()
+        row_serializer = row_serializer_for(ServiceSerializer)
+
+        def drf():
+            services = queryset.select_related('pickup_address', 'driver__address')
+            return renderer.render(ServiceSerializer(services, many=True).data)
+
+        def fast():
+            return render_json(row_serializer.to_representation_many(row_serializer.values(queryset)))
+
+        if drf() != fast():
+            raise CommandError('Fast path output differs from DRF')
+
+        for name, func in (('DRF serializer', drf), ('values_list + orjson', fast)):
+            best = min(self.time(func) for _ in range(options['repeat']))
+            self.stdout.write(f'{name:<22} {options["rows"] / best:>12,.0f} rows/s ({best * 1000:.1f}ms)')
+
+    @staticmethod
+    def time(func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.contrib.gis.db.models.functions import Distance
+from django.core.management.base import BaseCommand
+
+from services.benchmarking import random_point, rolled_back, seed_drivers, summarize
+from services.dispatch import find_candidates
+from services.models import Driver
+from services.spatial_index import driver_index
+
+
+class Command(BaseCommand):
+    help = 'Compares the in-memory driver index against the PostGIS nearest-driver query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='Fleet sizes to benchmark')
+        parser.add_argument('--queries', type=int, default=500, help='Lookups per fleet size')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            # Seeded drivers only live inside the benchmark transaction
+            results = rolled_back(self.run, size, options['queries'], options['seed'])
+            self.stdout.write(f'\n{size} available drivers')
+            for name, stats in results.items():
+                self.stdout.write(
+                    f"  {name:<22} mean={stats['mean_ms']:.3f}ms p50={stats['p50_ms']:.3f}ms "
+                    f"p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms"
+                )
+        driver_index.clear()
+
+    def run(self, size, queries, seed):
+        rng = random.Random(seed)
+        Driver.objects.filter(status='available').update(status='offline')
+        seed_drivers(size, rng)
+
+        started = time.perf_counter()
+        driver_index.sync()
+        self.stdout.write(f'Index sync of {size} drivers: {(time.perf_counter() - started) * 1000:.1f}ms')
+
+        pickups = [random_point(rng) for _ in range(queries)]
+        timings = {'index_lookup': [], 'index_and_confirm': [], 'postgis_query': []}
+
+        for pickup in pickups:
+            started = time.perf_counter()
+            driver_index.nearest(pickup.y, pickup.x, k=5)
+            timings['index_lookup'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            find_candidates(pickup, limit=5)
+            timings['index_and_confirm'].append(time.perf_counter() - started)
+
+            # Previous dispatch path: annotate + order_by, then .exists() and .first()
+            started = time.perf_counter()
+            available_drivers = Driver.objects.filter(
+                status='available',
+                current_location__distance_lte=(pickup, 100000)
+            ).annotate(
+                distance=Distance('current_location', pickup)
+            ).order_by('distance')[:5]
+            if available_drivers.exists():
+                available_drivers.first()
+            timings['postgis_query'].append(time.perf_counter() - started)
+
+        return {name: summarize(samples) for name, samples in timings.items()}
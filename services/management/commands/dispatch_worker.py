@@ -0,0 +1,58 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from services.dispatch import dispatch_queued, refine_etas
+
+
+class Command(BaseCommand):
+    help = 'Assigns drivers to queued services (DISPATCH_QUEUE_ENABLED) in batches; run as many as needed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'DISPATCH_QUEUE_BATCH_SIZE', 100))
+        parser.add_argument('--poll-interval', type=float,
+                            default=getattr(settings, 'DISPATCH_QUEUE_POLL_SECONDS', 0.5),
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no service is due')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        totals = {'assigned': 0, 'deferred': 0, 'cancelled': 0, 'batches': 0}
+        while not self._stopping:
+            close_old_connections()
+            started = time.perf_counter()
+            assigned, deferred, expired = dispatch_queued(batch_size=options['batch_size'])
+            if not (assigned or deferred or expired):
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            # Outside the claim transaction: no locks held while waiting on Maps
+            refine_etas(assigned)
+            totals['assigned'] += len(assigned)
+            totals['deferred'] += len(deferred)
+            totals['cancelled'] += len(expired)
+            totals['batches'] += 1
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f'Batch: {len(assigned)} assigned, {len(deferred)} deferred, {len(expired)} cancelled '
+                    f'in {(time.perf_counter() - started) * 1000:.0f}ms'
+                )
+
+        self.stdout.write(
+            f"{totals['assigned']} assigned, {totals['deferred']} deferred, "
+            f"{totals['cancelled']} cancelled in {totals['batches']} batches"
+        )
+
+    def _stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self._stopping = True
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from services.eta_model import eta_model, fit_paces
+from services.models import Service, TravelTimeCell
+
+
+class Command(BaseCommand):
+    help = 'Fits the offline travel-time model from completed service history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-samples', type=int, default=5,
+                            help='Minimum services per hour-of-week/distance band cell')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        hours, distances_km, seconds = [], [], []
+
+        history = Service.objects.filter(
+            status='completed',
+            assigned_at__isnull=False,
+            started_at__isnull=False,
+        ).annotate(
+            weekday=ExtractIsoWeekDay('assigned_at'),
+            hour=ExtractHour('assigned_at'),
+            travel_time=ExpressionWrapper(F('started_at') - F('assigned_at'), output_field=DurationField()),
+        )
+
+        recorded = history.filter(pickup_distance__isnull=False).values_list(
+            'weekday', 'hour', 'pickup_distance', 'travel_time'
+        )
+        for weekday, hour, distance_m, travel_time in recorded.iterator(chunk_size=10000):
+            hours.append((weekday - 1) * 24 + hour)
+            distances_km.append(distance_m / 1000)
+            seconds.append(travel_time.total_seconds())
+
+        # Services assigned before pickup_distance was recorded: the driver's
+        # current position says nothing about where they were back then
+        skipped = history.filter(pickup_distance__isnull=True).count()
+
+        cells = fit_paces(hours, distances_km, seconds, min_samples=options['min_samples'])
+        with transaction.atomic():
+            TravelTimeCell.objects.all().delete()
+            TravelTimeCell.objects.bulk_create([
+                TravelTimeCell(hour_of_week=hour, distance_band=band, seconds_per_km=pace, samples=count)
+                for hour, band, pace, count in cells
+            ])
+        eta_model.load()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Fitted {len(cells)} cells from {len(seconds)} services '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} services without a recorded pickup distance'))
@@ -1,52 +1,340 @@
-from django.core.management.base import BaseCommand
+import math
+import multiprocessing
+import os
+import random
+import time
+import uuid
+from datetime import timedelta
+
 from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
 from faker import Faker
-import random
-from services.models import Address, Driver
 
-fake = Faker('es_CO')
+from services.bulk import copy_rows
+from services.models import Address, Driver, Service
+from services.response_cache import response_cache
+
+# Legacy uniform box (lat_min, lat_max, lng_min, lng_max)
+BOX_BOUNDS = (4.5, 4.6, -74.2, -74.1)
+
+# name: (city, department, lat, lng, spread in km, share of the points)
+CITIES = {
+    'bogota': ('Bogotá', 'Bogotá D.C.', 4.6486, -74.0940, 6.0, 0.45),
+    'medellin': ('Medellín', 'Antioquia', 6.2476, -75.5658, 4.0, 0.20),
+    'cali': ('Cali', 'Valle del Cauca', 3.4516, -76.5320, 4.0, 0.15),
+    'barranquilla': ('Barranquilla', 'Atlántico', 10.9685, -74.7813, 3.0, 0.12),
+    'bucaramanga': ('Bucaramanga', 'Santander', 7.1193, -73.1227, 2.5, 0.08),
+}
+
+DRIVER_STATUSES = ('available', 'available', 'available', 'offline')
+
+# Relative demand per local hour (0h..23h): morning and evening peaks
+HOURLY_DEMAND = (
+    2, 1, 1, 1, 2, 5, 10, 16, 14, 9, 8, 8,
+    9, 9, 8, 8, 10, 15, 16, 12, 9, 7, 5, 3,
+)
+# Relative demand per ISO weekday - 1 (Monday..Sunday)
+WEEKDAY_DEMAND = (1.0, 1.0, 1.0, 1.0, 1.1, 0.8, 0.6)
+
+# Share of historical services that end cancelled
+CANCELLED_SHARE = 0.07
+
+# Pickups and drivers sampled for historical services
+SAMPLE_SIZE = 100000
+
+# Worker process state, set by _init_worker
+_state = {}
+
+
+def _pace_seconds_per_km(hour):
+    if hour in (6, 7, 8, 17, 18, 19):
+        return 240.0
+    if hour >= 22 or hour < 5:
+        return 100.0
+    return 150.0
+
+
+def _chunk_rng(seed, kind, number):
+    # Seeded per chunk so the output doesn't depend on --workers
+    return random.Random(f'{seed}:{kind}:{number}')
+
+
+def _faker(rng):
+    faker = _state.get('faker')
+    if faker is None:
+        faker = _state['faker'] = Faker('es_CO')
+    faker.seed_instance(rng.getrandbits(64))
+    return faker
+
+
+def _sampler(distribution, cities):
+    """
+    Función rng -> (city, department, lat, lng); city es None en la caja
+    uniforme (se genera con Faker)
+    """
+    if distribution == 'box':
+        lat_min, lat_max, lng_min, lng_max = BOX_BOUNDS
+
+        def sample(rng):
+            return None, None, rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max)
+        return sample
+
+    clusters = [CITIES[name] for name in cities]
+    weights = [cluster[5] for cluster in clusters]
+
+    def sample(rng):
+        city, department, lat, lng, spread_km, _ = rng.choices(clusters, weights)[0]
+        # Gaussian spread around the centre, km converted to degrees
+        lat += rng.gauss(0, spread_km) / 111.32
+        lng += rng.gauss(0, spread_km) / (111.32 * math.cos(math.radians(lat)))
+        return city, department, lat, lng
+    return sample
+
+
+def _addresses(rng, size, config):
+    faker = _faker(rng)
+    sample = _sampler(config['distribution'], config['cities'])
+    addresses = []
+    for _ in range(size):
+        city, department, lat, lng = sample(rng)
+        addresses.append(Address(
+            id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            street=faker.street_address(),
+            city=city or faker.city(),
+            state=department or faker.department(),
+            zip_code=faker.postcode(),
+            country='Colombia',
+            location=Point(lng, lat),
+        ))
+    Address.objects.bulk_create(addresses, batch_size=config['batch_size'])
+
+
+def _drivers(rng, size, config):
+    faker = _faker(rng)
+    sample = _sampler(config['distribution'], config['cities'])
+    drivers = []
+    for _ in range(size):
+        driver_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        _, _, lat, lng = sample(rng)
+        drivers.append(Driver(
+            id=driver_id,
+            first_name=faker.first_name(),
+            last_name=faker.last_name(),
+            # Faker emails collide long before a million rows
+            email=f'driver.{driver_id.hex}@{faker.free_email_domain()}',
+            phone=faker.phone_number(),
+            status=rng.choice(DRIVER_STATUSES),
+            address=None,
+            current_location=Point(lng, lat),
+            rating=round(rng.uniform(3.0, 5.0), 1),
+        ))
+    Driver.objects.bulk_create(drivers, batch_size=config['batch_size'])
+
+
+def _requested_at(rng, now, days):
+    midnight = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    while True:
+        day = midnight - timedelta(days=rng.randrange(days))
+        if rng.random() * max(WEEKDAY_DEMAND) > WEEKDAY_DEMAND[day.weekday()]:
+            continue
+        hour = rng.choices(range(24), HOURLY_DEMAND)[0]
+        requested_at = day + timedelta(hours=hour, seconds=rng.uniform(0, 3600))
+        # Keep clear of the present so every trip has already finished
+        if requested_at < now - timedelta(hours=3):
+            return requested_at
+
+
+def _services(rng, size, config):
+    faker = _faker(rng)
+    pickups, drivers = _state['pickups'], _state['drivers']
+    now = config['now']
+    rows = []
+    for _ in range(size):
+        requested_at = _requested_at(rng, now, config['days'])
+        hour = timezone.localtime(requested_at).hour
+        cancelled = rng.random() < CANCELLED_SHARE
+        cancelled_at = requested_at + timedelta(seconds=rng.uniform(30, 600))
+        row = dict(
+            driver=None, status='cancelled', estimated_arrival=None, pickup_distance=None,
+            assigned_at=None, started_at=None, completed_at=None, cancelled_at=cancelled_at,
+            updated_at=cancelled_at,
+        )
+        # Cancelled services: half of them before a driver was assigned
+        if not (cancelled and rng.random() < 0.5):
+            distance_m = min(rng.lognormvariate(math.log(1500), 0.6), 15000.0)
+            travel = distance_m / 1000 * _pace_seconds_per_km(hour) * rng.uniform(0.85, 1.25) + 30
+            assigned_at = requested_at + timedelta(seconds=rng.lognormvariate(math.log(30), 0.5))
+            row.update(
+                driver=rng.choice(drivers),
+                status='assigned',
+                estimated_arrival=timedelta(seconds=round(travel * rng.uniform(0.8, 1.2))),
+                pickup_distance=round(distance_m, 1),
+                assigned_at=assigned_at,
+                cancelled_at=None,
+                updated_at=assigned_at,
+            )
+            if cancelled:
+                cancelled_at = assigned_at + timedelta(seconds=rng.uniform(10, travel))
+                row.update(status='cancelled', cancelled_at=cancelled_at, updated_at=cancelled_at)
+            else:
+                started_at = assigned_at + timedelta(seconds=travel)
+                completed_at = started_at + timedelta(seconds=rng.lognormvariate(math.log(18 * 60), 0.5))
+                row.update(
+                    status='completed', started_at=started_at,
+                    completed_at=completed_at, updated_at=completed_at,
+                )
+        rows.append((
+            uuid.UUID(int=rng.getrandbits(128), version=4),
+            faker.name(),
+            faker.phone_number(),
+            rng.choice(pickups),
+            row['driver'],
+            row['status'],
+            row['estimated_arrival'],
+            row['pickup_distance'],
+            requested_at,
+            row['assigned_at'],
+            row['started_at'],
+            row['completed_at'],
+            row['cancelled_at'],
+            row['updated_at'],
+        ))
+    # requested_at is auto_now_add, so the ORM would overwrite it: COPY instead
+    copy_rows(Service._meta.db_table, (
+        'id', 'customer_name', 'customer_phone', 'pickup_address_id', 'driver_id', 'status',
+        'estimated_arrival', 'pickup_distance', 'requested_at', 'assigned_at', 'started_at',
+        'completed_at', 'cancelled_at', 'updated_at',
+    ), rows)
+
+
+def _sample_ids(queryset, rng, size=SAMPLE_SIZE):
+    """
+    Muestra uniforme de hasta `size` ids (reservoir sampling en orden de pk:
+    una sola pasada, sin ordenar la tabla al azar ni cargarla entera)
+    """
+    sample = []
+    ids = queryset.order_by('pk').values_list('id', flat=True).iterator(chunk_size=10000)
+    for seen, row_id in enumerate(ids):
+        if seen < size:
+            sample.append(row_id)
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < size:
+                sample[slot] = row_id
+    return sample
+
+
+GENERATORS = {'addresses': _addresses, 'drivers': _drivers, 'services': _services}
+
+
+def _init_worker(settings_module, pickups, drivers):
+    if settings_module:
+        import django
+
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+        django.setup()
+    _state.update(pickups=pickups, drivers=drivers)
+
+
+def _generate(task):
+    kind, number, size, config = task
+    GENERATORS[kind](_chunk_rng(config['seed'], kind, number), size, config)
+    return size
+
+
 class Command(BaseCommand):
-    help = 'Generates test data for addresses and drivers'
+    help = 'Generates test data for addresses and drivers (and optionally historical services)'
 
     def add_arguments(self, parser):
         parser.add_argument('count', type=int, help='Number of addresses and drivers to create')
+        parser.add_argument('--addresses', type=int, help='Addresses to create (default: count)')
+        parser.add_argument('--drivers', type=int, help='Drivers to create (default: count)')
+        parser.add_argument('--services', type=int, default=0,
+                            help='Historical services to create over the last --days')
+        parser.add_argument('--days', type=int, default=90, help='History window for --services')
+        parser.add_argument('--seed', type=int, help='Seed for reproducible data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per insert batch')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes generating and inserting batches in parallel')
+        parser.add_argument('--distribution', choices=('box', 'clusters'), default='box',
+                            help='box: uniform over south Bogotá; clusters: Gaussian around cities')
+        parser.add_argument('--cities', default=','.join(CITIES),
+                            help=f'Comma separated clusters for --distribution=clusters ({", ".join(CITIES)})')
 
     def handle(self, *args, **options):
+        cities = [name.strip() for name in options['cities'].split(',') if name.strip()]
+        unknown = sorted(set(cities) - set(CITIES))
+        if unknown or not cities:
+            raise CommandError(f'Unknown cities: {", ".join(unknown) or "(none)"}')
+        if options['batch_size'] < 1 or options['workers'] < 1 or options['days'] < 1:
+            raise CommandError('--batch-size, --workers and --days must be positive')
+
+        config = {
+            'seed': options['seed'] if options['seed'] is not None else random.randrange(2 ** 32),
+            'batch_size': options['batch_size'],
+            'distribution': options['distribution'],
+            'cities': cities,
+            'days': options['days'],
+            'now': timezone.now(),
+        }
         count = options['count']
-        
-        # Create addresses
-        for _ in range(count):
-            lat = random.uniform(4.5, 4.6)
-            lng = random.uniform(-74.1, -74.2)
-            
-            address = Address.objects.create(
-                street=fake.street_address(),
-                city=fake.city(),
-                state=fake.department(),
-                zip_code=fake.postcode(),
-                country='Colombia',
-                location=Point(lng, lat)
-            )
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully created {count} addresses'))
-        
-        # Create drivers
-        #addresses = list(Address.objects.all())
-        
-        for _ in range(count):
-            #address = random.choice(addresses)
-            lat = random.uniform(4.5, 4.6)
-            lng = random.uniform(-74.1, -74.2)
-            
-            driver = Driver.objects.create(
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                email=fake.email(),
-                phone=fake.phone_number(),
-                status=random.choice(['available', 'available', 'available', 'offline']),
-                address=None,
-                current_location=Point(lng, lat),
-                rating=round(random.uniform(3.0, 5.0), 1)
-            )
-        
-        self.stdout.write(self.style.SUCCESS(f'Successfully created {count} drivers'))
\ No newline at end of file
+        totals = {
+            'addresses': count if options['addresses'] is None else options['addresses'],
+            'drivers': count if options['drivers'] is None else options['drivers'],
+            'services': options['services'],
+        }
+
+        try:
+            for kind in ('addresses', 'drivers'):
+                self._run(kind, totals[kind], config, options['workers'])
+            if totals['services']:
+                # A random sample is enough to spread the history around;
+                # seeded so the same --seed picks the same rows
+                rng = _chunk_rng(config['seed'], 'sample', 0)
+                pickups = _sample_ids(Address.objects.filter(location__isnull=False), rng)
+                drivers = _sample_ids(Driver.objects.all(), rng)
+                if not pickups or not drivers:
+                    raise CommandError('Historical services need drivers and addresses with a location')
+                self._run('services', totals['services'], config, options['workers'], pickups, drivers)
+        finally:
+            # bulk_create and COPY don't send signals
+            response_cache.invalidate('address', 'driver')
+
+        self.stdout.write(f"Seed: {config['seed']}")
+
+    def _run(self, kind, total, config, workers, pickups=(), drivers=()):
+        if total <= 0:
+            return
+        batch_size = config['batch_size']
+        tasks = [
+            (kind, number, min(batch_size, total - start), config)
+            for number, start in enumerate(range(0, total, batch_size))
+        ]
+        started = time.perf_counter()
+        if workers == 1 or len(tasks) == 1:
+            _init_worker(None, list(pickups), list(drivers))
+            self._report(kind, map(_generate, tasks), total, started)
+            return
+
+        # Forked children must not share the parent's database connection
+        connections.close_all()
+        with multiprocessing.Pool(
+            workers, initializer=_init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE'), list(pickups), list(drivers)),
+        ) as pool:
+            self._report(kind, pool.imap_unordered(_generate, tasks), total, started)
+
+    def _report(self, kind, outcomes, total, started):
+        created = 0
+        for size in outcomes:
+            created += size
+            if self.stdout.isatty():
+                self.stdout.write(f'\r{kind}: {created}/{total}', ending='')
+        if self.stdout.isatty():
+            self.stdout.write('')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully created {created} {kind} in {elapsed:.1f}s ({created / elapsed:.0f}/s)'
+        ))
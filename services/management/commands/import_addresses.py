@@ -0,0 +1,48 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.address_import import LOADERS, READERS, detect_format, import_addresses
+
+
+class Command(BaseCommand):
+    help = 'Streams addresses from a CSV or JSON Lines file into the database (COPY by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per COPY/transaction')
+        parser.add_argument('--method', choices=sorted(LOADERS), default='copy')
+        parser.add_argument('--errors', help='Write the per-row error report here (JSON Lines)')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot infer the format, use --format')
+
+        report = open(options['errors'], 'w', encoding='utf-8') if options['errors'] else None
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8-sig', newline='')
+        started = time.perf_counter()
+        try:
+            result = import_addresses(
+                stream,
+                fmt=fmt,
+                chunk_size=options['chunk_size'],
+                method=options['method'],
+                on_error=(lambda error: report.write(json.dumps(error) + '\n')) if report else None,
+                max_errors=0,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if report:
+                report.close()
+
+        elapsed = time.perf_counter() - started
+        rate = (result['created'] + result['failed']) / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} addresses, {result['failed']} rejected "
+            f"in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+        ))
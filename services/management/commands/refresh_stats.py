@@ -0,0 +1,47 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from services.models import HourlyZoneStats, StatsWatermark
+from services.stats import refresh_stats
+
+
+class Command(BaseCommand):
+    help = 'Adds new service events and online driver time to the hourly per-zone stats (GET /api/stats/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep refreshing every --interval seconds')
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'STATS_REFRESH_SECONDS', 60))
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop the stats and watermarks and aggregate the whole history again')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            with transaction.atomic():
+                HourlyZoneStats.objects.all().delete()
+                StatsWatermark.objects.all().delete()
+
+        self._stopping = False
+        if options['loop']:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            close_old_connections()
+            started = time.perf_counter()
+            updated = refresh_stats()
+            self.stdout.write(
+                ', '.join(f'{name}: {rows}' for name, rows in updated.items())
+                + f' rows in {(time.perf_counter() - started) * 1000:.0f}ms'
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _stop(self, signum, frame):
+        # Finish the current refresh, then exit
+        self._stopping = True
@@ -0,0 +1,57 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .spatial_index import EARTH_RADIUS_M
+
+
+def distance_matrix_m(pickups, drivers):
+    """
+    Matriz (recogidas x conductores) de distancias en metros.
+
+    Args:
+        pickups: secuencia de (lat, lng) de las recogidas
+        drivers: secuencia de (lat, lng) de los conductores
+    """
+    p = np.radians(np.asarray(pickups, dtype=np.float64).reshape(-1, 2))
+    d = np.radians(np.asarray(drivers, dtype=np.float64).reshape(-1, 2))
+    p_lat = p[:, 0:1]
+    d_lat = d[:, 0][np.newaxis, :]
+    dlat = d_lat - p_lat
+    dlng = d[:, 1][np.newaxis, :] - p[:, 1:2]
+    a = np.sin(dlat / 2) ** 2 + np.cos(p_lat) * np.cos(d_lat) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def match_min_cost(distances, max_distance_m):
+    """
+    Asignación global de costo mínimo entre recogidas (filas) y conductores
+    (columnas). Maximiza primero el número de recogidas atendidas dentro de
+    `max_distance_m` y luego minimiza la distancia total.
+
+    Returns:
+        list[tuple[int, int, float]]: (fila, columna, distancia_m)
+    """
+    rows, cols = distances.shape
+    if not rows or not cols:
+        return []
+
+    # Some optimal matching only uses each pickup's `rows` nearest drivers
+    # (any other choice can be swapped for a free closer one), so the other
+    # columns can be dropped before solving.
+    columns = np.arange(cols)
+    if cols > rows:
+        nearest = np.argpartition(distances, rows - 1, axis=1)[:, :rows]
+        columns = np.unique(nearest)
+        distances = distances[:, columns]
+
+    feasible = distances <= max_distance_m
+    # A uniform penalty larger than any feasible total makes the solver
+    # prefer one more feasible pair over any distance saving
+    penalty = max_distance_m * (min(distances.shape) + 1)
+    cost = np.where(feasible, distances, penalty)
+    row_ind, col_ind = linear_sum_assignment(cost)
+    return [
+        (int(r), int(columns[c]), float(distances[r, c]))
+        for r, c in zip(row_ind, col_ind)
+        if feasible[r, c]
+    ]
@@ -0,0 +1,107 @@
+import bisect
+import threading
+
+
+class Histogram:
+    """
+    Histograma acumulativo de latencias (segundos) con buckets fijos,
+    compatible con el formato de Prometheus.
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': total, 'count': count}
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class PrometheusText:
+    """
+    Acumula métricas en el formato de texto de Prometheus (0.0.4). Las
+    líneas HELP/TYPE se escriben una vez por nombre.
+    """
+
+    def __init__(self):
+        self._lines = []
+        self._declared = set()
+
+    def _declare(self, name, kind, help_text):
+        if name not in self._declared:
+            self._declared.add(name)
+            self._lines.append(f'# HELP {name} {help_text}')
+            self._lines.append(f'# TYPE {name} {kind}')
+
+    def value(self, name, value, labels=None, kind='gauge', help_text=''):
+        self._declare(name, kind, help_text or name)
+        self._lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+    def histogram(self, name, snapshot, labels=None, help_text=''):
+        self._declare(name, 'histogram', help_text or name)
+        labels = dict(labels or {})
+        for bound, count in snapshot['buckets']:
+            self._lines.append(f'{name}_bucket{_labels({**labels, "le": _number(bound)})} {count}')
+        self._lines.append(f'{name}_sum{_labels(labels)} {_number(snapshot["sum"])}')
+        self._lines.append(f'{name}_count{_labels(labels)} {snapshot["count"]}')
+
+    def stats(self, prefix, stats, help_text=''):
+        """
+        Exporta un dict de `stats()`: números como gauges, snapshots de
+        Histogram como histogramas, textos como `{prefix}_{key}{{value=...}} 1`
+        y dicts anidados con el prefijo extendido.
+        """
+        for key, value in stats.items():
+            name = f'{prefix}_{key}'
+            if isinstance(value, dict) and 'buckets' in value:
+                self.histogram(name, value, help_text=help_text)
+            elif isinstance(value, dict):
+                self.stats(name, value, help_text=help_text)
+            elif isinstance(value, str):
+                self.value(name, 1, {'value': value}, help_text=help_text)
+            elif isinstance(value, (int, float)):
+                self.value(name, value, help_text=help_text)
+
+    def render(self):
+        return '\n'.join(self._lines) + '\n'
@@ -0,0 +1,80 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import RequestTimings, activate, deactivate, request_metrics, server_timing
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide cada petición (consultas y tiempo de base de datos, llamadas a
+    Google Maps, serialización y total), agrega los tiempos por vista en
+    `request_metrics` y, con `METRICS_SERVER_TIMING`, los devuelve en el
+    header Server-Timing.
+
+    Con `METRICS_ENABLED = False` solo agrega una consulta de settings por
+    petición.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        timings = request.metrics_timings = RequestTimings()
+        token = activate(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            deactivate(token)
+        self._finish(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+        timings = request.metrics_timings = RequestTimings()
+        token = activate(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            deactivate(token)
+        self._finish(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # ViewSets expose their class and method -> action mapping
+        cls = getattr(view_func, 'cls', None)
+        actions = getattr(view_func, 'actions', None) or {}
+        if cls is not None:
+            action = actions.get(request.method.lower(), request.method.lower())
+            request.metrics_view = f'{cls.__name__}.{action}'
+        else:
+            request.metrics_view = f'{view_func.__module__}.{view_func.__name__}'
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook
+        timings = getattr(request, 'metrics_timings', None)
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add('serialize', time.perf_counter() - started)
+            )
+        return response
+
+    @staticmethod
+    def _finish(request, response, timings, total):
+        view = getattr(request, 'metrics_view', 'unresolved')
+        request_metrics.observe(view, response.status_code, total, timings)
+        if getattr(settings, 'METRICS_SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(timings, total)
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_alter_driver_phone_alter_driver_status_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='pickup_distance',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TravelTimeCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour_of_week', models.PositiveSmallIntegerField()),
+                ('distance_band', models.PositiveSmallIntegerField()),
+                ('seconds_per_km', models.FloatField()),
+                ('samples', models.PositiveIntegerField()),
+                ('fitted_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hour_of_week', 'distance_band'), name='unique_travel_time_cell')],
+            },
+        ),
+    ]
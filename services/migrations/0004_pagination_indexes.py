@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_service_pickup_distance_traveltimecell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['-created_at', '-id'], name='address_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['-created_at', '-id'], name='driver_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['-requested_at', '-id'], name='service_requested_at_idx'),
+        ),
+    ]
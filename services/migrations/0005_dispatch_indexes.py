@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-18 12:25
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driver',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('status', 'available')), fields=['current_location'], name='driver_available_location_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', '-requested_at'], name='service_status_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['driver', 'status'], name='service_driver_status_idx'),
+        ),
+    ]
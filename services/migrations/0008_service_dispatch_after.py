@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_service_updated_at_driver_updated_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='dispatch_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('status', 'requested')), fields=['dispatch_after'], name='service_dispatch_queue_idx'),
+        ),
+    ]
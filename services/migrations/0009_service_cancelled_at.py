@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_service_dispatch_after'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
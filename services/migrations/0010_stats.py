@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_service_cancelled_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyZoneStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('zone_lat', models.IntegerField()),
+                ('zone_lng', models.IntegerField()),
+                ('requested', models.PositiveIntegerField(default=0)),
+                ('dispatched', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('eta_samples', models.PositiveIntegerField(default=0)),
+                ('estimated_seconds', models.FloatField(default=0)),
+                ('actual_seconds', models.FloatField(default=0)),
+                ('busy_seconds', models.FloatField(default=0)),
+                ('driver_seconds', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('hour', 'zone_lat', 'zone_lng'), name='unique_hourly_zone_stats')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsWatermark',
+            fields=[
+                ('name', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('position', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('assigned_at__isnull', False)), fields=['assigned_at'], name='service_assigned_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['completed_at'], name='service_completed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('cancelled_at__isnull', False)), fields=['cancelled_at'], name='service_cancelled_at_idx'),
+        ),
+    ]
@@ -1,8 +1,8 @@
 from django.db import models
 from django.contrib.gis.db import models as gis_models
+from django.contrib.postgres.indexes import GistIndex
 from django.contrib.gis.geos import Point
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.utils import timezone
 import uuid
 
 class Address(models.Model):
@@ -22,6 +22,9 @@ class Address(models.Model):
     class Meta:
         verbose_name_plural = "Addresses"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='address_created_at_idx'),
+        ]
 
 
 class Driver(models.Model):
@@ -39,6 +42,8 @@ class Driver(models.Model):
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='available')
     address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True)
     current_location = gis_models.PointField(geography=True, blank=True, null=True)
+    # Device timestamp of the last applied position; older pings are dropped
+    location_updated_at = models.DateTimeField(null=True, blank=True)
     rating = models.FloatField(
         validators=[MinValueValidator(0.0), MaxValueValidator(5.0)],
         null=True,
@@ -54,6 +59,20 @@ class Driver(models.Model):
     def is_available(self):
         return self.status == 'available'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='driver_created_at_idx'),
+            # max(updated_at) validates conditional GETs of the driver list
+            models.Index(fields=['updated_at'], name='driver_updated_at_idx'),
+            # Dispatch only searches available drivers; indexing just those
+            # keeps the spatial index small and hot
+            GistIndex(
+                fields=['current_location'],
+                condition=models.Q(status='available'),
+                name='driver_available_location_gist',
+            ),
+        ]
+
 
 class Service(models.Model):
     STATUS_CHOICES = [
@@ -71,21 +90,124 @@ class Service(models.Model):
     driver = models.ForeignKey(Driver, related_name='services', on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='requested')
     estimated_arrival = models.DurationField(null=True, blank=True)
+    # Driver to pickup distance (meters) at assignment time
+    pickup_distance = models.FloatField(null=True, blank=True)
     requested_at = models.DateTimeField(auto_now_add=True)
     assigned_at = models.DateTimeField(null=True, blank=True)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+    # Queued dispatch: when the worker may (re)try to assign a driver
+    dispatch_after = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Service #{self.id} - {self.get_status_display()}"
 
     def complete_service(self):
-        self.status = 'completed'
-        self.completed_at = timezone.now()
-        if self.driver:
+        """
+        Completa el servicio y libera al conductor con UPDATEs condicionales
+        (ver transitions.py). Lanza TransitionError si ya estaba completado
+        o cancelado.
+        """
+        from .transitions import transition_service
+
+        fields = transition_service(self.pk, 'complete')
+        self.status = fields['status']
+        self.completed_at = fields['completed_at']
+        self.updated_at = fields['updated_at']
+        if self.driver_id and 'driver' in self._state.fields_cache and self.driver.status == 'in_service':
             self.driver.status = 'available'
-            self.driver.save()
-        self.save()
 
     class Meta:
-        ordering = ['-requested_at']
\ No newline at end of file
+        ordering = ['-requested_at']
+        indexes = [
+            models.Index(fields=['-requested_at', '-id'], name='service_requested_at_idx'),
+            models.Index(fields=['status', '-requested_at'], name='service_status_requested_idx'),
+            models.Index(fields=['driver', 'status'], name='service_driver_status_idx'),
+            # Dispatch queue: only services still waiting for a driver
+            models.Index(
+                fields=['dispatch_after'],
+                condition=models.Q(status='requested'),
+                name='service_dispatch_queue_idx',
+            ),
+            # refresh_stats reads each event past its watermark
+            models.Index(
+                fields=['assigned_at'],
+                condition=models.Q(assigned_at__isnull=False),
+                name='service_assigned_at_idx',
+            ),
+            models.Index(
+                fields=['completed_at'],
+                condition=models.Q(completed_at__isnull=False),
+                name='service_completed_at_idx',
+            ),
+            models.Index(
+                fields=['cancelled_at'],
+                condition=models.Q(cancelled_at__isnull=False),
+                name='service_cancelled_at_idx',
+            ),
+        ]
+
+
+class TravelTimeCell(models.Model):
+    """
+    Ritmo de viaje (segundos por km) ajustado desde el histórico de
+    servicios, por hora de la semana y banda de distancia.
+    """
+    hour_of_week = models.PositiveSmallIntegerField()  # 0 = Monday 00h
+    distance_band = models.PositiveSmallIntegerField()
+    seconds_per_km = models.FloatField()
+    samples = models.PositiveIntegerField()
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.hour_of_week}h / band {self.distance_band}: {self.seconds_per_km:.0f} s/km"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hour_of_week', 'distance_band'], name='unique_travel_time_cell'),
+        ]
+
+
+class HourlyZoneStats(models.Model):
+    """
+    Agregados operativos por hora (UTC) y zona de recogida, mantenidos de
+    forma incremental por `manage.py refresh_stats` (ver stats.py). Las
+    zonas son celdas de STATS_ZONE_SIZE grados.
+    """
+    hour = models.DateTimeField()
+    zone_lat = models.IntegerField()
+    zone_lng = models.IntegerField()
+    requested = models.PositiveIntegerField(default=0)
+    dispatched = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    # Completed services with both an estimated and an actual arrival
+    eta_samples = models.PositiveIntegerField(default=0)
+    estimated_seconds = models.FloatField(default=0)
+    actual_seconds = models.FloatField(default=0)
+    # Driver time on services (assignment to completion or cancellation)
+    busy_seconds = models.FloatField(default=0)
+    # Time drivers were online (available or in service), sampled per run
+    driver_seconds = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}h zone ({self.zone_lat}, {self.zone_lng})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hour', 'zone_lat', 'zone_lng'], name='unique_hourly_zone_stats'),
+        ]
+
+
+class StatsWatermark(models.Model):
+    """
+    Hasta dónde se agregó cada flujo de eventos de HourlyZoneStats
+    """
+    name = models.CharField(max_length=30, primary_key=True)
+    position = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
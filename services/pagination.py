@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Paginación por cursor sobre la fecha de creación.
+
+    El cursor codifica la posición en el orden (no un OFFSET), así que cada
+    página cuesta un rango del índice sin importar su profundidad y las
+    inserciones concurrentes no desplazan ni duplican filas. DRF posiciona
+    el cursor solo con el primer campo: entre filas con la misma fecha
+    avanza por OFFSET, así que las cargas masivas deben dar a cada fila una
+    fecha distinta. `id` solo hace determinista el orden de los empates.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = getattr(settings, 'API_PAGE_SIZE', 100)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+
+
+class RequestedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-requested_at', '-id')
@@ -0,0 +1,151 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class ResponseCache:
+    """
+    Caché de respuestas renderizadas de list/retrieve sobre un backend de
+    caché de Django (local-memory por defecto, configurable por alias).
+
+    Cada llave incluye la versión de sus ámbitos ('driver', 'driver:<id>',
+    ...). Invalidar es incrementar la versión: las entradas viejas quedan
+    inalcanzables y expiran solas, sin TTL que adivinar. Para evitar que
+    todas las peticiones reconstruyan a la vez la misma entrada, solo una
+    toma un lock y las demás esperan hasta `lock_wait` segundos a que
+    aparezca.
+    """
+
+    def __init__(self, alias=None, timeout=None, lock_timeout=None, lock_wait=None, poll_interval=0.01):
+        self.alias = alias or getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+        self.timeout = timeout or getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+        self.lock_timeout = lock_timeout or getattr(settings, 'RESPONSE_CACHE_LOCK_TIMEOUT', 5)
+        self.lock_wait = lock_wait if lock_wait is not None else getattr(settings, 'RESPONSE_CACHE_LOCK_WAIT', 0.5)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._counters = {
+            'hits': 0,
+            'waited_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'invalidations': 0,
+        }
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    @staticmethod
+    def _version_key(scope):
+        return f'response:version:{scope}'
+
+    @staticmethod
+    def _fresh_version():
+        # Time based, so a version key lost to eviction never reuses an old number
+        return time.time_ns()
+
+    def versions(self, scopes):
+        keys = [self._version_key(scope) for scope in scopes]
+        found = self.cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                self.cache.add(key, self._fresh_version(), timeout=None)
+                found[key] = self.cache.get(key)
+        return [found[key] for key in keys]
+
+    def make_key(self, path, media_type, scopes):
+        versions = self.versions(scopes)
+        digest = hashlib.md5(
+            repr((path, media_type, list(zip(scopes, versions)))).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f'response:{digest}'
+
+    def get(self, key):
+        """
+        Returns:
+            tuple[object | None, bool]: la entrada (None si hay que
+            construirla) y si quien llama tiene el lock de reconstrucción
+        """
+        entry = self.cache.get(key)
+        if entry is not None:
+            self._count('hits')
+            return entry, False
+        if self.cache.add(f'{key}:lock', True, timeout=self.lock_timeout):
+            self._count('misses')
+            return None, True
+
+        # Someone else is rebuilding this entry: wait for it
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            entry = self.cache.get(key)
+            if entry is not None:
+                self._count('waited_hits')
+                return entry, False
+        self._count('misses')
+        return None, False
+
+    def set(self, key, entry):
+        self.cache.set(key, entry, timeout=self.timeout)
+        self._count('stores')
+
+    def release(self, key):
+        self.cache.delete(f'{key}:lock')
+
+    def _bump(self, scopes):
+        for scope in scopes:
+            key = self._version_key(scope)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, self._fresh_version(), timeout=None)
+        self._count('invalidations', len(scopes))
+
+    def invalidate(self, *scopes):
+        """
+        Invalida los ámbitos de inmediato y otra vez al confirmar la
+        transacción, para descartar lo que se haya reconstruido mientras
+        los cambios aún no eran visibles.
+        """
+        scopes = list(scopes)
+        if not scopes:
+            return
+        self._bump(scopes)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._bump(scopes))
+
+    def invalidate_drivers(self, driver_ids):
+        """
+        Para cambios de conductores hechos con UPDATE (sin señales)
+        """
+        driver_ids = list(driver_ids)
+        if driver_ids:
+            self.invalidate('driver', *(f'driver:{driver_id}' for driver_id in driver_ids))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['waited_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['waited_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,154 @@
+import datetime
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# Weight of each new search in the per-cell moving average
+SMOOTHING = 0.2
+
+
+def expected_kth_distance(nearest_m, k):
+    """
+    Distancia esperada al k-ésimo conductor más cercano a partir de la
+    distancia típica al más cercano: con densidad uniforme el número de
+    conductores crece con el área, así que el radio crece con sqrt(k).
+    """
+    return nearest_m * math.sqrt(max(k, 1))
+
+
+class SearchRings:
+    """
+    Radios crecientes para buscar candidatos y la estadística de densidad
+    por zona que elige el primero.
+
+    Cada zona (celda lat/lng de `cell_size` grados) guarda una media móvil
+    de la distancia típica al conductor más cercano. Se inicializa con la
+    `pickup_distance` de los servicios recientes y se actualiza con cada
+    búsqueda. Las zonas sin datos empiezan por el anillo más pequeño.
+    """
+
+    def __init__(self, rings_km=(1, 3, 10, 30, 100), cell_size=0.05, history_days=7, reload_seconds=3600):
+        self.rings_m = tuple(sorted(km * 1000 for km in rings_km))
+        self.cell_size = cell_size
+        self.history_days = history_days
+        self.reload_seconds = reload_seconds
+        self._nearest = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._searches = 0
+        self._queries = 0
+        self._satisfied = dict.fromkeys(self.rings_m, 0)
+        self._exhausted = 0
+
+    @property
+    def max_radius_m(self):
+        return self.rings_m[-1]
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def load(self, cells=None):
+        """
+        Args:
+            cells: iterable de (celda_lat, celda_lng, distancia típica en m);
+                por defecto la mediana de `pickup_distance` por zona de los
+                últimos `history_days` días
+        """
+        if cells is None:
+            from .models import Address, Service
+
+            since = timezone.now() - datetime.timedelta(days=self.history_days)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT floor(ST_Y(a.location::geometry) / %s)::int,
+                           floor(ST_X(a.location::geometry) / %s)::int,
+                           percentile_cont(0.5) WITHIN GROUP (ORDER BY s.pickup_distance)
+                    FROM {Service._meta.db_table} s
+                    JOIN {Address._meta.db_table} a ON a.id = s.pickup_address_id
+                    WHERE s.requested_at >= %s AND s.pickup_distance IS NOT NULL
+                      AND a.location IS NOT NULL
+                    GROUP BY 1, 2
+                    """,
+                    [self.cell_size, self.cell_size, since],
+                )
+                cells = cursor.fetchall()
+        nearest = {(lat_cell, lng_cell): float(distance) for lat_cell, lng_cell, distance in cells}
+        with self._lock:
+            self._nearest = nearest
+            self._loaded_at = time.monotonic()
+
+    def needs_reload(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_seconds
+
+    def ensure_loaded(self):
+        if self.needs_reload():
+            self.load()
+
+    def plan(self, lat, lng, limit, radius_m=None):
+        """
+        Radios a consultar en orden para encontrar `limit` candidatos, desde
+        el anillo que la densidad de la zona hace suficiente hasta
+        `radius_m` (por defecto el anillo mayor)
+        """
+        radius_m = radius_m or self.max_radius_m
+        rings = [ring for ring in self.rings_m if ring < radius_m] + [radius_m]
+        nearest = self._nearest.get(self._cell(lat, lng))
+        if nearest is None:
+            return rings
+        expected = expected_kth_distance(nearest, limit)
+        start = next((index for index, ring in enumerate(rings) if ring >= expected), len(rings) - 1)
+        return rings[start:]
+
+    def observe(self, lat, lng, limit, distances_m, radius_m, queries):
+        """
+        Registra el resultado de una búsqueda: `distances_m` son las de los
+        candidatos encontrados dentro del último radio consultado
+        """
+        found = len(distances_m)
+        if found >= limit:
+            nearest = distances_m[limit - 1] / math.sqrt(limit)
+        elif found:
+            nearest = radius_m / math.sqrt(found)
+        else:
+            # Nothing within radius_m: only a lower bound
+            nearest = radius_m
+        cell = self._cell(lat, lng)
+        with self._lock:
+            previous = self._nearest.get(cell)
+            self._nearest[cell] = nearest if previous is None else previous + SMOOTHING * (nearest - previous)
+            self._searches += 1
+            self._queries += queries
+            if found >= limit and radius_m in self._satisfied:
+                self._satisfied[radius_m] += 1
+            elif found < limit:
+                self._exhausted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'searches': self._searches,
+                'queries': self._queries,
+                'zones': len(self._nearest),
+                'satisfied_at_m': {str(ring): count for ring, count in self._satisfied.items()},
+                'exhausted': self._exhausted,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._searches = 0
+            self._queries = 0
+            self._satisfied = dict.fromkeys(self.rings_m, 0)
+            self._exhausted = 0
+
+
+search_rings = SearchRings(
+    rings_km=getattr(settings, 'DISPATCH_SEARCH_RINGS_KM', (1, 3, 10, 30, 100)),
+    cell_size=getattr(settings, 'DISPATCH_SEARCH_ZONE_SIZE', 0.05),
+    history_days=getattr(settings, 'DISPATCH_SEARCH_HISTORY_DAYS', 7),
+    reload_seconds=getattr(settings, 'DISPATCH_SEARCH_RELOAD_SECONDS', 3600),
+)
@@ -1,10 +1,11 @@
 from rest_framework import serializers
+from .instrumentation import TimedSerializerMixin
 from .models import Address, Driver, Service
 from django.contrib.gis.geos import Point
 from django.utils import timezone
 
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     latitude = serializers.FloatField(write_only=True, required=False)
     longitude = serializers.FloatField(write_only=True, required=False)
 
@@ -32,7 +33,7 @@ class AddressSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class DriverSerializer(serializers.ModelSerializer):
+class DriverSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     latitude = serializers.FloatField(write_only=True, required=False)
     longitude = serializers.FloatField(write_only=True, required=False)
     address = AddressSerializer(read_only=True)
@@ -41,7 +42,8 @@ class DriverSerializer(serializers.ModelSerializer):
     class Meta:
         model = Driver
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        # status changes go through transitions.py (set_available/set_offline)
+        read_only_fields = ('id', 'status', 'created_at', 'updated_at', 'location_updated_at')
 
     def create(self, validated_data):
         latitude = validated_data.pop('latitude', None)
@@ -50,6 +52,7 @@ class DriverSerializer(serializers.ModelSerializer):
         
         if latitude and longitude:
             validated_data['current_location'] = Point(float(longitude), float(latitude))
+            validated_data['location_updated_at'] = timezone.now()
         
         driver = Driver.objects.create(**validated_data)
         
@@ -70,22 +73,26 @@ class DriverSerializer(serializers.ModelSerializer):
         
         if latitude and longitude:
             validated_data['current_location'] = Point(float(longitude), float(latitude))
+            validated_data['location_updated_at'] = timezone.now()
         
+        fields = list(validated_data)
         if address_id:
             try:
                 address = Address.objects.get(id=address_id)
                 instance.address = address
+                fields.append('address')
             except Address.DoesNotExist:
                 pass
         
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
-        instance.save()
+        # Only the columns sent: a full save would write back a stale status
+        instance.save(update_fields=fields + ['updated_at'])
         return instance
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     pickup_address = AddressSerializer(read_only=True)
     pickup_address_id = serializers.UUIDField(write_only=True)
     driver = DriverSerializer(read_only=True)
@@ -94,7 +101,8 @@ class ServiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = '__all__'
-        read_only_fields = ('id', 'requested_at', 'assigned_at', 'started_at', 'completed_at', 'estimated_arrival')
+        # status changes go through transitions.py (start/complete/cancel)
+        read_only_fields = ('id', 'status', 'requested_at', 'assigned_at', 'started_at', 'completed_at', 'cancelled_at', 'estimated_arrival', 'pickup_distance', 'dispatch_after', 'updated_at')
 
     def create(self, validated_data):
         pickup_address_id = validated_data.pop('pickup_address_id')
@@ -125,18 +133,64 @@ class ServiceSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         driver_id = validated_data.pop('driver_id', None)
         
+        fields = list(validated_data)
+        driver = None
         if driver_id:
             try:
                 driver = Driver.objects.get(id=driver_id)
                 instance.driver = driver
-                if instance.status == 'requested':
-                    instance.status = 'assigned'
-                    instance.assigned_at = timezone.now()
+                fields.append('driver')
             except Driver.DoesNotExist:
                 pass
         
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
-        instance.save()
-        return instance
\ No newline at end of file
+        # Only the columns sent: a full save would write back a stale status
+        instance.save(update_fields=fields + ['updated_at'])
+        if driver is not None:
+            # Conditional, like transitions.py: only a still requested service
+            now = timezone.now()
+            assigned = Service.objects.filter(pk=instance.pk, status='requested').update(
+                status='assigned', assigned_at=now, updated_at=now
+            )
+            if assigned:
+                instance.status, instance.assigned_at, instance.updated_at = 'assigned', now, now
+        return instance
+
+class StatsQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    zone_lat = serializers.IntegerField(required=False)
+    zone_lng = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if ('zone_lat' in attrs) != ('zone_lng' in attrs):
+            raise serializers.ValidationError("zone_lat y zone_lng van juntos")
+        if 'since' in attrs and 'until' in attrs and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError("since debe ser anterior a until")
+        return attrs
+
+
+class StatsSummarySerializer(serializers.Serializer):
+    requested = serializers.IntegerField()
+    dispatched = serializers.IntegerField()
+    completed = serializers.IntegerField()
+    cancelled = serializers.IntegerField()
+    cancellation_rate = serializers.FloatField(allow_null=True)
+    # Seconds; actual = started_at - assigned_at of completed services
+    mean_estimated_arrival = serializers.FloatField(allow_null=True)
+    mean_actual_arrival = serializers.FloatField(allow_null=True)
+    utilization = serializers.FloatField(allow_null=True)
+
+
+class HourlyStatsSerializer(StatsSummarySerializer):
+    hour = serializers.DateTimeField()
+
+
+class StatsSerializer(TimedSerializerMixin, serializers.Serializer):
+    since = serializers.DateTimeField()
+    until = serializers.DateTimeField()
+    hours = HourlyStatsSerializer(many=True)
+    totals = StatsSummarySerializer()
+    watermarks = serializers.DictField(child=serializers.DateTimeField())
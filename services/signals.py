@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Address, Driver
+from .response_cache import response_cache
+from .spatial_index import driver_index
+
+
+# After commit: a rolled-back save must not leave the index pointing at a
+# driver (or position) other connections can't see
+@receiver(post_save, sender=Driver)
+def update_driver_index(sender, instance, **kwargs):
+    transaction.on_commit(lambda: driver_index.update_from_driver(instance))
+
+
+@receiver(post_delete, sender=Driver)
+def remove_driver_from_index(sender, instance, **kwargs):
+    driver_id = instance.pk
+    transaction.on_commit(lambda: driver_index.discard(driver_id))
+
+
+@receiver([post_save, post_delete], sender=Driver)
+def invalidate_driver_responses(sender, instance, **kwargs):
+    response_cache.invalidate_drivers([instance.pk])
+
+
+# pre_delete: once the address is gone its drivers' address_id is already NULL
+@receiver([post_save, pre_delete], sender=Address)
+def invalidate_address_responses(sender, instance, **kwargs):
+    response_cache.invalidate('address', f'address:{instance.pk}')
+    if kwargs.get('created'):
+        return
+    # Drivers nest their address
+    response_cache.invalidate_drivers(Driver.objects.filter(address=instance).values_list('pk', flat=True))
@@ -0,0 +1,241 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """
+    Distancia en metros sobre la esfera entre dos puntos (lat, lng)
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class DriverSpatialIndex:
+    """
+    Índice espacial en memoria (rejilla de celdas lat/lng) de los conductores
+    disponibles. Se mantiene al día con las señales de Driver y se resincroniza
+    periódicamente desde la base de datos.
+    """
+
+    def __init__(self, cell_size=0.002, resync_seconds=60):
+        self.cell_size = cell_size
+        self.resync_seconds = resync_seconds
+        self._cells = {}
+        self._positions = {}
+        self._lock = threading.RLock()
+        self._synced_at = None
+        self._syncing = False
+        # Changes received while a resync query is running; replayed on top of the snapshot
+        self._pending = None
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, driver_id):
+        return driver_id in self._positions
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def _insert(self, driver_id, lat, lng):
+        self._remove(driver_id)
+        self._positions[driver_id] = (lat, lng)
+        self._cells.setdefault(self._cell(lat, lng), {})[driver_id] = (lat, lng)
+
+    def _remove(self, driver_id):
+        position = self._positions.pop(driver_id, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(driver_id, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def upsert(self, driver_id, lat, lng):
+        with self._lock:
+            self._insert(driver_id, lat, lng)
+            if self._pending is not None:
+                self._pending[driver_id] = (lat, lng)
+
+    def move(self, driver_id, lat, lng):
+        """
+        Actualiza la posición solo si el conductor ya está indexado
+        """
+        with self._lock:
+            if driver_id in self._positions:
+                self.upsert(driver_id, lat, lng)
+
+    def discard(self, driver_id):
+        with self._lock:
+            self._remove(driver_id)
+            if self._pending is not None:
+                self._pending[driver_id] = None
+
+    def update_from_driver(self, driver):
+        if driver.status == 'available' and driver.current_location:
+            self.upsert(driver.pk, driver.current_location.y, driver.current_location.x)
+        else:
+            self.discard(driver.pk)
+
+    def clear(self):
+        with self._lock:
+            self._cells = {}
+            self._positions = {}
+            self._synced_at = None
+
+    def rebuild(self, rows):
+        """
+        Reemplaza el contenido del índice con filas (id, lat, lng)
+        """
+        cells = {}
+        positions = {}
+        for driver_id, lat, lng in rows:
+            positions[driver_id] = (lat, lng)
+            cells.setdefault(self._cell(lat, lng), {})[driver_id] = (lat, lng)
+        with self._lock:
+            self._cells = cells
+            self._positions = positions
+            self._synced_at = time.monotonic()
+
+    def mark_stale(self):
+        with self._lock:
+            if self._synced_at is not None:
+                self._synced_at -= self.resync_seconds + 1
+
+    @property
+    def synced(self):
+        return self._synced_at is not None
+
+    def is_stale(self):
+        return self._synced_at is None or time.monotonic() - self._synced_at > self.resync_seconds
+
+    def sync(self):
+        """
+        Recarga el índice desde la base de datos
+        """
+        from .models import Driver
+
+        with self._lock:
+            self._pending = {}
+        try:
+            rows = Driver.objects.filter(
+                status='available',
+                current_location__isnull=False,
+            ).annotate(
+                lat=RawSQL('ST_Y("services_driver"."current_location"::geometry)', []),
+                lng=RawSQL('ST_X("services_driver"."current_location"::geometry)', []),
+            ).values_list('id', 'lat', 'lng')
+            self.rebuild(rows.iterator(chunk_size=10000))
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+                for driver_id, position in pending.items():
+                    if position is None:
+                        self._remove(driver_id)
+                    else:
+                        self._insert(driver_id, *position)
+        if getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+            from .location_buffer import location_buffer
+
+            # The snapshot has the written positions only: keep the buffered ones
+            for driver_id, (lat, lng, _) in location_buffer.positions().items():
+                self.move(driver_id, lat, lng)
+
+    def ensure_fresh(self):
+        """
+        Sincroniza en línea la primera vez; después refresca en segundo plano
+        cuando el índice supera `resync_seconds` de antigüedad.
+        """
+        if not self.is_stale():
+            return
+        if self._synced_at is None:
+            with self._lock:
+                if self._synced_at is None:
+                    self.sync()
+            return
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        threading.Thread(target=self._background_sync, daemon=True).start()
+
+    def _background_sync(self):
+        try:
+            self.sync()
+        finally:
+            self._syncing = False
+            connection.close()
+
+    def nearest(self, lat, lng, k=5, max_distance_m=100000):
+        """
+        Retorna hasta k tuplas (distancia_m, driver_id) ordenadas por distancia
+        """
+        with self._lock:
+            cells = self._cells
+            total = len(self._positions)
+            if not total:
+                return []
+
+            # Smallest cell side (in meters) at the most pole-ward latitude searched
+            max_lat = min(89.0, abs(lat) + max_distance_m / METERS_PER_DEGREE)
+            min_side = self.cell_size * METERS_PER_DEGREE * math.cos(math.radians(max_lat))
+            max_ring = int(max_distance_m / min_side) + 1
+            ci, cj = self._cell(lat, lng)
+
+            found = []
+            scanned = 0
+            for ring in range(max_ring + 1):
+                if scanned > total:
+                    # Sparse index: a linear scan is cheaper than walking empty cells
+                    found = [
+                        (haversine_m(lat, lng, dlat, dlng), driver_id)
+                        for driver_id, (dlat, dlng) in self._positions.items()
+                    ]
+                    break
+                for cell in self._ring_cells(ci, cj, ring):
+                    scanned += 1
+                    bucket = cells.get(cell)
+                    if bucket:
+                        for driver_id, (dlat, dlng) in bucket.items():
+                            found.append((haversine_m(lat, lng, dlat, dlng), driver_id))
+                # Every cell beyond this ring is at least `ring * min_side` away
+                if len(found) >= k:
+                    found.sort()
+                    if found[k - 1][0] <= ring * min_side:
+                        break
+
+        found = [item for item in found if item[0] <= max_distance_m]
+        found.sort()
+        return found[:k]
+
+    @staticmethod
+    def _ring_cells(ci, cj, ring):
+        if ring == 0:
+            yield (ci, cj)
+            return
+        for j in range(cj - ring, cj + ring + 1):
+            yield (ci - ring, j)
+            yield (ci + ring, j)
+        for i in range(ci - ring + 1, ci + ring):
+            yield (i, cj - ring)
+            yield (i, cj + ring)
+
+
+driver_index = DriverSpatialIndex(
+    cell_size=getattr(settings, 'DRIVER_INDEX_CELL_SIZE', 0.002),
+    resync_seconds=getattr(settings, 'DRIVER_INDEX_RESYNC_SECONDS', 60),
+)
@@ -0,0 +1,190 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Address, Driver, HourlyZoneStats, Service, StatsWatermark
+
+# Columns of HourlyZoneStats filled by the refresh; any not aggregated by a
+# statement is inserted as 0 (the model defaults are not database defaults)
+COUNTERS = (
+    'requested', 'dispatched', 'completed', 'cancelled', 'eta_samples',
+    'estimated_seconds', 'actual_seconds', 'busy_seconds', 'driver_seconds',
+)
+
+_ETA = 's.estimated_arrival IS NOT NULL AND s.assigned_at IS NOT NULL AND s.started_at IS NOT NULL'
+
+# Event streams: name -> (Service timestamp column, {counter: aggregate}).
+# Each event is counted in the hour and pickup zone where it happened
+STREAMS = {
+    'requested': ('requested_at', {'requested': 'count(*)'}),
+    'dispatched': ('assigned_at', {'dispatched': 'count(*)'}),
+    'completed': ('completed_at', {
+        'completed': 'count(*)',
+        'eta_samples': f'count(*) FILTER (WHERE {_ETA})',
+        'estimated_seconds': f'coalesce(sum(extract(epoch FROM s.estimated_arrival)) FILTER (WHERE {_ETA}), 0)',
+        'actual_seconds': f'coalesce(sum(extract(epoch FROM s.started_at - s.assigned_at)) FILTER (WHERE {_ETA}), 0)',
+    }),
+    'cancelled': ('cancelled_at', {'cancelled': 'count(*)'}),
+}
+# Streams that end a driver's time on a service (busy_seconds)
+BUSY_STREAMS = ('completed', 'cancelled')
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _zone(column):
+    return f'floor(ST_Y({column}::geometry) / %s)::int, floor(ST_X({column}::geometry) / %s)::int'
+
+
+def _upsert(select, counters):
+    """
+    INSERT ... SELECT que suma `counters` a las filas (hora, zona) existentes.
+    `select` debe producir hora, zona_lat, zona_lng y luego COUNTERS en orden.
+    """
+    table = HourlyZoneStats._meta.db_table
+    increments = ', '.join(f'{name} = stats.{name} + EXCLUDED.{name}' for name in counters)
+    return f"""
+        INSERT INTO {table} AS stats (hour, zone_lat, zone_lng, {', '.join(COUNTERS)}, updated_at)
+        {select}
+        ON CONFLICT (hour, zone_lat, zone_lng) DO UPDATE SET {increments}, updated_at = EXCLUDED.updated_at
+    """
+
+
+def _event_sql(column, aggregates):
+    values = ', '.join(aggregates.get(name, '0') for name in COUNTERS)
+    return _upsert(f"""
+        SELECT date_trunc('hour', s.{column}), {_zone('a.location')}, {values}, now()
+        FROM {Service._meta.db_table} s
+        JOIN {Address._meta.db_table} a ON a.id = s.pickup_address_id
+        WHERE s.{column} > %s AND s.{column} <= %s AND a.location IS NOT NULL
+        GROUP BY 1, 2, 3
+    """, aggregates)
+
+
+def _busy_sql(column):
+    # Split assignment..end across the hours it spans
+    busy = f"sum(extract(epoch FROM least(s.{column}, h.hour + interval '1 hour') - greatest(s.assigned_at, h.hour)))"
+    values = ', '.join(busy if name == 'busy_seconds' else '0' for name in COUNTERS)
+    return _upsert(f"""
+        SELECT h.hour, {_zone('a.location')}, {values}, now()
+        FROM {Service._meta.db_table} s
+        JOIN {Address._meta.db_table} a ON a.id = s.pickup_address_id
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('hour', s.assigned_at), s.{column}, interval '1 hour'
+        ) AS h(hour)
+        WHERE s.{column} > %s AND s.{column} <= %s AND a.location IS NOT NULL
+          AND s.assigned_at IS NOT NULL AND s.assigned_at <= s.{column}
+        GROUP BY 1, 2, 3
+    """, ('busy_seconds',))
+
+
+def _fleet_sql():
+    values = ', '.join('count(*) * %s' if name == 'driver_seconds' else '0' for name in COUNTERS)
+    return _upsert(f"""
+        SELECT date_trunc('hour', %s::timestamptz), {_zone('d.current_location')}, {values}, now()
+        FROM {Driver._meta.db_table} d
+        WHERE d.status IN ('available', 'in_service') AND d.current_location IS NOT NULL
+        GROUP BY 2, 3
+    """, ('driver_seconds',))
+
+
+def _locked_watermark(name):
+    StatsWatermark.objects.get_or_create(name=name, defaults={'position': EPOCH})
+    # Concurrent refreshes wait here instead of counting the same events twice
+    return StatsWatermark.objects.select_for_update().get(name=name)
+
+
+def refresh_stats(now=None, lag_seconds=None, zone_size=None, max_gap_seconds=None):
+    """
+    Agrega en HourlyZoneStats los eventos de servicios posteriores a la
+    marca de agua de cada flujo, hasta `now - lag_seconds` (margen para
+    transacciones que aún no se confirman), y suma el tiempo en línea de
+    los conductores desde la ejecución anterior. Cada flujo avanza su marca
+    en la misma transacción que sus sumas, así que ningún evento se cuenta
+    dos veces. La primera ejecución agrega todo el histórico.
+
+    Returns:
+        dict: filas (hora, zona) actualizadas por flujo
+    """
+    now = now or timezone.now()
+    if lag_seconds is None:
+        lag_seconds = getattr(settings, 'STATS_LAG_SECONDS', 60)
+    zone_size = zone_size or getattr(settings, 'STATS_ZONE_SIZE', 0.05)
+    if max_gap_seconds is None:
+        max_gap_seconds = getattr(settings, 'STATS_FLEET_MAX_GAP_SECONDS', 300)
+    upto = now - datetime.timedelta(seconds=lag_seconds)
+
+    updated = {}
+    for name, (column, aggregates) in STREAMS.items():
+        with transaction.atomic():
+            watermark = _locked_watermark(name)
+            if watermark.position >= upto:
+                updated[name] = 0
+                continue
+            window = [zone_size, zone_size, watermark.position, upto]
+            with connection.cursor() as cursor:
+                cursor.execute(_event_sql(column, aggregates), window)
+                updated[name] = cursor.rowcount
+                if name in BUSY_STREAMS:
+                    cursor.execute(_busy_sql(column), window)
+            watermark.position = upto
+            watermark.save(update_fields=['position'])
+
+    with transaction.atomic():
+        watermark = _locked_watermark('fleet')
+        # Without a previous sample (or after a long pause) it's unknown how
+        # long the drivers were online: count at most max_gap_seconds
+        elapsed = 0 if watermark.position == EPOCH else min(
+            (now - watermark.position).total_seconds(), max_gap_seconds,
+        )
+        updated['fleet'] = 0
+        if elapsed > 0:
+            with connection.cursor() as cursor:
+                cursor.execute(_fleet_sql(), [now, zone_size, zone_size, elapsed])
+                updated['fleet'] = cursor.rowcount
+        watermark.position = max(now, watermark.position)
+        watermark.save(update_fields=['position'])
+    return updated
+
+
+def derived_metrics(values):
+    """
+    Métricas derivadas de una fila (o suma de filas) de HourlyZoneStats
+    """
+    finished = values['completed'] + values['cancelled']
+    eta_samples = values['eta_samples']
+    return {
+        **{name: values[name] for name in ('requested', 'dispatched', 'completed', 'cancelled')},
+        'cancellation_rate': values['cancelled'] / finished if finished else None,
+        'mean_estimated_arrival': values['estimated_seconds'] / eta_samples if eta_samples else None,
+        'mean_actual_arrival': values['actual_seconds'] / eta_samples if eta_samples else None,
+        'utilization': values['busy_seconds'] / values['driver_seconds'] if values['driver_seconds'] else None,
+    }
+
+
+def hourly_stats(since, until, zone=None):
+    """
+    Métricas por hora en [since, until) sumadas sobre las zonas (o solo
+    `zone`, una tupla (zone_lat, zone_lng)), más el total del periodo. Solo
+    lee las tablas de resumen: el costo depende del periodo, no del
+    histórico de servicios.
+    """
+    queryset = HourlyZoneStats.objects.filter(hour__gte=since, hour__lt=until)
+    if zone is not None:
+        queryset = queryset.filter(zone_lat=zone[0], zone_lng=zone[1])
+    sums = {name: Sum(name) for name in COUNTERS}
+    hours = [
+        {'hour': row['hour'], **derived_metrics(row)}
+        for row in queryset.values('hour').annotate(**sums).order_by('hour')
+    ]
+    totals = queryset.aggregate(**sums)
+    return {
+        'since': since,
+        'until': until,
+        'hours': hours,
+        'totals': derived_metrics({name: value or 0 for name, value in totals.items()}),
+        'watermarks': dict(StatsWatermark.objects.values_list('name', 'position')),
+    }
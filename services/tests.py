@@ -1,10 +1,42 @@
 from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.management import call_command, load_command_class
+from django.utils import timezone
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Address, Driver, Service
+from .models import Address, Driver, HourlyZoneStats, Service, TravelTimeCell
+from . import dispatch
+from .benchmarking import StubMapsServer, explain_indexes
+from .dispatch import (
+    _candidates_queryset, claim_driver, dispatch_queued, find_candidates, knn_queryset, queue_stats, rank_by_eta,
+)
+from .eta_cache import ETACache
+from .eta_model import TravelTimeModel, eta_model, fit_paces
+from .google_maps_time import GoogleMapsService
+from .http_client import AsyncPooledHttpClient, CircuitBreaker, PooledHttpClient
+from .instrumentation import RequestTimings, activate, deactivate, request_metrics, timed
+from .location_buffer import LocationBuffer, location_buffer
+from .response_cache import ResponseCache, response_cache
+from .search_rings import SearchRings, search_rings
+from .serializers import ServiceSerializer
+from .stats import refresh_stats
+from .spatial_index import DriverSpatialIndex, driver_index, haversine_m
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from types import SimpleNamespace
+import asyncio
 import base64
+import datetime
+import io
+import json
+import random
+import threading
+import time
 
 class ServiceTestCase(TestCase):
     def setUp(self):
@@ -116,4 +148,1321 @@ class ServiceTestCase(TestCase):
         
         response = self.client.post('/api/services/', data, format='json')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertEqual(response.data['detail'], 'No hay conductores disponibles cercanos')
\ No newline at end of file
+        self.assertEqual(response.data['detail'], 'No hay conductores disponibles cercanos')
+
+    def test_service_list_cursor_pagination(self):
+        for i in range(5):
+            Service.objects.create(customer_name=f"Customer {i}", customer_phone="5551234567", pickup_address=self.address1)
+
+        seen = []
+        url = '/api/services/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['customer_name'] for item in response.data['results'])
+            # Rows inserted while paging land before the cursor and don't shift later pages
+            Service.objects.create(customer_name="Late", customer_phone="5551234567", pickup_address=self.address1)
+            url = response.data['next']
+
+        self.assertEqual(seen, [f"Customer {i}" for i in reversed(range(5))])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_fast_read_path_matches_drf_output(self):
+        self.driver1.address = Address.objects.create(
+            street="Calle 100 \u2028 # 7-33 ñ",
+            city="Bogota",
+            state="Bogota",
+            zip_code="12345",
+            country="Colombia"
+        )
+        self.driver1.rating = 4.5
+        self.driver1.save()
+        assigned = Service.objects.create(
+            customer_name="Test Customer",
+            customer_phone="5551234567",
+            pickup_address=self.address1,
+            driver=self.driver1,
+            status="assigned",
+            estimated_arrival=datetime.timedelta(minutes=7, seconds=3),
+            pickup_distance=3991.27,
+            assigned_at=timezone.now()
+        )
+        Service.objects.create(customer_name="Waiting", customer_phone="5551234567", pickup_address=None)
+
+        urls = [
+            '/api/services/', '/api/services/?page_size=1', f'/api/services/{assigned.id}/',
+            '/api/drivers/', f'/api/drivers/{self.driver1.id}/', '/api/addresses/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                fast = self.client.get(url)
+                with override_settings(FAST_READ_ENABLED=False):
+                    drf = self.client.get(url)
+                self.assertEqual(fast.status_code, status.HTTP_200_OK)
+                self.assertEqual(fast['Content-Type'], drf['Content-Type'])
+                self.assertEqual(fast.content, drf.content)
+
+        self.assertEqual(self.client.get('/api/services/not-a-uuid/').status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_driver_list_conditional_get(self):
+        response = self.client.get('/api/drivers/')
+        etag = response['ETag']
+        # Deleting a row doesn't move max(updated_at): lists only get an ETag
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        # Basic auth user lookup + the aggregate; nothing is serialized
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/drivers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        self.driver2.status = 'offline'
+        self.driver2.save()
+        response = self.client.get('/api/drivers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.driver2.delete()
+        response = self.client.get('/api/drivers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_service_retrieve_conditional_get(self):
+        service = Service.objects.create(
+            customer_name="Test Customer",
+            customer_phone="5551234567",
+            pickup_address=self.address1,
+            driver=self.driver1,
+            status="assigned"
+        )
+        url = f'/api/services/{service.id}/'
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+        # Changes to nested objects invalidate the ETag too
+        etag = response['ETag']
+        self.driver1.rating = 4.0
+        self.driver1.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_driver_save_updates_index(self):
+        driver_index.sync()
+        self.assertIn(self.driver1.pk, driver_index)
+
+        self.driver1.status = 'offline'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.driver1.save()
+        self.assertNotIn(self.driver1.pk, driver_index)
+
+    def test_rolled_back_save_leaves_index_untouched(self):
+        driver_index.sync()
+        try:
+            with transaction.atomic():
+                self.driver1.status = 'offline'
+                self.driver1.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertIn(self.driver1.pk, driver_index)
+
+    def test_stale_index_entry_is_not_assigned(self):
+        driver_index.sync()
+        # Queryset updates bypass the save signals, leaving the index stale
+        Driver.objects.filter(pk=self.driver1.pk).update(status='offline')
+
+        data = {
+            "customer_name": "Test Customer",
+            "customer_phone": "5551234567",
+            "pickup_address_id": str(self.address1.id),
+        }
+        response = self.client.post('/api/services/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Service.objects.get().driver_id, self.driver2.pk)
+
+    def test_index_cannot_hide_a_closer_driver(self):
+        driver_index.sync()
+        # Not in the index: its save only reaches it on commit
+        closer = Driver.objects.create(
+            first_name="Close", last_name="Driver", email="close@example.com", phone="3",
+            status="available", current_location=Point(-74.0543, 4.6710),
+        )
+        self.assertEqual([driver.pk for driver in find_candidates(self.address1.location, limit=1)], [closer.pk])
+
+    def test_batch_dispatch_minimizes_total_distance(self):
+        Driver.objects.update(status='offline')
+        pickup_a = Address.objects.create(
+            street="Calle 1", city="Bogota", state="Bogota", zip_code="12345",
+            country="Colombia", location=Point(-74.1, 4.600)
+        )
+        pickup_b = Address.objects.create(
+            street="Calle 2", city="Bogota", state="Bogota", zip_code="12345",
+            country="Colombia", location=Point(-74.1, 4.610)
+        )
+        # Greedy in request order would give driver_x to pickup_a (total ~2.2 km);
+        # the optimal matching gives it to pickup_b (total ~1.1 km)
+        driver_x = Driver.objects.create(
+            first_name="X", last_name="Driver", email="x@example.com", phone="1",
+            status="available", current_location=Point(-74.1, 4.606)
+        )
+        driver_y = Driver.objects.create(
+            first_name="Y", last_name="Driver", email="y@example.com", phone="2",
+            status="available", current_location=Point(-74.1, 4.594)
+        )
+
+        response = self.client.post('/api/services/batch/', {"services": [
+            {"customer_name": "A", "customer_phone": "1", "pickup_address_id": str(pickup_a.id)},
+            {"customer_name": "B", "customer_phone": "2", "pickup_address_id": str(pickup_b.id)},
+            {"customer_name": "C", "customer_phone": "3", "pickup_address_id": str(self.address1.id)},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['unassigned'], [
+            {"index": 2, "detail": "No hay conductores disponibles cercanos"}
+        ])
+
+        self.assertEqual(Service.objects.get(pickup_address=pickup_a).driver_id, driver_y.pk)
+        self.assertEqual(Service.objects.get(pickup_address=pickup_b).driver_id, driver_x.pk)
+        self.assertEqual(
+            Driver.objects.filter(status='in_service').count(), 2
+        )
+
+    def test_batch_rematches_drivers_claimed_elsewhere(self):
+        Driver.objects.update(status='offline')
+        pickup = Address.objects.create(
+            street="Calle 1", city="Bogota", state="Bogota", zip_code="12345",
+            country="Colombia", location=Point(-74.1, 4.600)
+        )
+        near = Driver.objects.create(
+            first_name="Near", last_name="Driver", email="near@example.com", phone="1",
+            status="available", current_location=Point(-74.1, 4.601)
+        )
+        far = Driver.objects.create(
+            first_name="Far", last_name="Driver", email="far@example.com", phone="2",
+            status="available", current_location=Point(-74.1, 4.620)
+        )
+        claim = dispatch._claim_drivers
+
+        def concurrent_claim(driver_ids, now):
+            # Another worker takes the nearest driver between the read and the claim
+            Driver.objects.filter(pk=near.pk).update(status='in_service')
+            return claim(driver_ids, now)
+
+        with mock.patch.object(dispatch, '_claim_drivers', side_effect=concurrent_claim):
+            services, unassigned = dispatch.assign_batch([
+                {'customer_name': 'A', 'customer_phone': '1', 'pickup_address': pickup},
+            ])
+        self.assertEqual(unassigned, [])
+        self.assertEqual(services[0].driver_id, far.pk)
+
+    def test_dispatch_uses_fitted_model(self):
+        assigned_at = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+        for _ in range(5):
+            Service.objects.create(
+                customer_name="History", customer_phone="1", pickup_address=self.address1,
+                driver=self.driver2, status='completed', pickup_distance=4000,
+                assigned_at=assigned_at, started_at=assigned_at + datetime.timedelta(minutes=20),
+            )
+        call_command('fit_eta_model', stdout=io.StringIO())
+        self.addCleanup(eta_model.load, [])
+        self.assertEqual(TravelTimeCell.objects.get().seconds_per_km, 300)
+
+        response = self.client.post('/api/services/', {
+            "customer_name": "Test Customer",
+            "customer_phone": "5551234567",
+            "pickup_address_id": str(self.address1.id),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        service = Service.objects.get(customer_name="Test Customer")
+        # Rush-hour pace (5 min/km) instead of the 2 min/km heuristic
+        self.assertEqual(
+            service.estimated_arrival.total_seconds(), round(300 * service.pickup_distance / 1000)
+        )
+
+    async def test_async_service_creation(self):
+        credentials = base64.b64encode('testuser:testpass123'.encode()).decode()
+        response = await self.async_client.post('/api/async/services/', {
+            "customer_name": "Async Customer",
+            "customer_phone": "5551234567",
+            "pickup_address_id": str(self.address1.id),
+        }, content_type='application/json', headers={'authorization': f'Basic {credentials}'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['driver']['id'], str(self.driver1.id))
+
+        service = await Service.objects.aget(customer_name="Async Customer")
+        self.assertEqual(service.status, 'assigned')
+        driver = await Driver.objects.aget(id=self.driver1.id)
+        self.assertEqual(driver.status, 'in_service')
+
+    async def test_async_service_creation_requires_authentication(self):
+        response = await self.async_client.post('/api/async/services/', {
+            "customer_name": "Async Customer",
+            "customer_phone": "5551234567",
+            "pickup_address_id": str(self.address1.id),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class DriverSpatialIndexTestCase(SimpleTestCase):
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(7)
+        rows = [(i, rng.uniform(4.5, 4.8), rng.uniform(-74.2, -74.0)) for i in range(2000)]
+        index = DriverSpatialIndex()
+        index.rebuild(rows)
+
+        for _ in range(50):
+            lat, lng = rng.uniform(4.4, 4.9), rng.uniform(-74.3, -73.9)
+            expected = sorted((haversine_m(lat, lng, dlat, dlng), i) for i, dlat, dlng in rows)[:5]
+            self.assertEqual(
+                [driver_id for _, driver_id in index.nearest(lat, lng, k=5)],
+                [driver_id for _, driver_id in expected]
+            )
+
+    def test_upsert_and_discard(self):
+        index = DriverSpatialIndex()
+        index.upsert('a', 4.67, -74.05)
+        index.upsert('a', 4.70, -74.05)
+        index.upsert('b', 4.60, -74.05)
+        self.assertEqual([driver_id for _, driver_id in index.nearest(4.70, -74.05, k=1)], ['a'])
+
+        index.discard('a')
+        self.assertNotIn('a', index)
+        self.assertEqual([driver_id for _, driver_id in index.nearest(4.70, -74.05, k=5)], ['b'])
+        self.assertEqual(index.nearest(4.70, -74.05, k=5, max_distance_m=1000), [])
+
+
+class ConcurrentAssignmentTestCase(TransactionTestCase):
+    """
+    Prueba de carga: solicitudes concurrentes nunca comparten conductor
+    """
+    drivers_count = 40
+    requests_count = 60
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='loaduser', password='loadpass123')
+        rng = random.Random(3)
+        self.pickup = Address.objects.create(
+            street="Cra. 14 #86A-15",
+            city="Bogota",
+            state="Bogota",
+            zip_code="12345",
+            country="Colombia",
+            location=Point(-74.0543174, 4.6708225)
+        )
+        for i in range(self.drivers_count):
+            Driver.objects.create(
+                first_name="Driver",
+                last_name=str(i),
+                email=f"driver{i}@example.com",
+                phone="1234567890",
+                status="available",
+                current_location=Point(-74.0543174 + rng.uniform(-0.05, 0.05), 4.6708225 + rng.uniform(-0.05, 0.05))
+            )
+
+    def _dispatch(self, _):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            return client.post('/api/services/', {
+                "customer_name": "Load Customer",
+                "customer_phone": "5551234567",
+                "pickup_address_id": str(self.pickup.id),
+            }, format='json').status_code
+        finally:
+            connections.close_all()
+
+    def test_no_double_assignment_under_concurrency(self):
+        for workers in (1, 2, 4, 8):
+            Service.objects.all().delete()
+            Driver.objects.update(status='available')
+            driver_index.sync()
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                codes = list(executor.map(self._dispatch, range(self.requests_count)))
+
+            assigned = Counter(Service.objects.values_list('driver_id', flat=True))
+            self.assertEqual(codes.count(status.HTTP_201_CREATED), self.drivers_count)
+            self.assertEqual(codes.count(status.HTTP_404_NOT_FOUND), self.requests_count - self.drivers_count)
+            self.assertEqual(len(assigned), self.drivers_count)
+            self.assertTrue(all(count == 1 for count in assigned.values()))
+            self.assertEqual(Driver.objects.filter(status='in_service').count(), self.drivers_count)
+
+
+class ETACacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.calls = []
+        self.eta_cache = ETACache(
+            alias='default', ttl=10, stale_ttl=20, max_entries=2,
+            cell_size=0.01, clock=lambda: self.now
+        )
+        self.addCleanup(self.eta_cache.clear)
+
+    def fetch(self, seconds):
+        def fetch():
+            self.calls.append(seconds)
+            return seconds
+        return fetch
+
+    def test_nearby_points_share_an_entry(self):
+        origin, destination = (4.6712, -74.0543), (4.6415, -74.0743)
+        self.assertEqual(self.eta_cache.get_or_fetch(origin, destination, self.fetch(600)), 600)
+        self.assertEqual(
+            self.eta_cache.get_or_fetch((4.6718, -74.0547), (4.6412, -74.0748), self.fetch(900)), 600
+        )
+        self.assertEqual(self.calls, [600])
+        self.assertEqual(self.eta_cache.stats()['hits'], 1)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        origin, destination = (4.6712, -74.0543), (4.6415, -74.0743)
+        self.eta_cache.get_or_fetch(origin, destination, self.fetch(600))
+
+        self.now += 15
+        self.assertEqual(self.eta_cache.get_or_fetch(origin, destination, self.fetch(700)), 600)
+        self.eta_cache.wait_for_refreshes(timeout=5)
+        self.assertEqual(self.eta_cache.get_or_fetch(origin, destination, self.fetch(800)), 700)
+
+        self.now += 60
+        self.assertEqual(self.eta_cache.get_or_fetch(origin, destination, self.fetch(900)), 900)
+        self.assertEqual(self.calls, [600, 700, 900])
+
+        stats = self.eta_cache.stats()
+        self.assertEqual((stats['hits'], stats['stale_hits'], stats['misses']), (1, 1, 2))
+
+    def test_lru_eviction(self):
+        first, second, third = (4.615, -74.015), (4.625, -74.025), (4.635, -74.035)
+        destination = (4.705, -74.105)
+        self.eta_cache.get_or_fetch(first, destination, self.fetch(1))
+        self.eta_cache.get_or_fetch(second, destination, self.fetch(2))
+        # Touch the first entry so the second one is the least recently used
+        self.eta_cache.get_or_fetch(first, destination, self.fetch(10))
+        self.eta_cache.get_or_fetch(third, destination, self.fetch(3))
+
+        self.assertEqual(self.eta_cache.stats()['evictions'], 1)
+        self.assertEqual(self.eta_cache.get_or_fetch(first, destination, self.fetch(10)), 1)
+        self.assertEqual(self.eta_cache.get_or_fetch(second, destination, self.fetch(20)), 20)
+
+
+class MapsHttpClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubMapsServer(duration=420).start()
+        self.addCleanup(self.stub.stop)
+        patcher = override_settings(GOOGLE_MAPS_API_KEY='test-key', GOOGLE_MAPS_DIRECTIONS_URL=self.stub.url)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def get_eta(self):
+        return GoogleMapsService.get_eta_with_traffic(origin="4.67,-74.05", destination="4.64,-74.07")
+
+    def test_session_is_reused(self):
+        client = PooledHttpClient(retries=0)
+        with mock.patch.object(GoogleMapsService, 'client', client):
+            self.assertEqual([self.get_eta() for _ in range(3)], [420, 420, 420])
+        self.assertEqual(len(self.stub.client_ports), 1)
+        self.assertEqual(client.stats()['latency']['count'], 3)
+
+    def test_breaker_short_circuits_slow_upstream(self):
+        self.stub.delay = 0.5
+        client = PooledHttpClient(
+            read_timeout=0.1, retries=1, backoff=0,
+            breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+        )
+        with mock.patch.object(GoogleMapsService, 'client', client):
+            self.assertIsNone(self.get_eta())
+            self.assertIsNone(self.get_eta())
+            self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+            self.assertEqual(self.stub.requests, 4)
+
+            # While open, calls never reach the network
+            self.assertIsNone(self.get_eta())
+            self.assertEqual(self.stub.requests, 4)
+            self.assertEqual(client.stats()['breaker']['rejected'], 1)
+
+    def test_breaker_half_open_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        now[0] = 11
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # Only one trial call at a time
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unexpected_error_releases_breaker_trial(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 11
+        client = PooledHttpClient(retries=0, breaker=breaker)
+        with mock.patch.object(client.session, 'get', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                client.get(self.stub.url)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        now[0] = 22
+        self.assertTrue(breaker.allow())
+
+    def test_cancelled_async_trial_releases_breaker(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 11
+        self.stub.delay = 1
+        client = AsyncPooledHttpClient(retries=0, breaker=breaker)
+
+        async def cancelled_call():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.get(self.stub.url), timeout=0.1)
+
+        asyncio.run(cancelled_call())
+        # The cancelled trial counts as a failure instead of blocking the breaker
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        now[0] = 22
+        self.assertTrue(breaker.allow())
+
+
+@override_settings(GOOGLE_MAPS_API_KEY='test-key', ETA_MODEL_ENABLED=False)
+class RankByEtaTestCase(SimpleTestCase):
+    def setUp(self):
+        self.pickup = Point(-74.0543, 4.6708)
+        self.candidates = [
+            SimpleNamespace(pk=index, current_location=Point(-74.0543, 4.6708 + 0.01 * index), distance=D(km=index + 1))
+            for index in range(3)
+        ]
+
+    def test_lowest_road_eta_wins(self):
+        road_eta = {0: 900, 1: 300, 2: 600}
+
+        def get_eta_cached(origin, destination):
+            return road_eta[round((destination[0] - 4.6708) / 0.01)]
+
+        with mock.patch.object(GoogleMapsService, 'get_eta_cached', side_effect=get_eta_cached):
+            ranked = rank_by_eta(self.pickup, self.candidates, budget=1)
+        self.assertEqual([driver.pk for driver in ranked], [1, 2, 0])
+        self.assertEqual(ranked[0].eta, datetime.timedelta(seconds=300))
+
+    def test_candidates_missing_the_budget_use_heuristic(self):
+        def get_eta_cached(origin, destination):
+            if destination[0] > 4.68:
+                time.sleep(0.5)
+            return 1200
+
+        started = time.perf_counter()
+        with mock.patch.object(GoogleMapsService, 'get_eta_cached', side_effect=get_eta_cached):
+            ranked = rank_by_eta(self.pickup, self.candidates, budget=0.1)
+        self.assertLess(time.perf_counter() - started, 0.4)
+
+        # 2 km and 3 km at 2 minutes per km beat the 20 minutes from Maps
+        self.assertEqual([driver.pk for driver in ranked], [1, 2, 0])
+        self.assertEqual(ranked[0].eta, datetime.timedelta(minutes=4))
+
+
+class TravelTimeModelTestCase(SimpleTestCase):
+    def test_fit_paces_per_hour_and_band(self):
+        # Monday 08h, 3 km (band 2): 150 s/km, with one outlier
+        hours = [8, 8, 8, 8, 8, 8, 30]
+        distances = [3, 3, 3, 3, 3, 3, 3]
+        seconds = [450, 450, 450, 450, 450, 9000, 300]
+        self.assertEqual(fit_paces(hours, distances, seconds, min_samples=5), [(8, 2, 150.0, 6)])
+
+    def test_estimate_falls_back_to_band_average(self):
+        model = TravelTimeModel()
+        model.load([(8, 2, 150.0, 10), (9, 2, 100.0, 30)])
+
+        monday_8am = timezone.make_aware(datetime.datetime(2025, 5, 5, 8, 30))
+        self.assertEqual(model.estimate(3, monday_8am), datetime.timedelta(seconds=450))
+        # No data on Sunday: average pace of the band weighted by samples
+        sunday = timezone.make_aware(datetime.datetime(2025, 5, 4, 23, 0))
+        self.assertEqual(model.estimate(4, sunday), datetime.timedelta(seconds=450))
+        self.assertIsNone(model.estimate(30, sunday))
+
+
+class QueryCountTestCase(TestCase):
+    """
+    El número de consultas por endpoint no depende del tamaño del resultado
+    """
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='queryuser', password='querypass123'))
+
+    def _create_services(self, count):
+        for i in range(count):
+            address = Address.objects.create(
+                street=f"Calle {i}",
+                city="Bogota",
+                state="Bogota",
+                zip_code="12345",
+                country="Colombia",
+                location=Point(-74.05, 4.67)
+            )
+            driver = Driver.objects.create(
+                first_name="Driver",
+                last_name=str(i),
+                email=f"query{Driver.objects.count()}@example.com",
+                phone="1234567890",
+                status="in_service",
+                address=address,
+                current_location=Point(-74.05, 4.67)
+            )
+            Service.objects.create(
+                customer_name="Customer",
+                customer_phone="5551234567",
+                pickup_address=address,
+                driver=driver,
+                status="assigned"
+            )
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connections['default']) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self._create_services(1)
+        baseline = self._count_queries(url)
+        self._create_services(20)
+        self.assertEqual(self._count_queries(url), baseline)
+
+    def test_list_endpoints_use_constant_queries(self):
+        for url in ('/api/services/', '/api/drivers/', '/api/addresses/'):
+            with self.subTest(url=url):
+                self.assertConstantQueries(url)
+
+    def test_service_retrieve_uses_two_queries(self):
+        self._create_services(1)
+        service = Service.objects.get()
+        # ETag validators + the service with its nested relations
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/services/{service.id}/')
+        self.assertEqual(response.data['driver']['address']['id'], str(service.pickup_address_id))
+
+
+class BenchmarkCommandsTestCase(TestCase):
+    """
+    Humo de los comandos que siembran filas con SQL crudo: se rompen en
+    silencio cuando un modelo gana una columna NOT NULL
+    """
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_benchmark_pagination(self):
+        stdout = io.StringIO()
+        call_command('benchmark_pagination', '--services', '30', '--pages', '1', '2',
+                     '--page-size', '10', '--repeat', '1', stdout=stdout)
+        self.assertIn('Inserted 30 services', stdout.getvalue())
+        # Seeded rows are rolled back
+        self.assertFalse(Service.objects.exists())
+
+    def test_explain_dispatch_indexes_seed(self):
+        command = load_command_class('services', 'explain_dispatch_indexes')
+        command.seed({'drivers': 20, 'available_ratio': 0.5, 'services': 50, 'seed': 0})
+        self.assertEqual(Service.objects.count(), 50)
+        self.assertFalse(Service.objects.filter(updated_at__isnull=True).exists())
+
+
+class IndexUsageTestCase(TestCase):
+    """
+    Las consultas de despacho y de servicios pueden usar sus índices.
+    Con pocas filas el planificador prefiere un seq scan, así que se
+    desactiva; `explain_dispatch_indexes` lo verifica con volúmenes reales.
+    """
+    def setUp(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def test_dispatch_uses_partial_spatial_index(self):
+        indexes, _ = explain_indexes(_candidates_queryset(Point(-74.05, 4.67), 5000)[:5])
+        self.assertIn('driver_available_location_gist', indexes)
+
+    def test_nearby_uses_knn_on_partial_spatial_index(self):
+        indexes, plan = explain_indexes(knn_queryset(Point(-74.05, 4.67))[:10])
+        self.assertIn('driver_available_location_gist', indexes)
+        # Rows come ordered from the index: no sort node over the drivers
+        self.assertNotIn('"Sort"', json.dumps(plan))
+
+    def test_service_status_query_uses_composite_index(self):
+        indexes, _ = explain_indexes(Service.objects.filter(status='requested').order_by('-requested_at')[:100])
+        self.assertIn('service_status_requested_idx', indexes)
+
+
+class DriverLocationsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='gpsuser', password='gpspass123'))
+        self.driver = Driver.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            status="available",
+            current_location=Point(-74.05, 4.67)
+        )
+        self.offline = Driver.objects.create(
+            first_name="Jane",
+            last_name="Smith",
+            email="jane@example.com",
+            phone="0987654321",
+            status="offline",
+            current_location=Point(-74.05, 4.67)
+        )
+        driver_index.sync()
+
+    def test_bulk_pings_keep_latest_position(self):
+        now = time.time()
+        response = self.client.post('/api/drivers/locations/', {'locations': [
+            {'id': str(self.driver.id), 'lat': 4.60, 'lng': -74.10, 'ts': now - 10},
+            {'id': str(self.driver.id), 'lat': 4.61, 'lng': -74.11, 'ts': now},
+            {'id': str(self.offline.id), 'lat': 4.62, 'lng': -74.12, 'ts': now},
+            {'id': 'not-a-uuid', 'lat': 4.62, 'lng': -74.12, 'ts': now},
+            {'id': str(self.driver.id), 'lat': 95, 'lng': -74.12, 'ts': now},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [3, 4])
+
+        self.driver.refresh_from_db()
+        self.assertAlmostEqual(self.driver.current_location.y, 4.61)
+        self.assertAlmostEqual(self.driver.current_location.x, -74.11)
+        # The index follows available drivers only
+        self.assertEqual(driver_index.nearest(4.61, -74.11, k=1)[0][1], self.driver.pk)
+        self.assertNotIn(self.offline.pk, driver_index)
+
+    def test_out_of_order_ping_is_dropped(self):
+        now = time.time()
+        self.client.post('/api/drivers/locations/', [
+            {'id': str(self.driver.id), 'lat': 4.61, 'lng': -74.11, 'ts': now},
+        ], format='json')
+        response = self.client.post('/api/drivers/locations/', [
+            {'id': str(self.driver.id), 'lat': 4.50, 'lng': -74.00, 'ts': now - 5},
+        ], format='json')
+        self.assertEqual(response.data, {'updated': 0, 'ignored': 1, 'errors': []})
+
+        self.driver.refresh_from_db()
+        self.assertAlmostEqual(self.driver.current_location.y, 4.61)
+
+    @override_settings(LOCATION_BUFFER_ENABLED=True)
+    def test_dispatch_reads_buffered_positions(self):
+        pickup = Address.objects.create(
+            street="Cra. 14 #86A-15",
+            city="Bogota",
+            state="Bogota",
+            zip_code="12345",
+            country="Colombia",
+            location=Point(-74.10, 4.60)
+        )
+        self.addCleanup(location_buffer.clear)
+        response = self.client.post('/api/drivers/locations/', [
+            {'id': str(self.driver.id), 'lat': 4.601, 'lng': -74.10, 'ts': time.time()},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # Not written yet, but dispatch already sees the new position
+        self.assertEqual(Driver.objects.get(pk=self.driver.pk).location_updated_at, None)
+        candidate = find_candidates(pickup.location)[0]
+        self.assertAlmostEqual(candidate.distance.m, 111, delta=2)
+
+        location_buffer.flush()
+        self.driver.refresh_from_db()
+        self.assertAlmostEqual(self.driver.current_location.y, 4.601)
+
+    @override_settings(LOCATION_BUFFER_ENABLED=True)
+    def test_buffered_move_does_not_mark_index_stale(self):
+        self.addCleanup(location_buffer.clear)
+        location_buffer.add({self.driver.pk: (4.601, -74.10, timezone.now())})
+
+        candidates = find_candidates(Point(-74.10, 4.60), limit=1)
+        self.assertEqual([driver.pk for driver in candidates], [self.driver.pk])
+        self.assertFalse(driver_index.is_stale())
+
+        # A resync keeps the buffered position instead of the written one
+        driver_index.sync()
+        distance_m, driver_id = driver_index.nearest(4.60, -74.10, k=1)[0]
+        self.assertEqual(driver_id, self.driver.pk)
+        self.assertAlmostEqual(distance_m, 111, delta=2)
+
+    def test_single_update_statement(self):
+        pings = [
+            {'id': str(self.driver.id), 'lat': 4.61, 'lng': -74.11, 'ts': time.time()},
+            {'id': str(self.offline.id), 'lat': 4.62, 'lng': -74.12, 'ts': time.time()},
+        ]
+        with self.assertNumQueries(1):
+            self.client.post('/api/drivers/locations/', pings, format='json')
+
+
+class LocationBufferTestCase(SimpleTestCase):
+    def setUp(self):
+        self.writes = []
+        self.buffer = LocationBuffer(flush_interval=60, flush_size=3, max_entries=10, writer=self._write)
+
+    def _write(self, batch):
+        self.writes.append(dict(batch))
+        return len(batch)
+
+    def _ts(self, seconds):
+        return datetime.datetime(2025, 5, 5, 8, 0, seconds, tzinfo=datetime.timezone.utc)
+
+    def test_keeps_latest_ping_per_driver(self):
+        self.buffer.add({'a': (4.60, -74.10, self._ts(1))})
+        self.buffer.add({'a': (4.61, -74.11, self._ts(2))})
+        self.buffer.add({'a': (4.50, -74.00, self._ts(0))})  # out of order
+        self.assertEqual(self.buffer.get('a'), (4.61, -74.11, self._ts(2)))
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.writes, [{'a': (4.61, -74.11, self._ts(2))}])
+        stats = self.buffer.stats()
+        self.assertEqual((stats['received'], stats['coalesced'], stats['out_of_order']), (3, 1, 1))
+        self.assertAlmostEqual(stats['coalescing_ratio'], 2 / 3)
+
+    def test_flushes_at_size_threshold(self):
+        self.buffer.add({driver_id: (4.6, -74.1, self._ts(1)) for driver_id in 'ab'})
+        self.assertEqual(self.writes, [])
+        self.buffer.add({'c': (4.6, -74.1, self._ts(1))})
+        self.assertEqual(len(self.writes), 1)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_background_thread_flushes_at_size_threshold(self):
+        self.buffer.start()
+        self.addCleanup(self.buffer.stop)
+        flushed = threading.Event()
+        write = self.buffer._writer
+        self.buffer._writer = lambda batch: (write(batch), flushed.set())[0]
+
+        self.buffer.add({driver_id: (4.6, -74.1, self._ts(1)) for driver_id in 'abc'})
+        # The request thread only signals the flusher
+        self.assertTrue(flushed.wait(timeout=5))
+        self.assertEqual(len(self.writes[0]), 3)
+
+    def test_max_entries_rejects_new_drivers(self):
+        self.buffer.flush_size = 100
+        self.assertEqual(self.buffer.add({str(index): (4.6, -74.1, self._ts(1)) for index in range(12)}), 10)
+        self.assertEqual(len(self.buffer), 10)
+        # Drivers already buffered still move
+        self.assertEqual(self.buffer.add({'0': (4.7, -74.2, self._ts(2)), '11': (4.7, -74.2, self._ts(2))}), 1)
+        self.assertEqual(self.buffer.get('0'), (4.7, -74.2, self._ts(2)))
+        self.assertEqual(self.buffer.stats()['dropped'], 3)
+
+    def test_failed_flush_keeps_positions(self):
+        self.buffer._writer = mock.Mock(side_effect=RuntimeError('db down'))
+        self.buffer.add({'a': (4.6, -74.1, self._ts(1))})
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.get('a'), (4.6, -74.1, self._ts(1)))
+        self.assertEqual(self.buffer.stats()['flush_errors'], 1)
+
+    def test_stop_flushes_pending_positions(self):
+        self.buffer.start()
+        self.buffer.add({'a': (4.6, -74.1, self._ts(1))})
+        self.buffer.stop()
+        self.assertEqual(self.writes, [{'a': (4.6, -74.1, self._ts(1))}])
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='cacheuser', password='cachepass123'))
+        self.address = Address.objects.create(
+            street="Cra. 14 #86A-15",
+            city="Bogota",
+            state="Bogota",
+            zip_code="12345",
+            country="Colombia",
+            location=Point(-74.0543174, 4.6708225)
+        )
+        self.driver = Driver.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            status="available",
+            address=self.address,
+            current_location=Point(-74.0743174, 4.6408225)
+        )
+
+    def test_repeated_reads_skip_the_database(self):
+        for url in ('/api/drivers/', f'/api/drivers/{self.driver.id}/', '/api/addresses/'):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.content, first.content)
+                # Conditional GETs are answered from the cached validators
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_status_actions_invalidate(self):
+        self.client.get('/api/drivers/')
+        self.client.post(f'/api/drivers/{self.driver.id}/set_offline/')
+        self.assertEqual(self.client.get('/api/drivers/').json()['results'][0]['status'], 'offline')
+
+    def test_queryset_updates_invalidate(self):
+        self.client.get(f'/api/drivers/{self.driver.id}/')
+        claim_driver([self.driver])
+        self.assertEqual(self.client.get(f'/api/drivers/{self.driver.id}/').json()['status'], 'in_service')
+
+    def test_pings_invalidate_with_one_version_bump(self):
+        self.client.get('/api/drivers/')
+        self.client.get(f'/api/drivers/{self.driver.id}/')
+        invalidations = response_cache.stats()['invalidations']
+        self.client.post('/api/drivers/locations/', [
+            {'id': str(self.driver.id), 'lat': 4.61, 'lng': -74.11, 'ts': time.time()},
+        ], format='json')
+        # 'driver' and the locations scope, not a version per driver
+        self.assertEqual(response_cache.stats()['invalidations'] - invalidations, 2)
+        for url in ('/api/drivers/', f'/api/drivers/{self.driver.id}/'):
+            with self.subTest(url=url):
+                response = self.client.get(url).json()
+                driver = response['results'][0] if 'results' in response else response
+                self.assertIsNotNone(driver['location_updated_at'])
+
+    def test_nested_address_change_invalidates_driver(self):
+        self.client.get(f'/api/drivers/{self.driver.id}/')
+        self.address.street = "Calle 100 #7-33"
+        self.address.save()
+        self.assertEqual(self.client.get(f'/api/drivers/{self.driver.id}/').json()['address']['street'], "Calle 100 #7-33")
+
+
+class ResponseCacheLockTestCase(SimpleTestCase):
+    def test_only_one_request_rebuilds(self):
+        cache = ResponseCache(alias='default', lock_wait=0.05)
+        key = cache.make_key('/api/drivers/', 'application/json', ['driver'])
+        self.addCleanup(cache.cache.delete_many, [key, f'{key}:lock'])
+
+        self.assertEqual(cache.get(key), (None, True))
+        # A concurrent miss waits for the rebuild instead of repeating it
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            waiting = executor.submit(cache.get, key)
+            time.sleep(0.01)
+            cache.set(key, 'rendered')
+            self.assertEqual(waiting.result(), ('rendered', False))
+        cache.release(key)
+
+        cache.invalidate('driver')
+        self.assertNotEqual(cache.make_key('/api/drivers/', 'application/json', ['driver']), key)
+        self.assertEqual(cache.stats()['waited_hits'], 1)
+
+
+class AddressImportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='importuser', password='importpass123'))
+
+    def test_csv_body_with_per_row_errors(self):
+        body = (
+            "street,city,state,zip_code,country,latitude,longitude\n"
+            "Cra. 14 #86A-15,Bogota,Bogota,12345,Colombia,4.6708225,-74.0543174\n"
+            "Calle 100,,Bogota,12345,Colombia,,\n"
+            "Calle 26,Bogota,Bogota,12345,Colombia,95,-74.05\n"
+            "\"Calle 72, Local 3\",Bogota,Bogota,12345,Colombia,,\n"
+        )
+        response = self.client.generic('POST', '/api/addresses/bulk/', body.encode(), content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+        self.assertIn('city', response.data['errors'][0]['errors'])
+
+        address = Address.objects.get(street="Cra. 14 #86A-15")
+        self.assertAlmostEqual(address.location.y, 4.6708225)
+        self.assertIsNone(Address.objects.get(street="Calle 72, Local 3").location)
+
+    def test_jsonl_upload_in_chunks(self):
+        lines = [
+            json.dumps({"street": f"Calle {i}", "city": "Bogota", "state": "Bogota",
+                        "zip_code": "12345", "country": "Colombia", "lat": 4.6, "lng": -74.1})
+            for i in range(25)
+        ]
+        upload = io.BytesIO("\n".join(lines + ["not json"]).encode())
+        upload.name = 'addresses.jsonl'
+        with override_settings(ADDRESS_IMPORT_CHUNK_SIZE=10):
+            response = self.client.post('/api/addresses/bulk/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['failed']), (25, 1))
+        self.assertEqual(Address.objects.count(), 25)
+        # Distinct timestamps, also across chunks: the cursor never pages by OFFSET
+        self.assertEqual(len(set(Address.objects.values_list('created_at', flat=True))), 25)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.generic('POST', '/api/addresses/bulk/', b'<xml/>', content_type='application/xml')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self):
+        request_metrics.reset()
+        Driver.objects.create(
+            first_name="Ana", last_name="Ruiz", email="ana@example.com", phone="3000000000",
+            current_location=Point(-74.05, 4.67),
+        )
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_server_timing_and_metrics_endpoint(self):
+        response = self.client.get('/api/drivers/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response['Server-Timing']
+        for phase in ('db;dur=', 'maps;dur=', 'serialize;dur=', 'total;dur='):
+            self.assertIn(phase, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{view="DriverViewSet.list",le="+Inf"} 1', body)
+        self.assertIn('http_requests_total{view="DriverViewSet.list",status="200"} 1', body)
+        self.assertIn('http_request_db_queries_count{view="DriverViewSet.list"} 1', body)
+        self.assertIn('response_cache_hit_ratio', body)
+        self.assertIn('maps_breaker_state{value="closed"} 1', body)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/api/drivers/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertNotIn('DriverViewSet.list', self.client.get('/metrics').content.decode())
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_allowed_ips(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, status.HTTP_200_OK)
+
+    def test_metrics_are_local_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(METRICS_ALLOWED_IPS=['*']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, status.HTTP_200_OK)
+
+    def test_nested_phases_are_exclusive(self):
+        timings = RequestTimings()
+        token = activate(timings)
+        try:
+            with timed('serialize'):
+                with timed('db'):
+                    time.sleep(0.02)
+                with timed('serialize'):
+                    pass
+        finally:
+            deactivate(token)
+        self.assertGreaterEqual(timings.durations['db'], 0.02)
+        self.assertLess(timings.durations['serialize'], 0.02)
+        self.assertEqual(timings.counts['serialize'], 1)
+
+
+@override_settings(DISPATCH_QUEUE_ENABLED=True)
+class DispatchQueueTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='queueuser', password='queuepass123'))
+        self.pickup = Address.objects.create(
+            street="Cra. 14 #86A-15", city="Bogota", state="Bogota", zip_code="12345",
+            country="Colombia", location=Point(-74.0543174, 4.6708225),
+        )
+
+    def _request(self):
+        return self.client.post('/api/services/', {
+            "customer_name": "Queued Customer",
+            "customer_phone": "5551234567",
+            "pickup_address_id": str(self.pickup.id),
+        }, format='json')
+
+    def test_create_is_accepted_and_worker_assigns(self):
+        near = Driver.objects.create(
+            first_name="Near", last_name="Driver", email="near@example.com", phone="1",
+            current_location=Point(-74.0545, 4.6710),
+        )
+        Driver.objects.create(
+            first_name="Far", last_name="Driver", email="far@example.com", phone="2",
+            current_location=Point(-74.10, 4.70),
+        )
+        response = self._request()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'requested')
+        self.assertIsNone(response.data['driver'])
+        self.assertTrue(response['Location'].endswith(f"/api/services/{response.data['id']}/"))
+        self.assertEqual(queue_stats()['depth'], 1)
+
+        call_command('dispatch_worker', '--once', stdout=io.StringIO())
+
+        service = Service.objects.get(pk=response.data['id'])
+        self.assertEqual(service.status, 'assigned')
+        self.assertEqual(service.driver, near)
+        self.assertIsNotNone(service.assigned_at)
+        self.assertIsNotNone(service.estimated_arrival)
+        self.assertIsNone(service.dispatch_after)
+        near.refresh_from_db()
+        self.assertEqual(near.status, 'in_service')
+        self.assertEqual(queue_stats()['depth'], 0)
+
+    def test_unmatched_services_are_retried_then_cancelled(self):
+        service_id = self._request().data['id']
+        assigned, deferred, expired = dispatch_queued(retry_seconds=60)
+        self.assertEqual((len(assigned), len(deferred), len(expired)), (0, 1, 0))
+        service = Service.objects.get(pk=service_id)
+        self.assertEqual(service.status, 'requested')
+        self.assertGreater(service.dispatch_after, timezone.now())
+        self.assertEqual(queue_stats()['due'], 0)
+
+        Service.objects.filter(pk=service_id).update(
+            dispatch_after=timezone.now(), requested_at=timezone.now() - datetime.timedelta(minutes=10),
+        )
+        assigned, deferred, expired = dispatch_queued(timeout_seconds=300)
+        self.assertEqual(len(expired), 1)
+        self.assertEqual(Service.objects.get(pk=service_id).status, 'cancelled')
+
+
+class TransitionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='transitionuser', password='transpass123'))
+        self.pickup = Address.objects.create(
+            street="Cra. 14 #86A-15", city="Bogota", state="Bogota", zip_code="12345",
+            country="Colombia", location=Point(-74.0543174, 4.6708225),
+        )
+        self.driver = Driver.objects.create(
+            first_name="Test", last_name="Driver", email="transition@example.com", phone="1",
+            status='in_service', current_location=Point(-74.0545, 4.6710),
+        )
+        self.service = Service.objects.create(
+            customer_name="Test Customer", customer_phone="5551234567",
+            pickup_address=self.pickup, driver=self.driver, status='assigned',
+        )
+
+    def test_start_then_complete_releases_driver(self):
+        response = self.client.post(f'/api/services/{self.service.id}/start/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.status, 'in_progress')
+        self.assertIsNotNone(self.service.started_at)
+
+        driver_index.clear()
+        response = self.client.post(f'/api/services/{self.service.id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.service.refresh_from_db()
+        self.driver.refresh_from_db()
+        self.assertEqual(self.service.status, 'completed')
+        self.assertEqual(self.driver.status, 'available')
+        self.assertIn(self.driver.pk, driver_index)
+
+        # Completing twice is a conflict, not a second release
+        response = self.client.post(f'/api/services/{self.service.id}/complete/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'completed')
+
+    def test_cancel(self):
+        response = self.client.post(f'/api/services/{self.service.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.service.refresh_from_db()
+        self.driver.refresh_from_db()
+        self.assertEqual(self.service.status, 'cancelled')
+        self.assertIsNotNone(self.service.cancelled_at)
+        self.assertEqual(self.driver.status, 'available')
+        self.assertEqual(self.client.post(f'/api/services/{self.service.id}/start/').status_code, status.HTTP_409_CONFLICT)
+
+    def test_unknown_service(self):
+        self.assertEqual(self.client.post('/api/services/not-a-uuid/cancel/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.post('/api/services/00000000-0000-4000-8000-000000000000/cancel/').status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_patch_cannot_skip_transitions(self):
+        response = self.client.patch(f'/api/services/{self.service.id}/', {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(
+            f'/api/drivers/{self.driver.id}/', {'status': 'available', 'rating': 4.2}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.service.refresh_from_db()
+        self.driver.refresh_from_db()
+        self.assertEqual(self.service.status, 'assigned')
+        self.assertEqual((self.driver.status, self.driver.rating), ('in_service', 4.2))
+
+    def test_patch_does_not_overwrite_a_concurrent_transition(self):
+        stale = Service.objects.get(pk=self.service.pk)
+        self.client.post(f'/api/services/{self.service.id}/start/')
+        serializer = ServiceSerializer(stale, data={'customer_name': 'Renamed'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.service.refresh_from_db()
+        self.assertEqual((self.service.status, self.service.customer_name), ('in_progress', 'Renamed'))
+
+    def test_driver_status_is_conditional(self):
+        # A driver in service is released by its service, not by hand
+        response = self.client.post(f'/api/drivers/{self.driver.id}/set_offline/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'in_service')
+
+        Driver.objects.filter(pk=self.driver.pk).update(status='offline')
+        with self.assertNumQueries(1):
+            response = self.client.post(f'/api/drivers/{self.driver.id}/set_available/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.status, 'available')
+        self.assertIn(self.driver.pk, driver_index)
+
+    def test_complete_service_method(self):
+        self.service.complete_service()
+        self.assertEqual(self.service.status, 'completed')
+        self.assertEqual(self.service.driver.status, 'available')
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.status, 'available')
+
+
+@override_settings(DRIVER_INDEX_ENABLED=False)
+class SearchRingsTestCase(TestCase):
+    def setUp(self):
+        search_rings.load([])
+        search_rings.reset_stats()
+        self.addCleanup(search_rings.load, [])
+        self.pickup = Point(-74.05, 4.67)
+        for index, offset in enumerate((0.004, 0.02, 0.06)):
+            Driver.objects.create(
+                first_name="Ring",
+                last_name=str(index),
+                email=f"ring{index}@example.com",
+                phone="1234567890",
+                status="available",
+                current_location=Point(-74.05, 4.67 + offset)
+            )
+
+    def test_stops_at_first_ring_with_enough_candidates(self):
+        with self.assertNumQueries(2):
+            candidates = find_candidates(self.pickup, limit=2)
+        self.assertEqual([driver.last_name for driver in candidates], ['0', '1'])
+        stats = search_rings.stats()
+        self.assertEqual(stats['queries'], 2)
+        self.assertEqual(stats['satisfied_at_m']['3000'], 1)
+
+        # Beyond the last ring nothing is returned, but what is inside still is
+        self.assertEqual(len(find_candidates(self.pickup, limit=5)), 3)
+        self.assertEqual(search_rings.stats()['exhausted'], 1)
+
+    def test_zone_density_picks_the_first_ring(self):
+        rings = SearchRings(rings_km=(1, 3, 10, 30, 100))
+        self.assertEqual(rings.plan(4.67, -74.05, 5), [1000, 3000, 10000, 30000, 100000])
+        rings.load([(*rings._cell(4.67, -74.05), 2000.0)])
+        # ~2 km to the nearest driver: the 5th is expected at ~4.5 km
+        self.assertEqual(rings.plan(4.67, -74.05, 5), [10000, 30000, 100000])
+        self.assertEqual(rings.plan(4.67, -74.05, 5, radius_m=5000), [5000])
+
+        rings.observe(4.67, -74.05, 5, [100, 150, 200, 250, 300], 10000, 1)
+        self.assertLess(rings._nearest[rings._cell(4.67, -74.05)], 2000.0)
+
+
+class NearbyDriversTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='nearbyuser', password='nearbypass123'))
+        self.drivers = [
+            Driver.objects.create(
+                first_name="Near",
+                last_name=str(index),
+                email=f"near{index}@example.com",
+                phone="1234567890",
+                status=driver_status,
+                current_location=Point(-74.05, 4.67 + offset)
+            )
+            for index, (offset, driver_status) in enumerate(
+                [(0.02, 'available'), (0.001, 'available'), (0.01, 'offline'), (0.005, 'available')]
+            )
+        ]
+
+    def test_nearest_first_with_distances(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/drivers/nearby/', {'lat': 4.67, 'lng': -74.05, 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([driver['last_name'] for driver in data], ['1', '3'])
+        self.assertAlmostEqual(data[0]['distance'], 111, delta=2)
+        self.assertAlmostEqual(data[1]['distance'], 553, delta=5)
+        self.assertIn('address', data[0])
+
+        response = self.client.get('/api/drivers/nearby/', {'lat': 4.67, 'lng': -74.05, 'status': 'offline'})
+        self.assertEqual([driver['last_name'] for driver in response.json()], ['2'])
+
+    @override_settings(FAST_READ_ENABLED=False)
+    def test_drf_path_matches(self):
+        response = self.client.get('/api/drivers/nearby/', {'lat': 4.67, 'lng': -74.05})
+        self.assertEqual([driver['last_name'] for driver in response.json()], ['1', '3', '0'])
+
+    def test_invalid_parameters(self):
+        for params in ({'lat': 4.67}, {'lat': 'x', 'lng': -74.05}, {'lat': 91, 'lng': -74.05},
+                       {'lat': 4.67, 'lng': -74.05, 'limit': 0}, {'lat': 4.67, 'lng': -74.05, 'status': 'gone'}):
+            response = self.client.get('/api/drivers/nearby/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class StatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.base = timezone.now().astimezone(datetime.timezone.utc).replace(
+            minute=0, second=0, microsecond=0,
+        ) - datetime.timedelta(hours=3)
+        self.pickup = Address.objects.create(
+            street="Cra. 14 #86A-15",
+            city="Bogota",
+            state="Bogota",
+            zip_code="12345",
+            country="Colombia",
+            location=Point(-74.05, 4.67)
+        )
+        self.driver = Driver.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="1234567890",
+            status="available",
+            current_location=Point(-74.05, 4.67)
+        )
+        minutes = lambda value: self.base + datetime.timedelta(minutes=value)
+        self.service(requested_at=minutes(5), assigned_at=minutes(6), started_at=minutes(16),
+                     completed_at=minutes(40), estimated_arrival=datetime.timedelta(minutes=8), status='completed')
+        self.service(requested_at=minutes(10), cancelled_at=minutes(12), status='cancelled')
+        self.service(requested_at=minutes(50), assigned_at=minutes(55), started_at=minutes(60),
+                     completed_at=minutes(70), status='completed')
+
+    def service(self, **fields):
+        service = Service.objects.create(
+            customer_name="Jane Smith", customer_phone="0987654321", pickup_address=self.pickup,
+        )
+        # requested_at is auto_now_add
+        Service.objects.filter(pk=service.pk).update(driver=self.driver, **fields)
+
+    def row(self, hours):
+        return HourlyZoneStats.objects.get(hour=self.base + datetime.timedelta(hours=hours))
+
+    def test_incremental_refresh(self):
+        refresh_stats(now=self.base + datetime.timedelta(hours=2), lag_seconds=0)
+        first = self.row(0)
+        self.assertEqual(
+            (first.requested, first.dispatched, first.completed, first.cancelled, first.eta_samples),
+            (3, 2, 1, 1, 1),
+        )
+        self.assertEqual((first.estimated_seconds, first.actual_seconds), (480, 600))
+        # 34 minutes of the first service plus 5 of the one that ends next hour
+        self.assertAlmostEqual(first.busy_seconds, 2340)
+        self.assertEqual((self.row(1).completed, self.row(1).busy_seconds), (1, 600))
+
+        # Already aggregated events are not counted again; new ones are
+        self.service(requested_at=self.base + datetime.timedelta(hours=2, seconds=30))
+        refresh_stats(now=self.base + datetime.timedelta(hours=2, seconds=60), lag_seconds=0)
+        self.assertEqual(self.row(0).requested, 3)
+        self.assertEqual((self.row(2).requested, self.row(2).driver_seconds), (1, 60))
+
+    def test_endpoint_reads_summary_tables(self):
+        refresh_stats(now=self.base + datetime.timedelta(hours=2), lag_seconds=0)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/stats/', {
+                'since': self.base.isoformat(),
+                'until': (self.base + datetime.timedelta(hours=3)).isoformat(),
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['hours']), 2)
+        totals = response.data['totals']
+        self.assertEqual(totals['requested'], 3)
+        self.assertAlmostEqual(totals['cancellation_rate'], 1 / 3)
+        self.assertEqual((totals['mean_estimated_arrival'], totals['mean_actual_arrival']), (480, 600))
+        self.assertIsNone(totals['utilization'])
+        self.assertIn('completed', response.data['watermarks'])
+
+        response = self.client.get('/api/stats/', {'zone_lat': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
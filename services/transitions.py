@@ -0,0 +1,127 @@
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Driver, Service
+from .response_cache import response_cache
+from .spatial_index import driver_index
+
+# action: (statuses it can start from, new status, timestamp it sets)
+SERVICE_TRANSITIONS = {
+    'start': (('assigned',), 'in_progress', 'started_at'),
+    'complete': (('assigned', 'in_progress'), 'completed', 'completed_at'),
+    'cancel': (('requested', 'assigned'), 'cancelled', 'cancelled_at'),
+}
+
+# new status: statuses it can be set from. A driver in service is only
+# released by completing or cancelling its service
+DRIVER_TRANSITIONS = {
+    'available': ('available', 'offline'),
+    'offline': ('available', 'offline'),
+}
+
+
+class TransitionError(Exception):
+    """
+    El objeto no está en un estado desde el que se permite la transición
+    """
+
+    def __init__(self, current):
+        super().__init__(current)
+        self.current = current
+
+
+def _pk(value, model):
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        raise model.DoesNotExist() from None
+
+
+def _current_status(model, pk):
+    current = model.objects.filter(pk=pk).values_list('status', flat=True).first()
+    if current is None:
+        raise model.DoesNotExist()
+    return current
+
+
+def _update_driver_status(driver_id, status, expected, now):
+    """
+    UPDATE condicional del estado de un conductor; mantiene el índice
+    espacial y la caché de respuestas al día.
+
+    Returns:
+        bool: si se actualizó
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {Driver._meta.db_table}
+            SET status = %s, updated_at = %s
+            WHERE id = %s AND status = ANY(%s)
+            RETURNING ST_Y(current_location::geometry), ST_X(current_location::geometry)
+            """,
+            [status, now, driver_id, list(expected)],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    lat, lng = row
+    if status == 'available' and lat is not None:
+        driver_index.upsert(driver_id, lat, lng)
+    else:
+        driver_index.discard(driver_id)
+    response_cache.invalidate_drivers([driver_id])
+    return True
+
+
+def set_driver_status(driver_id, status):
+    """
+    Cambia el estado de un conductor con un solo UPDATE condicional (sin
+    leer la fila antes).
+
+    Raises:
+        Driver.DoesNotExist: si no existe
+        TransitionError: si su estado actual no lo permite
+    """
+    driver_id = _pk(driver_id, Driver)
+    if not _update_driver_status(driver_id, status, DRIVER_TRANSITIONS[status], timezone.now()):
+        raise TransitionError(_current_status(Driver, driver_id))
+
+
+def transition_service(service_id, action):
+    """
+    Aplica `action` (start, complete, cancel) con un UPDATE condicional
+    sobre el estado esperado. Al completar o cancelar, el conductor vuelve
+    a disponible en la misma transacción.
+
+    Returns:
+        dict: campos escritos (status, el timestamp de la acción,
+        updated_at) y driver_id
+
+    Raises:
+        Service.DoesNotExist: si no existe
+        TransitionError: si su estado actual no lo permite
+    """
+    expected, status, timestamp = SERVICE_TRANSITIONS[action]
+    service_id = _pk(service_id, Service)
+    now = timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {Service._meta.db_table}
+                SET status = %s, {timestamp} = %s, updated_at = %s
+                WHERE id = %s AND status = ANY(%s)
+                RETURNING driver_id
+                """,
+                [status, now, now, service_id, list(expected)],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise TransitionError(_current_status(Service, service_id))
+        driver_id = row[0]
+        if driver_id is not None and status in ('completed', 'cancelled'):
+            _update_driver_status(driver_id, 'available', ('in_service',), now)
+    return {'status': status, timestamp: now, 'updated_at': now, 'driver_id': driver_id}
@@ -1,43 +1,412 @@
+import datetime
+import hashlib
+
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.permissions import BasePermission
+from rest_framework.reverse import reverse
 from .models import Address, Driver, Service
-from .serializers import AddressSerializer, DriverSerializer, ServiceSerializer
-from .google_maps_time import GoogleMapsService
+from .serializers import (
+    AddressSerializer, DriverSerializer, ServiceSerializer, StatsQuerySerializer, StatsSerializer,
+)
+from .location_buffer import location_buffer
+from .address_import import decode_lines, detect_format, import_addresses
+from .fast_serializers import UnsupportedValue, render_json, row_serializer_for
+from .instrumentation import render_metrics, timed
+from .locations import LOCATIONS_SCOPE, apply_pings, parse_pings
+from .response_cache import response_cache
+from .pagination import RequestedAtCursorPagination
+from .stats import hourly_stats
+from .dispatch import assign_batch, assign_fastest_driver, enqueue_service, knn_queryset, release_driver
+from .transitions import TransitionError, set_driver_status, transition_service
+from django.conf import settings
+from django.db.models import Count, Max
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
 from django.utils import timezone
-import datetime
-import math
 
 
-class AddressViewSet(viewsets.ModelViewSet):
+class CachedResponseMixin:
+    """
+    Sirve list/retrieve desde `response_cache`. Las entradas se invalidan
+    por versión desde las señales de los modelos (ver signals.py) y desde
+    los UPDATE de conductores, así que no dependen de un TTL.
+
+    Las respuestas no dependen del usuario, por eso la llave solo incluye
+    la ruta y el tipo de contenido negociado.
+    """
+    cache_scope = None
+
+    def _cache_scopes(self):
+        if self.action == 'retrieve':
+            return (f'{self.cache_scope}:{self.kwargs[self.lookup_url_kwarg or self.lookup_field]}',)
+        return (self.cache_scope,)
+
+    def _cached(self, request, handler, *args, **kwargs):
+        # The browsable API shows the current user: only JSON is shared
+        if not response_cache.enabled or request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        key = response_cache.make_key(request.get_full_path(), request.accepted_media_type, self._cache_scopes())
+        entry, locked = response_cache.get(key)
+        if entry is None:
+            # Stored (and the lock released) in finalize_response, once rendered
+            request.response_cache_key = key
+            request.response_cache_locked = locked
+            return handler(request, *args, **kwargs)
+
+        content, content_type, etag, last_modified = entry
+        response = HttpResponse(content, content_type=content_type)
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified and parse_http_date_safe(last_modified),
+            response=response,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, super().retrieve, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(request, 'response_cache_key', None)
+        if key is None:
+            return response
+        try:
+            if response.status_code == status.HTTP_200_OK:
+                if hasattr(response, 'render'):
+                    with timed('serialize'):
+                        response.render()
+                response_cache.set(key, (
+                    response.content,
+                    response['Content-Type'],
+                    response.get('ETag'),
+                    response.get('Last-Modified'),
+                ))
+        finally:
+            if request.response_cache_locked:
+                response_cache.release(key)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag para list/retrieve (y Last-Modified solo para retrieve) calculados
+    con una consulta de agregación (conteo y máximos de `updated_at`,
+    incluidos los de los objetos anidados), sin serializar la respuesta.
+    Responde 304 a If-None-Match/If-Modified-Since vigentes.
+    """
+    conditional_actions = ('list', 'retrieve')
+    # updated_at columns whose changes alter the representation
+    conditional_timestamps = ('updated_at',)
+
+    def _conditional_state(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                state = queryset.filter(
+                    **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+                ).values_list(*self.conditional_timestamps).first()
+            except (TypeError, ValueError, ValidationError):
+                return None
+            if state is None:
+                return None
+        else:
+            aggregates = {f'max_{index}': Max(field) for index, field in enumerate(self.conditional_timestamps)}
+            state = tuple(queryset.aggregate(count=Count('pk'), **aggregates).values())
+
+        # A list loses rows (deletes, status filters) without its max
+        # updated_at moving: only the ETag, which includes the count, is safe
+        timestamps = [value for value in state if isinstance(value, datetime.datetime)]
+        last_modified = max(timestamps) if timestamps and self.action == 'retrieve' else None
+        digest = hashlib.md5(
+            repr((request.get_full_path(), request.accepted_media_type, state)).encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        return f'"{digest}"', last_modified
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        state = self._conditional_state(request) if self.action in self.conditional_actions else None
+        if state is None:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = state
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified and int(last_modified.timestamp()),
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+
+class FastReadMixin:
+    """
+    list/retrieve de solo lectura a partir de filas de `values_list`,
+    renderizadas con orjson, sin instancias de modelo ni de serializador.
+    La respuesta es byte a byte la misma que la de DRF; si la petición o el
+    serializador no lo permiten se usa el camino normal.
+    """
+
+    def _row_serializer(self, request):
+        if not getattr(settings, 'FAST_READ_ENABLED', True):
+            return None
+        # Browsable API and `application/json; indent=N` go through DRF
+        if request.accepted_renderer.format != 'json' or 'indent' in (request.accepted_media_type or ''):
+            return None
+        # Retrieve skips get_object(), so object-level permissions can't apply
+        if any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        ):
+            return None
+        return row_serializer_for(self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self._row_serializer(request)
+        if row_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        ordering = getattr(self.paginator, 'ordering', ()) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        rows = row_serializer.values(
+            self.filter_queryset(self.get_queryset()),
+            extra=[field.lstrip('-') for field in ordering],
+        )
+        page = self.paginate_queryset(rows)
+        try:
+            with timed('serialize'):
+                data = row_serializer.to_representation_many(rows if page is None else page)
+        except UnsupportedValue:
+            return super().list(request, *args, **kwargs)
+        if page is not None:
+            data = {
+                'next': self.paginator.get_next_link(),
+                'previous': self.paginator.get_previous_link(),
+                'results': data,
+            }
+        with timed('serialize'):
+            return HttpResponse(render_json(data), content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        row_serializer = self._row_serializer(request)
+        if row_serializer is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            row = row_serializer.values(queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})).first()
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if row is None:
+            raise Http404
+        try:
+            with timed('serialize'):
+                data = row_serializer.to_representation(row)
+        except UnsupportedValue:
+            return super().retrieve(request, *args, **kwargs)
+        with timed('serialize'):
+            return HttpResponse(render_json(data), content_type='application/json')
+
+
+class AddressViewSet(CachedResponseMixin, ConditionalGetMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Address.objects.all()
     serializer_class = AddressSerializer
+    cache_scope = 'address'
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Importa direcciones desde un CSV o JSON Lines, enviado como archivo
+        (multipart, campo `file`) o como cuerpo con Content-Type text/csv o
+        application/x-ndjson. El archivo se procesa por lotes sin cargarlo
+        completo en memoria.
+        """
+        content_type = request.content_type or ''
+        if content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({"detail": "Se espera un archivo en el campo file"}, status=status.HTTP_400_BAD_REQUEST)
+            fmt = detect_format(upload.name, upload.content_type)
+            lines = upload
+        else:
+            fmt = detect_format(content_type=content_type)
+            lines = request.stream
+        if fmt is None:
+            return Response(
+                {"detail": "Formato no soportado, use CSV o JSON Lines"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        if lines is None:
+            return Response({"detail": "El archivo esta vacio"}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = import_addresses(
+            decode_lines(lines),
+            fmt=fmt,
+            chunk_size=getattr(settings, 'ADDRESS_IMPORT_CHUNK_SIZE', 10000),
+            max_errors=getattr(settings, 'ADDRESS_IMPORT_MAX_ERRORS', 1000),
+        )
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST)
 
-class DriverViewSet(viewsets.ModelViewSet):
+
+class DriverViewSet(CachedResponseMixin, ConditionalGetMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
+    cache_scope = 'driver'
+    conditional_timestamps = ('updated_at', 'address__updated_at')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'destroy':
+            return queryset
+        return queryset.select_related('address')
+
+    def _cache_scopes(self):
+        scopes = super()._cache_scopes()
+        if self.action == 'retrieve':
+            # Position updates invalidate every driver at once (apply_pings)
+            return scopes + (LOCATIONS_SCOPE,)
+        return scopes
+
+    @action(detail=False, methods=['post'])
+    def locations(self, request):
+        payload = request.data.get('locations') if isinstance(request.data, dict) else request.data
+        if not isinstance(payload, list) or not payload:
+            return Response(
+                {"detail": "Se espera una lista de posiciones"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_size = getattr(settings, 'DRIVER_LOCATIONS_MAX_BATCH', 10000)
+        if len(payload) > max_size:
+            return Response(
+                {"detail": f"El lote no puede tener mas de {max_size} posiciones"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pings, errors = parse_pings(payload)
+        if not pings:
+            return Response({'updated': 0, 'ignored': 0, 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        if getattr(settings, 'LOCATION_BUFFER_ENABLED', False):
+            buffered = location_buffer.add(pings)
+            return Response(
+                {'buffered': buffered, 'ignored': len(pings) - buffered, 'errors': errors},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        updated = apply_pings(pings)
+        # Unknown drivers and pings older than the stored position
+        return Response({'updated': updated, 'ignored': len(pings) - updated, 'errors': errors})
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Los `limit` conductores más cercanos a (lat, lng) en estado `status`
+        (por defecto available), con su `distance` en metros
+        """
+        params = request.query_params
+        try:
+            latitude, longitude = float(params['lat']), float(params['lng'])
+            limit = int(params.get('limit', 10))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "lat y lng son requeridos; lat, lng y limit deben ser numeros"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+            return Response({"detail": "Coordenadas fuera de rango"}, status=status.HTTP_400_BAD_REQUEST)
+        max_limit = getattr(settings, 'DRIVER_NEARBY_MAX_LIMIT', 100)
+        if not 1 <= limit <= max_limit:
+            return Response(
+                {"detail": f"limit debe estar entre 1 y {max_limit}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        driver_status = params.get('status', 'available')
+        if driver_status not in dict(Driver.STATUS_CHOICES):
+            return Response({"detail": "Estado invalido"}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = knn_queryset(Point(longitude, latitude), driver_status).select_related('address')[:limit]
+        row_serializer = self._row_serializer(request)
+        if row_serializer is not None:
+            rows = list(row_serializer.values(queryset, extra=['distance']))
+            try:
+                with timed('serialize'):
+                    data = [
+                        {**row_serializer.to_representation(row), 'distance': round(row.distance, 1)}
+                        for row in rows
+                    ]
+                    return HttpResponse(render_json(data), content_type='application/json')
+            except UnsupportedValue:
+                pass
+        return Response([
+            {**self.get_serializer(driver).data, 'distance': round(driver.distance, 1)}
+            for driver in queryset
+        ])
+
+    def _set_status(self, pk, new_status, message):
+        # Single conditional UPDATE: no fetch, no lost update under concurrency
+        try:
+            set_driver_status(pk, new_status)
+        except Driver.DoesNotExist:
+            raise Http404
+        except TransitionError as exc:
+            return Response(
+                {"detail": f"El conductor esta en estado '{exc.current}'", "status": exc.current},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': message})
 
     @action(detail=True, methods=['post'])
     def set_available(self, request, pk=None):
-        driver = self.get_object()
-        driver.status = 'available'
-        driver.save()
-        return Response({'status': 'Conductor marcado como disponible'})
+        return self._set_status(pk, 'available', 'Conductor marcado como disponible')
 
     @action(detail=True, methods=['post'])
     def set_offline(self, request, pk=None):
-        driver = self.get_object()
-        driver.status = 'offline'
-        driver.save()
-        return Response({'status': 'Conductor marcado como fuera de servicio'})
+        return self._set_status(pk, 'offline', 'Conductor marcado como fuera de servicio')
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(ConditionalGetMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
+    pagination_class = RequestedAtCursorPagination
+    # Counting the whole service history on every poll is not cheap
+    conditional_actions = ('retrieve',)
+    conditional_timestamps = (
+        'updated_at', 'pickup_address__updated_at', 'driver__updated_at', 'driver__address__updated_at',
+    )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'destroy':
+            return queryset
+        # ServiceSerializer nests the pickup address, the driver and the
+        # driver's address: load them in the same query
+        return queryset.select_related('pickup_address', 'driver__address')
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -58,56 +427,154 @@ class ServiceViewSet(viewsets.ModelViewSet):
                 {"detail": "Direccion de recogida debe tener coordenadas de localizacion"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        if getattr(settings, 'DISPATCH_QUEUE_ENABLED', False):
+            # Assigned later by `manage.py dispatch_worker`; the client polls the service
+            service = enqueue_service(
+                customer_name=request.data.get('customer_name'),
+                customer_phone=request.data.get('customer_phone'),
+                pickup_address=pickup_address,
+            )
+            serializer = self.get_serializer(service)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers={
+                'Location': reverse('service-detail', args=[service.pk], request=request),
+            })
         
-        # Get available drivers within 100 km (for performance) and order by distance
-        available_drivers = Driver.objects.filter(
-            status='available',
-            current_location__distance_lte=(pickup_address.location, 100000)  # 100 km in meters
-        ).annotate(
-            distance=Distance('current_location', pickup_address.location)
-        ).order_by('distance')[:5]  # Get top 5 closest
-        
-        if not available_drivers.exists():
+        # Rank the nearest candidates by ETA (Maps calls run concurrently) and
+        # claim the fastest one still available with a conditional UPDATE
+        closest_driver = assign_fastest_driver(pickup_address.location)
+
+        if closest_driver is None:
             return Response(
                 {"detail": "No hay conductores disponibles cercanos"},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        # Assign the closest driver
-        closest_driver = available_drivers.first()
-        
-        # Calculate estimated time of arrival (ETA) using Google Maps API
-        distance_time = GoogleMapsService.get_eta_with_traffic(
-            origin=f"{pickup_address.location.y},{pickup_address.location.x}",
-            destination=f"{closest_driver.current_location.y},{closest_driver.current_location.x}"
-                                                       
-        )
-        if distance_time != None:
-            estimated_time = datetime.timedelta(seconds=distance_time)
-        else:
-            # Simple estimation: 2 minutes per km
-            distance_km = closest_driver.distance.km
-            estimated_time = datetime.timedelta(minutes=math.ceil(distance_km * 2))
-        
-        service = Service.objects.create(
-            customer_name=request.data.get('customer_name'),
-            customer_phone=request.data.get('customer_phone'),
-            pickup_address=pickup_address,
-            driver=closest_driver,
-            status='assigned',
-            estimated_arrival=estimated_time,
-        )
-        
-        # Update driver status
-        closest_driver.status = 'in_service'
-        closest_driver.save()
-        
+
+        try:
+            service = Service.objects.create(
+                customer_name=request.data.get('customer_name'),
+                customer_phone=request.data.get('customer_phone'),
+                pickup_address=pickup_address,
+                driver=closest_driver,
+                status='assigned',
+                estimated_arrival=closest_driver.eta,
+                pickup_distance=closest_driver.distance.m,
+                assigned_at=timezone.now(),
+            )
+        except Exception:
+            release_driver(closest_driver)
+            raise
+
         serializer = self.get_serializer(service)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        payload = request.data.get('services') if isinstance(request.data, dict) else request.data
+        if not isinstance(payload, list) or not payload:
+            return Response(
+                {"detail": "Se espera una lista de servicios"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_size = getattr(settings, 'DISPATCH_BATCH_MAX_SIZE', 500)
+        if len(payload) > max_size:
+            return Response(
+                {"detail": f"El lote no puede tener mas de {max_size} servicios"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=payload, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        addresses = Address.objects.in_bulk(
+            {item['pickup_address_id'] for item in serializer.validated_data}
+        )
+        requests = []
+        positions = []
+        errors = []
+        for position, item in enumerate(serializer.validated_data):
+            pickup_address = addresses.get(item['pickup_address_id'])
+            if pickup_address is None:
+                errors.append({"index": position, "detail": "ID de direccion de recogida no existe"})
+            elif not pickup_address.location:
+                errors.append({"index": position, "detail": "Direccion de recogida debe tener coordenadas de localizacion"})
+            else:
+                positions.append(position)
+                requests.append({
+                    'customer_name': item['customer_name'],
+                    'customer_phone': item['customer_phone'],
+                    'pickup_address': pickup_address,
+                })
+
+        if not requests:
+            return Response({'services': [], 'unassigned': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        services, unassigned = assign_batch(requests)
+        for row in unassigned:
+            errors.append({"index": positions[row], "detail": "No hay conductores disponibles cercanos"})
+        errors.sort(key=lambda error: error['index'])
+
+        return Response({
+            'services': self.get_serializer(services, many=True).data,
+            'unassigned': errors,
+        }, status=status.HTTP_201_CREATED if services else status.HTTP_404_NOT_FOUND)
+
+    def _transition(self, pk, transition, message):
+        # Conditional UPDATE on the expected status; completing or cancelling
+        # releases the driver in the same transaction
+        try:
+            transition_service(pk, transition)
+        except Service.DoesNotExist:
+            raise Http404
+        except TransitionError as exc:
+            return Response(
+                {"detail": f"El servicio esta en estado '{exc.current}'", "status": exc.current},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': message})
+
+    @action(detail=True, methods=['post'])
+    def start(self, request, pk=None):
+        return self._transition(pk, 'start', 'service started')
+
     @action(detail=True, methods=['post'])
     def complete(self, request, pk=None):
-        service = self.get_object()
-        service.complete_service()
-        return Response({'status': 'service completed'})
\ No newline at end of file
+        return self._transition(pk, 'complete', 'service completed')
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        return self._transition(pk, 'cancel', 'service cancelled')
+
+
+class StatsViewSet(viewsets.ViewSet):
+    """
+    Estadísticas operativas por hora desde las tablas de resumen que
+    mantiene `manage.py refresh_stats`
+    """
+
+    def list(self, request):
+        query = StatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        max_hours = getattr(settings, 'STATS_MAX_HOURS', 24 * 31)
+        until = params.get('until') or timezone.now()
+        since = params.get('since') or until - datetime.timedelta(hours=24)
+        if until - since > datetime.timedelta(hours=max_hours):
+            return Response(
+                {"detail": f"El periodo no puede superar {max_hours} horas"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        zone = (params['zone_lat'], params['zone_lng']) if 'zone_lat' in params else None
+        return Response(StatsSerializer(hourly_stats(since, until, zone)).data)
+
+
+def metrics(request):
+    """
+    Métricas en formato de texto de Prometheus
+    """
+    # Local only unless explicitly opened: the counters describe internals
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if '*' not in allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')